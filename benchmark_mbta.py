@@ -0,0 +1,268 @@
+"""Benchmark suite for ingestion and routing. It generates a deterministic
+synthetic network shaped like the MBTA API responses, from tens to thousands
+of routes, and times the phases of the program on it:
+
+parse       decode the json text of the stop responses
+aggregate   get_total_stops(), get_route_max_min_stops() and
+            get_accessible_stops()
+route       find_src_to_dest() without closed stops
+journeys    find_journey() without closed stops, with the boarding and
+            alighting stops of each leg
+closures    find_src_to_dest() with a closure scenario
+batch       get_trips() for the origin-destination matrix of 100 sources and
+            the destinations of the queries, encoded as JSON lines
+
+For each phase it reports the time, the throughput and the peak memory. The
+results can be saved as a baseline, and a later run fails if a phase is slower
+than the baseline by more than the threshold, or uses more peak memory than
+the baseline by more than the memory threshold.
+
+python benchmark_mbta.py --size medium --save-baseline
+python benchmark_mbta.py --size medium --check --threshold 0.25 --memory-threshold 0.1
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from mbta_batch import iter_trip_results
+from mbta_closures import ClosureScenario
+import read_mbta_data as main_program
+
+# number of routes, stops on each route, transfer density and closure ratio
+SIZES = {
+    "small": (20, 20, 0.2, 0.05),
+    "medium": (200, 50, 0.1, 0.05),
+    "large": (2000, 100, 0.05, 0.05),
+    "huge": (4000, 100, 0.05, 0.05),
+}
+
+def generate_network(num_routes, stops_per_route, transfer_density=0.1, seed=0):
+    """Returns the routes response and the list of stop responses, one for each
+    route, of a synthetic network. Each stop of a route is a stop of an earlier
+    route with probability transfer_density, otherwise a new stop. The same
+    arguments always give the same network.
+    """
+
+    rng = random.Random(seed)
+    routes_resp = {"data": []}
+    stop_resp_list = []
+    num_stops = 0
+    for route_index in range(num_routes):
+        route_id = "R%i" % route_index
+        routes_resp["data"].append({"type": "route", "id": route_id,
+            "attributes": {"long_name": "Route %i" % route_index, "type": route_index % 2}})
+        stop_info_list = []
+        for position in range(stops_per_route):
+            if num_stops > 0 and rng.random() < transfer_density:
+                stop_index = rng.randrange(num_stops)
+            else:
+                stop_index = num_stops
+                num_stops += 1
+            stop_info_list.append({"type": "stop", "id": "place-%i" % stop_index,
+                "attributes": {"name": "Stop %i" % stop_index,
+                    "wheelchair_boarding": rng.choice((0, 1, 1, 2))},
+                "relationships": {"parent_station": {"data": None},
+                    "route": {"data": {"type": "route", "id": route_id}}}})
+        stop_resp_list.append({"data": stop_info_list,
+            "included": [{"type": "route", "id": route_id}]})
+    return routes_resp, stop_resp_list
+
+def make_queries(reader, num_queries, seed=0):
+    """Returns a list of random (source, destination) stop key pairs.
+    """
+
+    rng = random.Random(seed)
+    stop_keys = sorted(reader.stop_set)
+    return [(rng.choice(stop_keys), rng.choice(stop_keys)) for i in range(num_queries)]
+
+def make_closure_scenario(reader, closure_ratio, seed=0):
+    """Returns a scenario which closes the given fraction of the stops.
+    """
+
+    rng = random.Random(seed)
+    stop_keys = sorted(reader.stop_set)
+    return ClosureScenario("benchmark", rng.sample(stop_keys, int(len(stop_keys) * closure_ratio)))
+
+def run_phases(num_routes, stops_per_route, transfer_density, closure_ratio, num_queries):
+    """Runs every phase once and yields the phase name, the number of items
+    the phase handled, and a function which runs the phase.
+    """
+
+    routes_resp, stop_resp_list = generate_network(num_routes, stops_per_route, transfer_density)
+    stop_text_list = [json.dumps(resp) for resp in stop_resp_list]
+    num_stop_records = num_routes * stops_per_route
+    del stop_resp_list
+
+    def parse():
+        return [json.loads(text) for text in stop_text_list]
+    yield "parse", num_stop_records, parse
+
+    resp_list = parse()
+    def aggregate():
+        reader = main_program.MBTADataReader()
+        reader.get_route_names(routes_resp)
+        reader.get_total_stops(resp_list)
+        reader.get_route_max_min_stops()
+        reader.get_accessible_stops(resp_list)
+        return reader
+    yield "aggregate", num_stop_records, aggregate
+
+    reader = aggregate()
+    del resp_list
+    query_list = make_queries(reader, num_queries)
+    def route():
+        for src_stop, dest_stop in query_list:
+            reader.find_src_to_dest(src_stop, dest_stop, set())
+    yield "route", num_queries, route
+
+    # the journey planner is built once, like the network
+    reader.get_journey_planner()
+    def journeys():
+        for src_stop, dest_stop in query_list:
+            reader.find_journey(src_stop, dest_stop, set())
+    yield "journeys", num_queries, journeys
+
+    scenario = make_closure_scenario(reader, closure_ratio)
+    def closures():
+        with contextlib.redirect_stdout(io.StringIO()):
+            for src_stop, dest_stop in query_list:
+                reader.find_src_to_dest(src_stop, dest_stop, scenario)
+    yield "closures", num_queries, closures
+
+    rng = random.Random(0)
+    src_stops = rng.sample(sorted(reader.stop_set), min(100, len(reader.stop_set)))
+    batch_queries = [(src_stop, dest_stop, None) for src_stop in src_stops for src, dest_stop in query_list]
+    def batch():
+        for json_lines in iter_trip_results(reader, batch_queries, processes=1, as_json=True):
+            pass
+    yield "batch", len(batch_queries), batch
+
+def run_benchmark(num_routes, stops_per_route, transfer_density, closure_ratio,
+        num_queries=1000, repeat=3):
+    """Returns a dictionary where key is the phase name and value is a
+    dictionary with the best time in seconds, the throughput in items per
+    second, and the peak memory in bytes of the phase.
+    """
+
+    results = {}
+    for phase, num_items, run_phase in run_phases(num_routes, stops_per_route,
+            transfer_density, closure_ratio, num_queries):
+        best_time = None
+        for i in range(repeat):
+            start_time = time.perf_counter()
+            run_phase()
+            elapsed = time.perf_counter() - start_time
+            if best_time is None or elapsed < best_time:
+                best_time = elapsed
+        # the memory is measured in a separate run, as tracing slows it down
+        tracemalloc.start()
+        run_phase()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[phase] = {"seconds": best_time, "items_per_second": num_items / best_time,
+            "peak_memory": peak_memory}
+    return results
+
+def find_regressions(results, baseline, threshold, memory_threshold=None):
+    """Returns the list of (phase, measure, value, baseline value) for the
+    phases which are slower than the baseline by more than the threshold, with
+    the measure "seconds", or use more peak memory than the baseline by more
+    than the memory threshold, with the measure "peak_memory". The memory is
+    not checked if memory_threshold is None or the baseline has no memory.
+    """
+
+    regressions = []
+    for phase, result in results.items():
+        if phase not in baseline:
+            continue
+        baseline_seconds = baseline[phase]["seconds"]
+        if result["seconds"] > baseline_seconds * (1 + threshold):
+            regressions.append((phase, "seconds", result["seconds"], baseline_seconds))
+        baseline_memory = baseline[phase].get("peak_memory")
+        if (memory_threshold is not None and baseline_memory is not None
+                and result["peak_memory"] > baseline_memory * (1 + memory_threshold)):
+            regressions.append((phase, "peak_memory", result["peak_memory"], baseline_memory))
+    return regressions
+
+def main():
+    myParser = argparse.ArgumentParser(description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter)
+    myParser.add_argument('--size', type=str, default="medium", choices=sorted(SIZES),
+        help="the size of the synthetic network, the default is medium.")
+    myParser.add_argument('--routes', type=int,
+        help="the number of routes, overrides the size.")
+    myParser.add_argument('--stops-per-route', type=int,
+        help="the number of stops on each route, overrides the size.")
+    myParser.add_argument('--transfer-density', type=float,
+        help="the probability that a stop of a route is shared with an earlier route, overrides the size.")
+    myParser.add_argument('--closure-ratio', type=float,
+        help="the fraction of the stops closed in the closures phase, overrides the size.")
+    myParser.add_argument('--queries', type=int, default=1000,
+        help="the number of routing queries, the default is 1000.")
+    myParser.add_argument('--repeat', type=int, default=3,
+        help="the number of timed runs of each phase, the best one is reported.")
+    myParser.add_argument('--baseline', type=str, default="benchmark_baseline.json",
+        help="the json file with the baseline times, the default is benchmark_baseline.json.")
+    myParser.add_argument('--save-baseline', action='store_true',
+        help="save the times of this run as the baseline of this size.")
+    myParser.add_argument('--check', action='store_true',
+        help="fail if a phase is slower or uses more memory than the baseline by more than the thresholds.")
+    myParser.add_argument('--threshold', type=float, default=0.25,
+        help="the allowed slowdown over the baseline, the default is 0.25 (25%%).")
+    myParser.add_argument('--memory-threshold', type=float, default=0.25,
+        help="the allowed growth of the peak memory over the baseline, the default is 0.25 (25%%).")
+    args = myParser.parse_args()
+
+    network_size = list(SIZES[args.size])
+    for index, value in enumerate((args.routes, args.stops_per_route,
+            args.transfer_density, args.closure_ratio)):
+        if value is not None:
+            network_size[index] = value
+    # the baseline of a custom network is saved under its parameters
+    if tuple(network_size) == SIZES[args.size]:
+        baseline_key = args.size
+    else:
+        baseline_key = "%i-%i-%g-%g" % tuple(network_size)
+
+    results = run_benchmark(*network_size, num_queries=args.queries, repeat=args.repeat)
+    print("%-10s %12s %16s %14s" % ("phase", "seconds", "items/second", "peak MB"))
+    for phase, result in results.items():
+        print("%-10s %12.4f %16.0f %14.2f" % (phase, result["seconds"],
+            result["items_per_second"], result["peak_memory"] / 1e6))
+
+    try:
+        with open(args.baseline, "r") as baseline_file:
+            baselines = json.load(baseline_file)
+    except FileNotFoundError:
+        baselines = {}
+
+    if args.save_baseline:
+        baselines[baseline_key] = results
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(baselines, baseline_file, indent=2)
+        print("Saved the baseline of size %s to %s." % (baseline_key, args.baseline))
+
+    if args.check:
+        if baseline_key not in baselines:
+            print("There is no baseline of size %s in %s." % (baseline_key, args.baseline))
+            sys.exit(2)
+        regressions = find_regressions(results, baselines[baseline_key], args.threshold,
+            args.memory_threshold)
+        for phase, measure, value, baseline_value in regressions:
+            if measure == "seconds":
+                print("Regression in phase %s: %.4f seconds, the baseline is %.4f seconds."
+                    % (phase, value, baseline_value))
+            else:
+                print("Regression in phase %s: %.2f peak MB, the baseline is %.2f peak MB."
+                    % (phase, value / 1e6, baseline_value / 1e6))
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Batch trip queries, e.g. for the stop pairs of an origin-destination matrix.
+Each query is a source stop, a destination stop and a closure set, read from
+a CSV file with the columns source, destination and closures, or from a
+JSONL file with the same keys.
+
+The closure set is a mode name such as "covid19", the closed stop names
+separated by ";" (a list in JSONL), or in JSONL a closure scenario object
+like the --closures file. No closure set is normal mode.
+
+The stop names are resolved once for each distinct name, and the queries are
+grouped by closure set and source stop. Each closure set is compiled once,
+and each group searches the routes from its source once with a RouteTree,
+which then answers every destination of the group. The groups are answered
+in a process pool and the results are yielded as soon as a group is done,
+so they do not come in the order of the queries: each result has the row
+number of its query.
+"""
+
+import csv
+import json
+import os
+from multiprocessing import Pool
+
+import mbta_profile
+from mbta_closures import SCENARIOS, ClosureScenario
+from mbta_network import MBTANetwork
+
+# the most queries answered by one task of the process pool
+TASK_SIZE = 20000
+
+def read_queries(file_name):
+    """Yields a (source, destination, closures) tuple for each query of the
+    file. The file is read as JSONL if its name ends with .jsonl, .ndjson or
+    .json, otherwise as CSV with a header row.
+    """
+
+    with open(file_name, "r", newline="") as query_file:
+        if file_name.endswith((".jsonl", ".ndjson", ".json")):
+            for line in query_file:
+                if line.strip():
+                    query = json.loads(line)
+                    yield query.get("source", ""), query.get("destination", ""), query.get("closures")
+        else:
+            for query in csv.DictReader(query_file):
+                yield query.get("source") or "", query.get("destination") or "", query.get("closures")
+
+def get_closure_key(closures):
+    """Returns a hashable key for the closure set of a query, the same for the
+    closure sets which close the same stops and routes.
+    """
+
+    if not closures:
+        return "normal"
+    if isinstance(closures, dict):
+        return json.dumps(closures, sort_keys=True)
+    if isinstance(closures, str):
+        if closures in SCENARIOS:
+            return closures
+        closures = closures.split(";")
+    return tuple(sorted({stop_name.strip() for stop_name in closures if stop_name.strip()}))
+
+def get_closure_scenario(closure_key):
+    """Returns the ClosureScenario of a key made by get_closure_key().
+    """
+
+    if isinstance(closure_key, tuple):
+        return ClosureScenario("custom", closure_key)
+    if closure_key in SCENARIOS:
+        return SCENARIOS[closure_key]
+    return ClosureScenario.from_dict(json.loads(closure_key))
+
+def get_error_result(row, reader, src_stop, dest_stop, src_valid, suggestions):
+    """Helper method for group_queries(). Returns the result of a query with an
+    invalid stop name, in the same format as MBTADataReader.get_trip(). The
+    suggestions of each invalid name are kept in the suggestions dictionary,
+    so they are only searched once.
+    """
+
+    if src_valid:
+        error = "The destination stop name is invalid."
+        invalid_stop = dest_stop
+    else:
+        error = "The source stop name is invalid."
+        invalid_stop = src_stop
+    stop_suggestions = suggestions.get(invalid_stop)
+    if stop_suggestions is None:
+        stop_suggestions = suggestions[invalid_stop] = reader.suggest_stop_names(invalid_stop)
+    return {"row": row, "source": src_stop, "destination": dest_stop, "routes": None, "error": error,
+        "suggestions": list(stop_suggestions)}
+
+def group_queries(reader, queries, task_size=TASK_SIZE):
+    """Resolves the stop names of the queries with the reader and groups them.
+    Returns the results of the queries with an invalid stop name and the list
+    of tasks. A task is the closure key, the source stop and the list of
+    (row, destination stop) of at most task_size queries.
+    """
+
+    # key is a stop name of the queries and value is the resolved stop name,
+    # so each distinct name is resolved once
+    resolved_names = {}
+    closure_keys = {}
+    error_results = []
+    # key is an invalid stop name and value is the stop names it may mean
+    suggestions = {}
+    # key is (closure key, source stop) and value is the list of (row,
+    # destination stop) of the queries of the group
+    groups = {}
+    for row, (src_stop, dest_stop, closures) in enumerate(queries):
+        resolved_src = resolved_names.get(src_stop, False)
+        if resolved_src is False:
+            resolved_src = resolved_names[src_stop] = reader.resolve_stop_name(src_stop)
+        resolved_dest = resolved_names.get(dest_stop, False)
+        if resolved_dest is False:
+            resolved_dest = resolved_names[dest_stop] = reader.resolve_stop_name(dest_stop)
+        if (resolved_src is None or resolved_dest is None):
+            error_results.append(get_error_result(row, reader, src_stop, dest_stop,
+                resolved_src is not None, suggestions))
+            continue
+        if isinstance(closures, (dict, list)):
+            closure_key = get_closure_key(closures)
+        else:
+            closure_key = closure_keys.get(closures)
+            if closure_key is None:
+                closure_key = closure_keys[closures] = get_closure_key(closures)
+        groups.setdefault((closure_key, resolved_src), []).append((row, resolved_dest))
+
+    tasks = []
+    for (closure_key, src_stop), dest_list in groups.items():
+        for start in range(0, len(dest_list), task_size):
+            tasks.append((closure_key, src_stop, dest_list[start:start + task_size]))
+    return error_results, tasks
+
+class BatchRouter:
+    """Answers the tasks of group_queries() on a network. The closure sets are
+    compiled once, and the open routes of each destination stop are kept for
+    each closure set.
+    """
+
+    def __init__(self, network):
+        self.network = network
+        # key is a closure key and value is the CompiledClosures
+        self.compiled_closures = {}
+        # key is a closure key and value is a dictionary where key is a stop
+        # and value is its open routes
+        self.route_masks = {}
+        # key is a stop and value is its name encoded as JSON
+        self.stop_json = {}
+
+    def get_closures(self, closure_key):
+        closures = self.compiled_closures.get(closure_key)
+        if closures is None:
+            closures = get_closure_scenario(closure_key).compile(self.network)
+            self.compiled_closures[closure_key] = closures
+        return closures
+
+    def get_dest_route_mask(self, route_masks, closures, dest_stop):
+        """Helper method for answer_task() and answer_task_json(). Returns the 
+        open routes of the destination stop under the closures and keeps them 
+        in the route masks of the closure set.
+        """
+
+        dest_route_mask = self.network.open_route_mask(dest_stop, closures.stop_mask) & ~closures.route_mask
+        route_masks[dest_stop] = dest_route_mask
+        return dest_route_mask
+
+    def answer_task(self, task):
+        """Returns the list of the results of the queries of the task, in the
+        same format as MBTADataReader.get_trip().
+        """
+
+        closure_key, src_stop, dest_list = task
+        closures = self.get_closures(closure_key)
+        route_masks = self.route_masks.setdefault(closure_key, {})
+        tree = self.network.route_tree(src_stop, closures.stop_mask, closures.route_mask)
+        results = []
+        for row, dest_stop in dest_list:
+            dest_route_mask = route_masks.get(dest_stop)
+            if dest_route_mask is None:
+                dest_route_mask = self.get_dest_route_mask(route_masks, closures, dest_stop)
+            results.append({"row": row, "source": src_stop, "destination": dest_stop,
+                "routes": tree.find_routes(dest_route_mask), "error": None, "suggestions": []})
+        return results
+
+    def answer_task_json(self, task):
+        """Same as answer_task(), but returns the results as JSON lines. The stop 
+        names and the route list of each last route are encoded once, and the 
+        lines are put together from them, which is much faster than encoding 
+        each result with json.dumps().
+        """
+
+        closure_key, src_stop, dest_list = task
+        closures = self.get_closures(closure_key)
+        route_masks = self.route_masks.setdefault(closure_key, {})
+        tree = self.network.route_tree(src_stop, closures.stop_mask, closures.route_mask)
+        stop_json = self.stop_json
+        line_start = ', "source": %s, "destination": ' % json.dumps(src_stop)
+        # key is the last route index and value is the route list as JSON
+        routes_json = {None: "null"}
+        lines = []
+        for row, dest_stop in dest_list:
+            dest_json = stop_json.get(dest_stop)
+            if dest_json is None:
+                dest_json = stop_json[dest_stop] = json.dumps(dest_stop)
+            dest_route_mask = route_masks.get(dest_stop)
+            if dest_route_mask is None:
+                dest_route_mask = self.get_dest_route_mask(route_masks, closures, dest_stop)
+            last_route = tree.find_last_route(dest_route_mask)
+            route_list_json = routes_json.get(last_route)
+            if route_list_json is None:
+                route_list_json = routes_json[last_route] = json.dumps(tree.find_routes(1 << last_route))
+            lines.append('{"row": %i%s%s, "routes": %s, "error": null, "suggestions": []}\n' % (row,
+                line_start, dest_json, route_list_json))
+        return "".join(lines)
+
+# the router of a worker process, set by init_worker()
+worker_router = None
+
+def init_worker(route_to_stops_dict, stop_names):
+    global worker_router
+    worker_router = BatchRouter(MBTANetwork(route_to_stops_dict, stop_names))
+
+def answer_task(task):
+    return worker_router.answer_task(task)
+
+def answer_task_json(task):
+    return worker_router.answer_task_json(task)
+
+def iter_trip_results(reader, queries, processes=1, as_json=False):
+    """Yields the result of each query of the queries, an iterable of (source,
+    destination, closures) tuples, with the routes of the loaded reader. With
+    processes 1 the queries are answered in this process, otherwise by a
+    process pool of that size. None means the number of CPUs, and with one
+    CPU the queries are answered in this process too. With as_json, the
+    results are yielded as blocks of JSON lines.
+    """
+
+    with mbta_profile.profiler.timer("phase", "group_queries"):
+        error_results, tasks = group_queries(reader, queries)
+    for result in error_results:
+        yield json.dumps(result) + "\n" if as_json else result
+    if not tasks:
+        return
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if processes == 1:
+        router = BatchRouter(reader.network)
+        for task in tasks:
+            if as_json:
+                yield router.answer_task_json(task)
+            else:
+                yield from router.answer_task(task)
+        return
+    # the network is rebuilt in each worker from the dictionaries read back 
+    # from it
+    init_args = (reader.network.get_route_to_stops_dict(), reader.network.get_stop_names())
+    with Pool(processes, initializer=init_worker, initargs=init_args) as pool:
+        if as_json:
+            yield from pool.imap_unordered(answer_task_json, tasks)
+        else:
+            for results in pool.imap_unordered(answer_task, tasks):
+                yield from results
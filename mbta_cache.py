@@ -0,0 +1,92 @@
+"""On-disk snapshot cache for MBTA API responses. Each decoded response is
+saved as compressed json in a SQLite database, keyed by the API path and the
+query parameters, together with the ETag and Last-Modified headers of the
+response so it can be revalidated with a conditional request.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+
+class Snapshot:
+    """One cached response.
+    """
+
+    __slots__ = ("data", "etag", "last_modified", "fetched_at")
+
+    def __init__(self, data, etag, last_modified, fetched_at):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+class SnapshotCache:
+    """Saves and loads snapshots of API responses. A snapshot is fresh for ttl
+    seconds after it was fetched or revalidated.
+    """
+
+    def __init__(self, path, ttl=3600):
+        self.path = path
+        self.ttl = ttl
+        # the cache is shared by the threads of the client, so one connection
+        # is used with a lock around it
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS snapshots ("
+                "key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                "fetched_at REAL NOT NULL, body BLOB NOT NULL)")
+
+    @staticmethod
+    def make_key(path, params=None):
+        """Returns the cache key for the given API path and query parameters.
+        """
+
+        if not params:
+            return path
+        return path + "?" + urlencode(sorted(params.items()))
+
+    def load(self, key):
+        """Returns the snapshot saved with the given key, or None if there is
+        no snapshot.
+        """
+
+        with self.lock:
+            row = self.connection.execute("SELECT etag, last_modified, fetched_at, body "
+                "FROM snapshots WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        etag, last_modified, fetched_at, body = row
+        return Snapshot(json.loads(zlib.decompress(body)), etag, last_modified, fetched_at)
+
+    def store(self, key, data, etag=None, last_modified=None):
+        """Saves the decoded response data with the given key.
+        """
+
+        body = zlib.compress(json.dumps(data, separators=(",", ":")).encode())
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO snapshots "
+                "(key, etag, last_modified, fetched_at, body) VALUES (?, ?, ?, ?, ?)",
+                (key, etag, last_modified, time.time(), body))
+
+    def touch(self, key):
+        """Marks the snapshot with the given key as revalidated now.
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute("UPDATE snapshots SET fetched_at = ? WHERE key = ?",
+                (time.time(), key))
+
+    def is_fresh(self, snapshot):
+        """Returns True if the snapshot was fetched or revalidated less than
+        ttl seconds ago.
+        """
+
+        return time.time() - snapshot.fetched_at < self.ttl
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
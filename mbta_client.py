@@ -0,0 +1,250 @@
+"""HTTP client for the MBTA API (https://api-v3.mbta.com/). All the requests
+share one pooled session with keep-alive, a timeout, and retry with backoff.
+Several requests can be sent concurrently with a bounded thread pool, and a
+token bucket keeps the request rate under the MBTA rate limit. If a snapshot
+cache is given, decoded responses are served from the cache while they are
+fresh and revalidated with conditional requests when they are stale.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import mbta_profile
+
+API_URL = "https://api-v3.mbta.com"
+
+# The MBTA API allows 20 requests per minute without an API key and 1000
+# requests per minute with an API key.
+RATE_LIMIT_WITHOUT_KEY = 20 / 60
+RATE_LIMIT_WITH_KEY = 1000 / 60
+
+class TokenBucket:
+    """Thread safe token bucket. Tokens are added at a fixed rate up to the
+    capacity of the bucket, and every request takes one token.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1, rate)
+        self.tokens = self.capacity
+        self.last_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Takes one token from the bucket. If the bucket is empty, this method
+        waits until a new token is added.
+        """
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_time) * self.rate)
+                self.last_time = now
+                if (self.tokens >= 1):
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+def get_transferred_bytes(resp):
+    """Returns the number of body bytes of the response as they were 
+    transferred, before a gzip or deflate content encoding is decoded.
+    """
+
+    # reading the content first makes sure the raw stream is fully read
+    content = resp.content
+    try:
+        return resp.raw.tell()
+    except (AttributeError, OSError):
+        return len(content)
+
+class MBTAClient:
+    """Sends GET requests to the MBTA API with one shared session.
+    """
+
+    def __init__(self, base_url=API_URL, api_key=None, timeout=10.0, max_workers=4,
+            retries=3, backoff_factor=0.5, rate_limit=None, cache=None, offline=False):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.cache = cache
+        self.offline = offline
+
+        # the connection pool holds one connection per worker so concurrent
+        # requests can all reuse their connections
+        retry = Retry(total=retries, backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504), allowed_methods=("GET",),
+            respect_retry_after_header=True, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["x-api-key"] = api_key
+
+        if rate_limit is None:
+            rate_limit = RATE_LIMIT_WITH_KEY if api_key else RATE_LIMIT_WITHOUT_KEY
+            # allow a full minute worth of requests as the burst size
+            self.rate_limiter = TokenBucket(rate_limit, rate_limit * 60)
+        elif rate_limit > 0:
+            self.rate_limiter = TokenBucket(rate_limit)
+        else:
+            self.rate_limiter = None
+
+    def get(self, path, params=None, headers=None):
+        """Sends a GET request for the given API path, e.g. "/routes", and
+        returns the response.
+        """
+
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+        endpoint = path.split("?", 1)[0]
+        with mbta_profile.profiler.timer("http_request", endpoint):
+            resp = self.session.get(self.base_url + path, params=params, headers=headers,
+                timeout=self.timeout)
+        mbta_profile.profiler.add("http_requests", 1, endpoint)
+        mbta_profile.profiler.add("http_bytes", get_transferred_bytes(resp), endpoint)
+        return resp
+
+    def get_json(self, path, params=None):
+        """Returns the status code and the decoded json data of the response 
+        for the given API path. With a cache, a fresh snapshot is returned 
+        without any request, and a stale snapshot is revalidated with the 
+        If-None-Match and If-Modified-Since headers, so the server can answer 
+        304 without a body. In offline mode only the cache is used, and the 
+        status code is 504 if there is no snapshot. The data is None if the 
+        status code is not 200.
+        """
+
+        if self.cache is None:
+            resp = self.get(path, params)
+            if resp.status_code != 200:
+                return resp.status_code, None
+            with mbta_profile.profiler.timer("json_decode"):
+                return resp.status_code, resp.json()
+
+        key = self.cache.make_key(path, params)
+        snapshot = self.cache.load(key)
+        if snapshot is not None and (self.offline or self.cache.is_fresh(snapshot)):
+            mbta_profile.profiler.add("cache_hits")
+            return 200, snapshot.data
+        if self.offline:
+            mbta_profile.profiler.add("cache_misses")
+            return 504, None
+
+        headers = {}
+        if snapshot is not None:
+            if snapshot.etag:
+                headers["If-None-Match"] = snapshot.etag
+            if snapshot.last_modified:
+                headers["If-Modified-Since"] = snapshot.last_modified
+        resp = self.get(path, params, headers)
+        if resp.status_code == 304 and snapshot is not None:
+            mbta_profile.profiler.add("cache_revalidated")
+            self.cache.touch(key)
+            return 200, snapshot.data
+        mbta_profile.profiler.add("cache_misses")
+        if resp.status_code != 200:
+            return resp.status_code, None
+        with mbta_profile.profiler.timer("json_decode"):
+            data = resp.json()
+        self.cache.store(key, data, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+        return resp.status_code, data
+
+    def iter_pages(self, path, params=None):
+        """Gets the given API path with get_json() and follows the JSON:API 
+        "next" paging links until the last page. Yields the (status code, page) 
+        pair of each response as soon as it is received, so the caller can 
+        drop a page before the next one is requested. It stops after the first 
+        failed response, whose page is None.
+        """
+
+        status_code, page = self.get_json(path, params)
+        while True:
+            yield status_code, page
+            if status_code != 200:
+                return
+            next_link = (page.get("links") or {}).get("next")
+            if not next_link:
+                return
+            # the next link can be a full URL or a path relative to the API
+            next_url = urljoin(self.base_url + "/", next_link)
+            if not next_url.startswith(self.base_url):
+                raise ValueError("The next page link %s is not an MBTA API link." % next_link)
+            status_code, page = self.get_json(next_url[len(self.base_url):])
+
+    def get_pages(self, path, params=None):
+        """Same as iter_pages(), but returns the status code of the last response 
+        and the list of decoded pages. If a request fails, the pages received 
+        before it are returned with its status code.
+        """
+
+        page_list = []
+        status_code = 200
+        for status_code, page in self.iter_pages(path, params):
+            if status_code == 200:
+                page_list.append(page)
+        return status_code, page_list
+
+    def iter_many(self, path, params_list):
+        """Gets the given API path with get_json() for each of the given query 
+        parameters. At most max_workers requests are sent at the same time. 
+        Yields the (status code, data) pairs in the same order as params_list, 
+        each one as soon as it and the ones before it are received.
+        """
+
+        return self.map_bounded(lambda params: self.get_json(path, params), params_list)
+
+    def iter_many_pages(self, path, params_list):
+        """Same as iter_many(), but follows the paging links of each request. 
+        Yields a (params, status code, page) tuple for each page, the pages of 
+        each params in order. If a page of a params fails, the pages before it 
+        are yielded first and then its status code with None as the page.
+        """
+
+        def get_pages(params):
+            return params, self.get_pages(path, params)
+        for params, (status_code, page_list) in self.map_bounded(get_pages, params_list):
+            for page in page_list:
+                yield params, 200, page
+            if status_code != 200:
+                yield params, status_code, None
+
+    def map_bounded(self, function, items):
+        """Helper method for iter_many() and iter_many_pages(). Yields the 
+        results of the function for the items in order, computed by max_workers 
+        threads. Only twice as many results as workers are computed ahead of 
+        the caller, so the memory used does not grow with the number of items.
+        """
+
+        if (len(items) <= 1 or self.max_workers <= 1):
+            for item in items:
+                yield function(item)
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = deque()
+            for item in items:
+                futures.append(executor.submit(function, item))
+                if len(futures) >= 2 * self.max_workers:
+                    yield futures.popleft().result()
+            while futures:
+                yield futures.popleft().result()
+
+    def get_many(self, path, params_list):
+        """Same as iter_many(), but returns the list of (status code, data) pairs.
+        """
+
+        return list(self.iter_many(path, params_list))
+
+    def close(self):
+        """Closes all the pooled connections.
+        """
+
+        self.session.close()
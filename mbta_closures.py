@@ -0,0 +1,115 @@
+"""Closure scenarios for trip queries. A scenario is a set of rules saying
+which stops and routes are closed: explicit stop names, functions or regular
+expressions matched against the stop names, and whole routes. A scenario is
+compiled once for a network into a stop bitset and a route bitset, which the
+network uses to look up the transfer graph for that closure set.
+"""
+
+import re
+
+class CompiledClosures:
+    """The closed stops and routes of a scenario as bitsets of a network.
+    """
+
+    __slots__ = ("stop_mask", "route_mask")
+
+    def __init__(self, stop_mask, route_mask):
+        self.stop_mask = stop_mask
+        self.route_mask = route_mask
+
+class ClosureScenario:
+    """Rules which say which stops and routes are closed.
+    stops is a list of closed stop names or keys, name_predicates is a list of
+    functions which take a stop name and return True if the stop is closed,
+    name_patterns is a list of regular expressions which close the stops whose
+    name they match, and routes is a list of closed route ids. Two scenarios
+    with the same rules are equal whatever their names, so a scenario built
+    again for every query is compiled only once.
+    """
+
+    def __init__(self, name, stops=(), name_predicates=(), name_patterns=(), routes=()):
+        self.name = name
+        self.stops = frozenset(stops)
+        self.name_predicates = tuple(name_predicates)
+        self.name_patterns = tuple(re.compile(pattern) for pattern in name_patterns)
+        self.routes = frozenset(routes)
+
+    def get_rules(self):
+        """Helper method for __eq__() and __hash__(). Returns the rules of the
+        scenario as a hashable tuple. The functions are compared by identity.
+        """
+
+        return (self.stops, self.name_predicates,
+            frozenset((pattern.pattern, pattern.flags) for pattern in self.name_patterns),
+            self.routes)
+
+    def __eq__(self, other):
+        if not isinstance(other, ClosureScenario):
+            return NotImplemented
+        return self.get_rules() == other.get_rules()
+
+    def __hash__(self):
+        return hash(self.get_rules())
+
+    @classmethod
+    def from_dict(cls, scenario_data):
+        """Builds a scenario from a dictionary with the keys "name", "stops",
+        "name_patterns" and "routes", e.g. one read from a json file.
+        """
+
+        return cls(scenario_data.get("name", "custom"), scenario_data.get("stops", ()),
+            name_patterns=scenario_data.get("name_patterns", ()),
+            routes=scenario_data.get("routes", ()))
+
+    def is_stop_closed(self, stop_name, stop_key=None):
+        """Returns True if the rules close the stop with the given name and key.
+        """
+
+        if (stop_name in self.stops or stop_key in self.stops):
+            return True
+        for predicate in self.name_predicates:
+            if predicate(stop_name):
+                return True
+        for pattern in self.name_patterns:
+            if pattern.search(stop_name):
+                return True
+        return False
+
+    def closed_stop_names(self, stop_names):
+        """Returns the set of the given stop names which are closed.
+        """
+
+        return {stop_name for stop_name in stop_names if self.is_stop_closed(stop_name)}
+
+    def compile(self, network):
+        """Returns the closed stops and routes of the given network as bitsets.
+        The rules are applied once to every stop name of the network.
+        """
+
+        stop_mask = 0
+        for stop in network.stops:
+            if self.is_stop_closed(stop.name, stop.key):
+                stop_mask |= 1 << stop.index
+        route_mask = 0
+        for route_id in self.routes:
+            route_index = network.route_index.get(route_id)
+            if route_index is not None:
+                route_mask |= 1 << route_index
+        return CompiledClosures(stop_mask, route_mask)
+
+    def update_compiled(self, closures, network_update):
+        """Returns the compiled closures of this scenario after the network was
+        patched with the given NetworkUpdate. Only the added stops are checked
+        against the rules.
+        """
+
+        stop_mask, route_mask = network_update.apply_to_mask(closures.stop_mask, closures.route_mask,
+            self.is_stop_closed, self.routes.__contains__)
+        return CompiledClosures(stop_mask, route_mask)
+
+# any stop with a name that includes a word starting with C, O, V, I, or D
+# is closed in covid19 mode
+SCENARIOS = {
+    "normal": ClosureScenario("normal"),
+    "covid19": ClosureScenario("covid19", name_patterns=[r"(?:^|\s)[COVID]"]),
+}
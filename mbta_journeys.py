@@ -0,0 +1,339 @@
+"""Stop level journey search. The routes are kept as ordered stop sequences,
+one pattern for each direction and branch of a route, so a journey can say
+where to board and alight each route and how many stops it travels, not only
+which routes to take.
+
+The search works in rounds like RAPTOR: round k finds, for every stop, the
+fewest stops traveled to reach it with k rides, by scanning each pattern
+which serves a stop improved in round k-1 once, in stop order. A stop only
+keeps a new label if it travels fewer stops than all the labels with fewer
+rides, so the destination labels of the rounds are the Pareto-optimal
+journeys for (transfers, stops). The first one has the fewest transfers, and
+the fewest stops among the journeys with that many transfers.
+"""
+
+from functools import lru_cache
+
+import mbta_profile
+from mbta_network import iter_bits
+
+# number of closed stop sets kept by JourneyPlanner.closed_stops()
+CLOSED_STOPS_CACHE_SIZE = 16
+
+class Leg:
+    """One ride of a journey: the route and direction taken, the stops where
+    it is boarded and alighted, and the number of stops traveled on it.
+    """
+
+    __slots__ = ("route_id", "direction", "board_stop", "alight_stop", "num_stops")
+
+    def __init__(self, route_id, direction, board_stop, alight_stop, num_stops):
+        self.route_id = route_id
+        self.direction = direction
+        self.board_stop = board_stop
+        self.alight_stop = alight_stop
+        self.num_stops = num_stops
+
+    def to_dict(self):
+        return {"route": self.route_id, "direction": self.direction,
+            "board": self.board_stop.name, "board_key": self.board_stop.key,
+            "alight": self.alight_stop.name, "alight_key": self.alight_stop.key,
+            "num_stops": self.num_stops}
+
+class Journey:
+    """The ordered legs of a trip from a source stop to a destination stop.
+    """
+
+    __slots__ = ("legs",)
+
+    def __init__(self, legs):
+        self.legs = legs
+
+    @property
+    def num_transfers(self):
+        return max(len(self.legs) - 1, 0)
+
+    @property
+    def num_stops(self):
+        return sum(leg.num_stops for leg in self.legs)
+
+    def route_ids(self):
+        return [leg.route_id for leg in self.legs]
+
+    def to_dict(self):
+        return {"legs": [leg.to_dict() for leg in self.legs],
+            "num_transfers": self.num_transfers, "num_stops": self.num_stops}
+
+class JourneyPlanner:
+    """Stop sequences of the routes of a network. route_to_sequence_dict is a
+    dictionary where key is the route id and value is the list of the
+    (direction, stop keys) patterns of the route, each with its stops in
+    travel order, see MBTADataReader.read_stop_data(). Each pattern is ridden
+    only in its own direction, so the branches of a route are not mixed. A
+    pattern with the direction None is ridden both ways, as direction 0 in
+    its order and direction 1 in reverse order, and so is a route without
+    patterns in the order of its stop ids. The stops of a route which are in
+    none of its patterns are added to the end of each pattern, so every stop
+    can be reached. The planner must be built again after the network is
+    updated.
+    """
+
+    __slots__ = ("network", "patterns", "pattern_routes", "pattern_directions", "stop_patterns",
+        "closed_stops")
+
+    def __init__(self, network, route_to_sequence_dict):
+        self.network = network
+        # each pattern is the tuple of the stop ids of one direction of a route
+        self.patterns = []
+        self.pattern_routes = []
+        self.pattern_directions = []
+        # item i is the list of (pattern, position) of the patterns of stop i
+        self.stop_patterns = [[] for stop in network.stops]
+        for route in network.routes:
+            route_patterns = []
+            # the stops of the route which are in one of its patterns
+            covered_ids = set()
+            for direction, sequence in route_to_sequence_dict.get(route.route_id) or ():
+                stop_id_list = []
+                seen_ids = set()
+                for stop_key in sequence:
+                    stop_id = network.stop_index.get(stop_key)
+                    if (stop_id is not None and stop_id not in seen_ids
+                            and (network.stops[stop_id].route_mask >> route.index) & 1):
+                        seen_ids.add(stop_id)
+                        stop_id_list.append(stop_id)
+                if stop_id_list:
+                    route_patterns.append((direction, stop_id_list))
+                    covered_ids |= seen_ids
+            if not route_patterns:
+                route_patterns.append((None, []))
+            missing_ids = [stop_id for stop_id in iter_bits(route.stop_mask) if stop_id not in covered_ids]
+            seen_patterns = set()
+            for direction, stop_id_list in route_patterns:
+                stop_id_list = stop_id_list + missing_ids
+                if direction is None:
+                    directed_patterns = ((0, stop_id_list), (1, stop_id_list[::-1]))
+                else:
+                    directed_patterns = ((direction, stop_id_list),)
+                for direction, stop_ids in directed_patterns:
+                    stop_ids = tuple(stop_ids)
+                    # the same stops in the same direction are one pattern
+                    if (direction, stop_ids) in seen_patterns:
+                        continue
+                    seen_patterns.add((direction, stop_ids))
+                    pattern = len(self.patterns)
+                    self.patterns.append(stop_ids)
+                    self.pattern_routes.append(route.index)
+                    self.pattern_directions.append(direction)
+                    for position, stop_id in enumerate(stop_ids):
+                        self.stop_patterns[stop_id].append((pattern, position))
+        self.closed_stops = lru_cache(maxsize=CLOSED_STOPS_CACHE_SIZE)(self.get_closed_stops)
+
+    def get_closed_stops(self, closed_mask):
+        """Helper method for find_journeys(). Returns the byte array where item
+        i is 1 if stop i is closed, as testing a byte is faster than shifting
+        a large bitset.
+        """
+
+        closed = bytearray(len(self.network.stops))
+        for stop_id in iter_bits(closed_mask):
+            closed[stop_id] = 1
+        return closed
+
+    def get_open_stop_ids(self, stop, closed):
+        """Helper method for find_journeys(). Returns the ids of the stops with
+        the given key or name which are not closed. Raises KeyError if no stop
+        has that key or name.
+        """
+
+        stop_ids = self.network.get_stop_ids(stop)
+        if not stop_ids:
+            raise KeyError(stop)
+        return [stop_id for stop_id in stop_ids if not closed[stop_id]]
+
+    def find_journeys(self, src_stop, dest_stop, closed_mask=0, closed_route_mask=0, first_only=False):
+        """Returns the list of the Pareto-optimal journeys from the source stop
+        to the destination stop, with fewer transfers first and fewer stops
+        last, or an empty list if no journey is possible. The stops are given
+        by key or by name, a name stands for all the stops with that name.
+        Closed stops can not be boarded or alighted, but the routes still pass
+        them, and closed routes can not be ridden. With first_only, the search
+        stops at the journey with the fewest transfers. Raises KeyError if a
+        stop is not in the network.
+        """
+
+        closed = self.closed_stops(closed_mask)
+        src_ids = self.get_open_stop_ids(src_stop, closed)
+        dest_ids = self.get_open_stop_ids(dest_stop, closed)
+        if (not src_ids or not dest_ids):
+            return []
+        shared_ids = [stop_id for stop_id in src_ids if stop_id in dest_ids]
+        if shared_ids:
+            journey = self.get_stay_journey(shared_ids, closed_route_mask)
+            return [journey] if journey is not None else []
+
+        route_levels = self.get_route_levels(dest_ids, closed_mask, closed_route_mask)
+        no_label = len(self.network.stops) + 1
+        # a route can only be ridden in a round if the destination can still 
+        # be reached with the rides left, with first_only the fewest rides of 
+        # the route graph are tried first
+        min_rides = no_label
+        for stop_id in src_ids:
+            for route_index in iter_bits(self.network.stops[stop_id].route_mask):
+                min_rides = min(min_rides, route_levels[route_index] + 1)
+        if (min_rides >= no_label):
+            return []
+        if not first_only:
+            return self.scan_rounds(src_ids, dest_ids, closed, route_levels, no_label, False)
+        journeys = self.scan_rounds(src_ids, dest_ids, closed, route_levels, min_rides, True)
+        if not journeys:
+            # riding a route twice, e.g. from one branch back to the other,
+            # needs more rides than the route graph says
+            journeys = self.scan_rounds(src_ids, dest_ids, closed, route_levels, no_label, True)
+        return journeys
+
+    def scan_rounds(self, src_ids, dest_ids, closed, route_levels, max_rides, first_only):
+        """Helper method for find_journeys(). Scans the patterns round by round 
+        from the source stops with at most max_rides rides, and returns the 
+        journeys to the destination stops found in the rounds, only the first 
+        one with first_only.
+        """
+
+        no_label = len(self.network.stops) + 1
+        patterns = self.patterns
+        pattern_routes = self.pattern_routes
+        stop_patterns = self.stop_patterns
+        # the fewest stops traveled to each reached stop with any number of
+        # rides, a dictionary as most queries reach few of the stops
+        best = {}
+        # item k is a dictionary where key is a stop id and value is (stops
+        # traveled, pattern, board position, alight position) of the stops
+        # improved with k rides
+        labels = [{}]
+        for stop_id in src_ids:
+            best[stop_id] = 0
+            labels[0][stop_id] = (0, None, None, None)
+        best_dest = no_label
+        journeys = []
+        visits = 0
+        while (labels[-1] and len(labels) <= max_rides):
+            previous = labels[-1]
+            rides_left = max_rides - len(labels)
+            # each pattern is scanned from the first position where one of its
+            # stops was improved in the last round
+            pattern_starts = {}
+            for stop_id in previous:
+                for pattern, position in stop_patterns[stop_id]:
+                    if (position < pattern_starts.get(pattern, no_label)
+                            and route_levels[pattern_routes[pattern]] <= rides_left):
+                        pattern_starts[pattern] = position
+            current = {}
+            for pattern, start in pattern_starts.items():
+                stop_ids = patterns[pattern]
+                # the stops traveled at the boarding stop minus its position
+                board_offset = no_label
+                board_position = start
+                for position in range(start, len(stop_ids)):
+                    stop_id = stop_ids[position]
+                    if board_offset < no_label:
+                        num_stops = board_offset + position
+                        if (num_stops < best_dest and num_stops < best.get(stop_id, no_label)
+                                and not closed[stop_id]):
+                            best[stop_id] = num_stops
+                            current[stop_id] = (num_stops, pattern, board_position, position)
+                    label = previous.get(stop_id)
+                    if (label is not None and label[0] - position < board_offset):
+                        board_offset = label[0] - position
+                        board_position = position
+                visits += len(stop_ids) - start
+            labels.append(current)
+
+            found_id = None
+            for stop_id in dest_ids:
+                if (stop_id in current and current[stop_id][0] < best_dest):
+                    best_dest = current[stop_id][0]
+                    found_id = stop_id
+            if (found_id is not None):
+                journeys.append(self.get_journey(labels, found_id))
+                if first_only:
+                    break
+        mbta_profile.profiler.add("journey_stop_visits", visits)
+        return journeys
+
+    def get_stay_journey(self, stop_ids, closed_route_mask):
+        """Helper method for find_journeys(). Returns the journey of a trip which 
+        starts at one of the given stops and ends there: one leg of no stops on 
+        the first open route of the stops, the route MBTANetwork.find_routes() 
+        returns for it, or None if all their routes are closed.
+        """
+
+        stops = self.network.stops
+        best = None
+        for stop_id in stop_ids:
+            route_mask = stops[stop_id].route_mask & ~closed_route_mask
+            if route_mask:
+                route_index = (route_mask & -route_mask).bit_length() - 1
+                if (best is None or route_index < best[0]):
+                    best = (route_index, stop_id)
+        if best is None:
+            return None
+        route_index, stop_id = best
+        direction = 0
+        for pattern, position in self.stop_patterns[stop_id]:
+            if self.pattern_routes[pattern] == route_index:
+                direction = self.pattern_directions[pattern]
+                break
+        route_id = self.network.routes[route_index].route_id
+        return Journey([Leg(route_id, direction, stops[stop_id], stops[stop_id], 0)])
+
+    def get_route_levels(self, dest_ids, closed_mask, closed_route_mask):
+        """Helper method for find_journeys(). Returns a list where item i is the 
+        fewest transfers from route i to a route of the destination stops, or 
+        the number of stops plus one if there is none or route i is closed, 
+        searched level by level over the transfer graph of the closures.
+        """
+
+        network = self.network
+        unreachable = len(network.stops) + 1
+        route_levels = [unreachable] * len(network.routes)
+        route_to_routes = network.transfer_graph(closed_mask, closed_route_mask)
+        frontier_mask = 0
+        for stop_id in dest_ids:
+            frontier_mask |= network.stops[stop_id].route_mask
+        frontier_mask &= ~closed_route_mask
+        visited_mask = frontier_mask
+        level = 0
+        while frontier_mask:
+            next_mask = 0
+            for route_index in iter_bits(frontier_mask):
+                route_levels[route_index] = level
+                next_mask |= route_to_routes[route_index]
+            frontier_mask = next_mask & ~visited_mask & ~closed_route_mask
+            visited_mask |= frontier_mask
+            level += 1
+        return route_levels
+
+    def find_journey(self, src_stop, dest_stop, closed_mask=0, closed_route_mask=0):
+        """Returns the journey with the fewest transfers, then the fewest stops,
+        or None if no journey is possible.
+        """
+
+        journeys = self.find_journeys(src_stop, dest_stop, closed_mask, closed_route_mask, first_only=True)
+        return journeys[0] if journeys else None
+
+    def get_journey(self, labels, stop_id):
+        """Helper method for find_journeys(). Follows the labels back from the
+        stop reached in the last round and returns the Journey.
+        """
+
+        stops = self.network.stops
+        legs = []
+        for round_labels in reversed(labels[1:]):
+            num_stops, pattern, board_position, alight_position = round_labels[stop_id]
+            board_id = self.patterns[pattern][board_position]
+            route_id = self.network.routes[self.pattern_routes[pattern]].route_id
+            legs.append(Leg(route_id, self.pattern_directions[pattern], stops[board_id], stops[stop_id],
+                alight_position - board_position))
+            stop_id = board_id
+        legs.reverse()
+        return Journey(legs)
@@ -0,0 +1,266 @@
+"""Stop name index for resolving the stop names users type. The names are
+normalized (case, accents and punctuation are folded) and known aliases are
+added, so "kendall mit" or "Kendall" resolve to "Kendall/MIT".
+
+The index is built once when the stops are loaded. Prefix autocomplete walks
+a trie whose nodes keep their best ranked names, so a lookup only reads as
+many nodes as the prefix has characters. Fuzzy matching walks a trie of the
+normalized names with one edit distance row per node, so names with a common
+prefix share its work and the branches which are already too far from the
+query are skipped, instead of comparing the query with every name.
+"""
+
+import re
+import unicodedata
+
+# known aliases of stop names, an alias is only added if its stop exists
+ALIASES = {
+    "Kendall": "Kendall/MIT",
+    "MIT": "Kendall/MIT",
+    "DTX": "Downtown Crossing",
+    "Downtown": "Downtown Crossing",
+    "Gov Center": "Government Center",
+    "Govt Center": "Government Center",
+    "Mass Ave": "Massachusetts Avenue",
+    "JFK": "JFK/UMass",
+    "UMass": "JFK/UMass",
+    "BU Central": "Boston University Central",
+    "BU East": "Boston University East",
+    "BU West": "Boston University West",
+    "Symphony Hall": "Symphony",
+    "Airport Station": "Airport",
+}
+
+# the number of names each trie node keeps for autocomplete
+MAX_CANDIDATES = 10
+
+NON_WORD = re.compile(r"[^0-9a-z]+")
+
+def normalize_name(name):
+    """Returns the name folded to lower case ascii words separated by single
+    spaces, e.g. "Kendall/MIT" becomes "kendall mit".
+    """
+
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    name = name.casefold().replace("&", " and ")
+    return NON_WORD.sub(" ", name).strip()
+
+class KeyTrie:
+    """Trie of strings for finding the strings within an edit distance of a
+    query. Each node is a list of [children, key], where key is the string
+    which ends at the node or None. The search walks the trie and keeps one
+    row of the edit distance table for each node, so strings with a common
+    prefix share the rows of the prefix, and a subtree is skipped as soon as
+    every item of its row is larger than the distance.
+    """
+
+    def __init__(self, keys=()):
+        self.root = [{}, None]
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        node = self.root
+        for char in key:
+            node = node[0].setdefault(char, [{}, None])
+        node[1] = key
+
+    def remove(self, key):
+        node = self.root
+        for char in key:
+            node = node[0].get(char)
+            if node is None:
+                return
+        node[1] = None
+
+    def search(self, key, max_distance):
+        """Returns the list of (distance, key) of the keys within max_distance
+        of the given key.
+        """
+
+        matches = []
+        key_length = len(key)
+        first_row = list(range(key_length + 1))
+        node_list = [(child, char, first_row) for char, child in self.root[0].items()]
+        while node_list:
+            (children, node_key), char, previous_row = node_list.pop()
+            row = [previous_row[0] + 1]
+            for position in range(1, key_length + 1):
+                row.append(min(row[position - 1] + 1, previous_row[position] + 1,
+                    previous_row[position - 1] + (key[position - 1] != char)))
+            if (node_key is not None and row[-1] <= max_distance):
+                matches.append((row[-1], node_key))
+            if min(row) <= max_distance:
+                for next_char, child in children.items():
+                    node_list.append((child, next_char, row))
+        return matches
+
+class StopNameIndex:
+    """Index of the stop names of a network, with exact, prefix and fuzzy
+    lookups which all return the original stop names. Stop names can be
+    added and removed when the network is updated.
+    """
+
+    def __init__(self, stop_names, aliases=ALIASES):
+        self.aliases = aliases
+        # key is a normalized name or alias, value is the list of stop names
+        self.names = {}
+        # each trie node is [children, candidates, ranks], where candidates is
+        # the sorted list of the best (rank, stop name) matches of the prefix
+        # and ranks are the matches which end at the node
+        self.trie = [{}, [], []]
+        self.key_trie = KeyTrie()
+        for stop_name in sorted(stop_names):
+            self.add_stop_name(stop_name)
+
+    def get_keys(self, stop_name):
+        """Helper method for add_stop_name() and remove_stop_name(). Returns the 
+        normalized name and aliases of the stop name.
+        """
+
+        keys = [normalize_name(stop_name)]
+        for alias, alias_stop_name in self.aliases.items():
+            if alias_stop_name == stop_name:
+                keys.append(normalize_name(alias))
+        return keys
+
+    def iter_ranks(self, key, stop_name):
+        """Helper method for add_stop_name() and remove_stop_name(). Yields each 
+        word suffix of the key with its rank: a match at the start of the name 
+        is ranked first, then the shorter names.
+        """
+
+        words = key.split(" ")
+        for word_position in range(len(words)):
+            yield " ".join(words[word_position:]), (word_position > 0, len(stop_name), stop_name)
+
+    def add_stop_name(self, stop_name):
+        """Adds the stop name and its aliases to the index.
+        """
+
+        for key in self.get_keys(stop_name):
+            stop_name_list = self.names.setdefault(key, [])
+            if stop_name in stop_name_list:
+                continue
+            stop_name_list.append(stop_name)
+            self.key_trie.add(key)
+            for suffix, rank in self.iter_ranks(key, stop_name):
+                node = self.trie
+                self.add_candidate(node, rank)
+                for char in suffix:
+                    node = node[0].setdefault(char, [{}, [], []])
+                    self.add_candidate(node, rank)
+                node[2].append(rank)
+
+    def remove_stop_name(self, stop_name):
+        """Removes the stop name and its aliases from the index. The candidates 
+        of the trie nodes on the paths of the name are rebuilt from their 
+        children, so only those nodes are visited.
+        """
+
+        for key in self.get_keys(stop_name):
+            stop_name_list = self.names.get(key)
+            if stop_name_list is None or stop_name not in stop_name_list:
+                continue
+            stop_name_list.remove(stop_name)
+            if not stop_name_list:
+                del self.names[key]
+                self.key_trie.remove(key)
+            for suffix, rank in self.iter_ranks(key, stop_name):
+                path = [self.trie]
+                for char in suffix:
+                    path.append(path[-1][0][char])
+                path[-1][2].remove(rank)
+                for node in reversed(path):
+                    if any(old_rank[2] == stop_name for old_rank in node[1]):
+                        self.rebuild_candidates(node)
+
+    def add_candidate(self, node, rank):
+        candidates = node[1]
+        for position, old_rank in enumerate(candidates):
+            if old_rank[2] == rank[2]:
+                if rank < old_rank:
+                    candidates[position] = rank
+                    candidates.sort()
+                return
+        if len(candidates) < MAX_CANDIDATES or rank < candidates[-1]:
+            candidates.append(rank)
+            candidates.sort()
+            del candidates[MAX_CANDIDATES:]
+
+    def rebuild_candidates(self, node):
+        """Helper method for remove_stop_name(). Rebuilds the candidates of the 
+        node from the matches which end at it and the candidates of its 
+        children.
+        """
+
+        best_ranks = {}
+        rank_lists = [node[2]] + [child[1] for child in node[0].values()]
+        for rank_list in rank_lists:
+            for rank in rank_list:
+                if (rank[2] not in best_ranks or rank < best_ranks[rank[2]]):
+                    best_ranks[rank[2]] = rank
+        node[1] = sorted(best_ranks.values())[:MAX_CANDIDATES]
+
+    def resolve(self, text):
+        """Returns the stop name which the text names after normalization or
+        as an alias, or None if no stop or more than one stop matches.
+        """
+
+        stop_name_list = self.names.get(normalize_name(text))
+        if stop_name_list is None or len(stop_name_list) > 1:
+            return None
+        return stop_name_list[0]
+
+    def complete(self, prefix, limit=MAX_CANDIDATES):
+        """Returns the stop names with a word starting with the prefix, the
+        names starting with it first.
+        """
+
+        key = normalize_name(prefix)
+        if not key:
+            return []
+        node = self.trie
+        for char in key:
+            node = node[0].get(char)
+            if node is None:
+                return []
+        return [rank[2] for rank in node[1][:limit]]
+
+    def fuzzy(self, text, max_distance=None, limit=MAX_CANDIDATES):
+        """Returns the list of (stop name, edit distance) of the stop names
+        within max_distance edits of the text, the closest first. The default
+        max_distance grows with the length of the text, up to 3.
+        """
+
+        key = normalize_name(text)
+        if not key:
+            return []
+        if max_distance is None:
+            max_distance = min(3, max(1, len(key) // 4))
+        best_distance = {}
+        for distance, match_key in self.key_trie.search(key, max_distance):
+            for stop_name in self.names[match_key]:
+                if distance < best_distance.get(stop_name, max_distance + 1):
+                    best_distance[stop_name] = distance
+        ranked = sorted(best_distance.items(), key=lambda item: (item[1], len(item[0]), item[0]))
+        return ranked[:limit]
+
+    def suggest(self, text, limit=5):
+        """Returns the ranked list of stop names the text may mean: the exact
+        match, then the prefix matches, then the fuzzy matches.
+        """
+
+        suggestions = []
+        stop_name = self.resolve(text)
+        if stop_name is not None:
+            suggestions.append(stop_name)
+        for stop_name in self.complete(text, limit):
+            if stop_name not in suggestions:
+                suggestions.append(stop_name)
+        if len(suggestions) < limit:
+            for stop_name, distance in self.fuzzy(text, limit=limit):
+                if stop_name not in suggestions:
+                    suggestions.append(stop_name)
+        return suggestions[:limit]
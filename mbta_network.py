@@ -0,0 +1,657 @@
+"""Compact model of the transit network used to answer trip queries. Route ids
+and stop keys are interned to integer ids in the order they are read, and
+route membership is held in bitsets: each route has a Python int whose bit i
+is set if stop i is on the route, and each stop has an int whose bit j is set
+if the stop is on route j. A network is built once, and update_routes()
+patches it when the stops of some routes change, in time proportional to the
+change. The transfer graph of each distinct set of closed stops and routes is
+memoized, so repeated queries under the same closures do not rebuild it.
+
+A stop is identified by its key, the id of its parent station or its own
+stop id, and also has a display name. Different stops can have the same
+name, e.g. the two bus stops on both sides of a street, so a query by name
+starts from or ends at any of the stops with that name.
+"""
+
+from collections import deque
+from collections.abc import Mapping
+from functools import lru_cache
+
+import mbta_profile
+
+# number of transfer graphs kept for distinct closure sets
+TRANSFER_GRAPH_CACHE_SIZE = 64
+
+def iter_bits(mask):
+    """Yields the index of every set bit of the given int, lowest first.
+    """
+
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+class Route:
+    """A route of the network with its integer id and stop bitset.
+    """
+
+    __slots__ = ("index", "route_id", "stop_mask")
+
+    def __init__(self, index, route_id, stop_mask):
+        self.index = index
+        self.route_id = route_id
+        self.stop_mask = stop_mask
+
+class Stop:
+    """A stop of the network with its integer id, key, display name, route
+    bitset, and the bitset of the routes on which it is wheelchair accessible.
+    The stop is accessible if any of its routes says so. Most stops are
+    accessible on all or none of their routes, so the accessible bitset is
+    the route bitset itself or 0 and takes no extra memory.
+    """
+
+    __slots__ = ("index", "key", "name", "route_mask", "accessible_route_mask")
+
+    def __init__(self, index, key, name, route_mask, accessible_route_mask=0):
+        self.index = index
+        self.key = key
+        self.name = name
+        self.route_mask = route_mask
+        if (accessible_route_mask == route_mask):
+            accessible_route_mask = route_mask
+        self.accessible_route_mask = accessible_route_mask
+
+def remove_bit(mask, index, moved_index):
+    """Returns the bitset with bit index removed and bit moved_index moved to
+    index, as update_routes() does when it removes a stop or a route.
+    """
+
+    moved_bit = (mask >> moved_index) & 1 if moved_index != index else 0
+    mask &= ~((1 << index) | (1 << moved_index))
+    return mask | (moved_bit << index)
+
+class NetworkUpdate:
+    """Changes made by MBTANetwork.update_routes(), in the order they were
+    made. added_stops is a list of (id, key, name) and added_routes is a list
+    of (id, route id).
+    removed_stops and removed_routes are lists of (id, moved id): the last
+    stop or route, with the moved id, took the id of the removed one.
+    removed_stop_names is a list of (key, name) of the removed stops,
+    renamed_stops is a list of (id, key, old name, new name), and
+    accessibility_changed is the set of the keys of the stops whose wheelchair
+    accessibility changed.
+    """
+
+    __slots__ = ("renamed_stops", "added_stops", "removed_stops", "added_routes", "removed_routes",
+        "removed_stop_names", "changed_stop_keys", "accessibility_changed", "transfers_changed")
+
+    def __init__(self):
+        self.renamed_stops = []
+        self.added_stops = []
+        self.removed_stops = []
+        self.added_routes = []
+        self.removed_routes = []
+        self.removed_stop_names = []
+        self.changed_stop_keys = set()
+        self.accessibility_changed = set()
+        self.transfers_changed = False
+
+    def apply_to_mask(self, stop_mask, route_mask, is_stop_closed, is_route_closed):
+        """Returns the stop and route bitsets of a closure set after the
+        update. is_stop_closed takes the name and the key of an added stop and
+        is_route_closed takes the id of an added route, and they say if it
+        is closed. The renamed stops are checked again with their new name.
+        """
+
+        for stop_id, stop_key, old_stop_name, stop_name in self.renamed_stops:
+            if is_stop_closed(stop_name, stop_key):
+                stop_mask |= 1 << stop_id
+            else:
+                stop_mask &= ~(1 << stop_id)
+        for stop_id, stop_key, stop_name in self.added_stops:
+            if is_stop_closed(stop_name, stop_key):
+                stop_mask |= 1 << stop_id
+        for stop_id, moved_id in self.removed_stops:
+            stop_mask = remove_bit(stop_mask, stop_id, moved_id)
+        for route_index, route_id in self.added_routes:
+            if is_route_closed(route_id):
+                route_mask |= 1 << route_index
+        for route_index, moved_index in self.removed_routes:
+            route_mask = remove_bit(route_mask, route_index, moved_index)
+        return stop_mask, route_mask
+
+def get_mask(index_list):
+    """Returns the bitset with the bits of the given indexes set. Long lists
+    are set in a byte array first, as setting the bits of a large int one by
+    one copies the int each time.
+    """
+
+    if len(index_list) < 64:
+        mask = 0
+        for index in index_list:
+            mask |= 1 << index
+        return mask
+    bitmap = bytearray(max(index_list) // 8 + 1)
+    for index in index_list:
+        bitmap[index >> 3] |= 1 << (index & 7)
+    return int.from_bytes(bitmap, "little")
+
+class MBTANetwork:
+    """Network built from a dictionary where key is the route id and value is
+    all the stop keys of the route. stop_names is a dictionary where key is a
+    stop key and value is its display name, the name of a stop which is not
+    in it is its key. route_to_accessible_dict is a dictionary where key is
+    the route id and value is the keys of the stops of the route which are
+    wheelchair accessible, a stop is accessible if any of its routes says so.
+    The network is the only copy of this data, and the dictionaries are read
+    back with get_route_to_stops_dict() and the other views.
+    """
+
+    __slots__ = ("routes", "stops", "route_index", "stop_index", "stop_name_ids", "transfer_mask",
+        "route_to_routes", "cached_transfer_graph")
+
+    def __init__(self, route_to_stops_dict, stop_names=None, route_to_accessible_dict=None):
+        stop_names = stop_names or {}
+        route_to_accessible_dict = route_to_accessible_dict or {}
+        self.route_index = {}
+        self.stop_index = {}
+        # key is a stop name and value is the tuple of the ids of the stops
+        # with that name, a tuple as most names have one stop
+        self.stop_name_ids = {}
+        route_list = []
+        stop_keys = []
+        stop_route_lists = []
+        stop_accessible_lists = []
+        for route_id, stop_keys_of_route in route_to_stops_dict.items():
+            route_index = len(route_list)
+            self.route_index[route_id] = route_index
+            stop_id_list = []
+            # sort the stops of the route so the stop ids do not depend on
+            # set ordering
+            for stop_key in sorted(stop_keys_of_route):
+                stop_id = self.stop_index.get(stop_key)
+                if stop_id is None:
+                    stop_id = len(stop_keys)
+                    self.stop_index[stop_key] = stop_id
+                    stop_keys.append(stop_key)
+                    stop_route_lists.append([])
+                    stop_accessible_lists.append([])
+                stop_route_lists[stop_id].append(route_index)
+                stop_id_list.append(stop_id)
+            route_list.append(Route(route_index, route_id, get_mask(stop_id_list)))
+            for stop_key in route_to_accessible_dict.get(route_id, ()):
+                if stop_key in stop_keys_of_route:
+                    stop_accessible_lists[self.stop_index[stop_key]].append(route_index)
+
+        self.routes = route_list
+        self.stops = []
+        for stop_id, stop_key in enumerate(stop_keys):
+            stop_name = stop_names.get(stop_key, stop_key)
+            self.stops.append(Stop(stop_id, stop_key, stop_name, get_mask(stop_route_lists[stop_id]),
+                get_mask(stop_accessible_lists[stop_id])))
+            self.add_stop_name_id(stop_name, stop_id)
+        # only the stops on two or more routes connect routes
+        self.transfer_mask = 0
+        for stop in self.stops:
+            if (stop.route_mask & (stop.route_mask - 1)):
+                self.transfer_mask |= 1 << stop.index
+        self.route_to_routes = list(self.get_route_to_routes(0))
+        self.cached_transfer_graph = lru_cache(maxsize=TRANSFER_GRAPH_CACHE_SIZE)(self.get_route_to_routes)
+
+    def get_stop_ids(self, stop):
+        """Returns the tuple of the ids of the stops with the given key, or with
+        the given name if no stop has that key.
+        """
+
+        stop_id = self.stop_index.get(stop)
+        if stop_id is not None:
+            return (stop_id,)
+        return self.stop_name_ids.get(stop, ())
+
+    def get_stop_keys(self, stop_mask):
+        """Returns the set of the keys of the stops in the bitset.
+        """
+
+        stops = self.stops
+        return {stops[stop_id].key for stop_id in iter_bits(stop_mask)}
+
+    def route_stop_keys(self, route_id):
+        """Returns the set of the keys of the stops of the route. Raises KeyError 
+        if the route is not in the network.
+        """
+
+        return self.get_stop_keys(self.routes[self.route_index[route_id]].stop_mask)
+
+    def route_accessible_keys(self, route_id):
+        """Returns the set of the keys of the stops of the route which are 
+        wheelchair accessible on it. Raises KeyError if the route is not in the 
+        network.
+        """
+
+        route = self.routes[self.route_index[route_id]]
+        stops = self.stops
+        return {stops[stop_id].key for stop_id in iter_bits(route.stop_mask)
+            if (stops[stop_id].accessible_route_mask >> route.index) & 1}
+
+    def accessible_stop_keys(self):
+        """Returns the set of the keys of the stops which are wheelchair 
+        accessible on any of their routes.
+        """
+
+        return {stop.key for stop in self.stops if stop.accessible_route_mask}
+
+    def num_route_stops(self, route_id):
+        """Returns the number of stops of the route, or 0 if the route is not in 
+        the network.
+        """
+
+        route_index = self.route_index.get(route_id)
+        if route_index is None:
+            return 0
+        return bin(self.routes[route_index].stop_mask).count("1")
+
+    def get_route_to_stops_dict(self):
+        """Returns a new dictionary where key is the route id and value is the 
+        set of the stop keys of the route, e.g. to build the network again in 
+        another process.
+        """
+
+        return {route.route_id: self.get_stop_keys(route.stop_mask) for route in self.routes}
+
+    def get_stop_names(self):
+        """Returns a new dictionary where key is a stop key and value is its 
+        display name.
+        """
+
+        return {stop.key: stop.name for stop in self.stops}
+
+    def get_route_to_accessible_dict(self):
+        """Returns a new dictionary where key is the route id and value is the 
+        set of the keys of the stops which are wheelchair accessible on it.
+        """
+
+        return {route.route_id: self.route_accessible_keys(route.route_id) for route in self.routes}
+
+    def stop_mask(self, stops):
+        """Returns the bitset of the given stop keys or names. Stops which are
+        not in the network are ignored.
+        """
+
+        mask = 0
+        for stop in stops:
+            for stop_id in self.get_stop_ids(stop):
+                mask |= 1 << stop_id
+        return mask
+
+    def get_route_to_routes(self, closed_mask, closed_route_mask=0):
+        """Returns a tuple where item i is the bitset of the routes which can be
+        traveled from route i. If two routes have any common stop which is not
+        in the closed stop bitset, traveling from one route to another is
+        possible. Routes in the closed route bitset can not be traveled.
+        """
+
+        mbta_profile.profiler.add("graph_builds")
+        open_route_mask = ~closed_route_mask
+        route_to_routes = [0] * len(self.routes)
+        for stop_id in iter_bits(self.transfer_mask & ~closed_mask):
+            route_mask = self.stops[stop_id].route_mask & open_route_mask
+            for route_index in iter_bits(route_mask):
+                route_to_routes[route_index] |= route_mask
+        return tuple(route_mask & ~(1 << route_index)
+            for route_index, route_mask in enumerate(route_to_routes))
+
+    def transfer_graph(self, closed_mask=0, closed_route_mask=0):
+        """Returns the route to routes bitsets of get_route_to_routes() for the 
+        given closures. Only closed transfer stops change the graph, so the 
+        graph is looked up in an LRU cache keyed by the bitsets of the closed 
+        transfer stops and the closed routes, and built only on a miss.
+        """
+
+        closed_mask &= self.transfer_mask
+        if not closed_mask and not closed_route_mask:
+            return self.route_to_routes
+        return self.cached_transfer_graph(closed_mask, closed_route_mask)
+
+    def update_routes(self, route_to_stops_dict, route_ids, stop_names=None, route_to_accessible_dict=None):
+        """Patches the network for the given routes, whose stops are now the ones
+        in the route to stops dictionary, or which are removed if they are not
+        in it. stop_names gives the display names of the stops, a stop of the
+        network with another name there is renamed first, and the accessible
+        stops of the routes are replaced by the ones in
+        route_to_accessible_dict. Only the stops and routes which changed are
+        visited: removed stops and routes are replaced by the last one, so the
+        ids stay dense, and only the transfer bitsets of the routes which
+        share a changed stop are rebuilt. The transfer graph cache is cleared
+        only if the transfer graph or the ids changed. Returns a
+        NetworkUpdate.
+        """
+
+        stop_names = stop_names or {}
+        route_to_accessible_dict = route_to_accessible_dict or {}
+        update = NetworkUpdate()
+        changed_stop_ids = set()
+        # key is the id of a stop whose accessible routes changed and value is
+        # True if it was accessible before the update
+        old_accessible = {}
+        affected_route_mask = 0
+        for stop_key, stop_name in stop_names.items():
+            stop_id = self.stop_index.get(stop_key)
+            if (stop_id is not None and self.stops[stop_id].name != stop_name):
+                stop = self.stops[stop_id]
+                update.renamed_stops.append((stop_id, stop_key, stop.name, stop_name))
+                self.remove_stop_name_id(stop.name, stop_id)
+                stop.name = stop_name
+                self.add_stop_name_id(stop_name, stop_id)
+        for route_id in route_ids:
+            stop_keys_of_route = route_to_stops_dict.get(route_id)
+            route_index = self.route_index.get(route_id)
+            if route_index is None:
+                if stop_keys_of_route is None:
+                    continue
+                route_index = len(self.routes)
+                self.route_index[route_id] = route_index
+                self.routes.append(Route(route_index, route_id, 0))
+                self.route_to_routes.append(0)
+                update.added_routes.append((route_index, route_id))
+            route = self.routes[route_index]
+            stop_id_list = []
+            for stop_key in sorted(stop_keys_of_route or ()):
+                stop_id = self.stop_index.get(stop_key)
+                if stop_id is None:
+                    stop_id = len(self.stops)
+                    stop_name = stop_names.get(stop_key, stop_key)
+                    self.stop_index[stop_key] = stop_id
+                    self.stops.append(Stop(stop_id, stop_key, stop_name, 0))
+                    self.add_stop_name_id(stop_name, stop_id)
+                    update.added_stops.append((stop_id, stop_key, stop_name))
+                stop_id_list.append(stop_id)
+            new_stop_mask = get_mask(stop_id_list)
+            changed_mask = route.stop_mask ^ new_stop_mask
+            route.stop_mask = new_stop_mask
+            for stop_id in iter_bits(changed_mask):
+                self.stops[stop_id].route_mask ^= 1 << route_index
+                changed_stop_ids.add(stop_id)
+            if changed_mask:
+                affected_route_mask |= 1 << route_index
+            accessible_keys = route_to_accessible_dict.get(route_id, ())
+            route_bit = 1 << route_index
+            for stop_id in iter_bits(new_stop_mask | changed_mask):
+                stop = self.stops[stop_id]
+                accessible_route_mask = stop.accessible_route_mask & ~route_bit
+                if ((new_stop_mask >> stop_id) & 1 and stop.key in accessible_keys):
+                    accessible_route_mask |= route_bit
+                if (accessible_route_mask != stop.accessible_route_mask):
+                    old_accessible.setdefault(stop_id, bool(stop.accessible_route_mask))
+                    stop.accessible_route_mask = accessible_route_mask
+
+        for stop_id, accessible in old_accessible.items():
+            stop = self.stops[stop_id]
+            if (stop.accessible_route_mask == stop.route_mask):
+                stop.accessible_route_mask = stop.route_mask
+            if (accessible != bool(stop.accessible_route_mask)):
+                update.accessibility_changed.add(stop.key)
+
+        empty_stop_ids = []
+        for stop_id in changed_stop_ids:
+            stop = self.stops[stop_id]
+            update.changed_stop_keys.add(stop.key)
+            # the routes which had or have a link through this stop
+            affected_route_mask |= stop.route_mask
+            # the cached transfer graphs are only valid if no stop which links
+            # routes changed, before or after the update
+            if ((self.transfer_mask >> stop_id) & 1):
+                update.transfers_changed = True
+            if (stop.route_mask & (stop.route_mask - 1)):
+                self.transfer_mask |= 1 << stop_id
+                update.transfers_changed = True
+            else:
+                self.transfer_mask &= ~(1 << stop_id)
+            if not stop.route_mask:
+                empty_stop_ids.append(stop_id)
+
+        # remove the stops which are not on any route, the highest id first,
+        # so the last stop is never one which is removed later
+        for stop_id in sorted(empty_stop_ids, reverse=True):
+            update.removed_stop_names.append((self.stops[stop_id].key, self.stops[stop_id].name))
+            self.remove_stop_name_id(self.stops[stop_id].name, stop_id)
+            moved_id = len(self.stops) - 1
+            moved_stop = self.stops.pop()
+            if moved_id != stop_id:
+                del self.stop_index[self.stops[stop_id].key]
+                moved_stop.index = stop_id
+                self.stops[stop_id] = moved_stop
+                self.stop_index[moved_stop.key] = stop_id
+                self.remove_stop_name_id(moved_stop.name, moved_id)
+                self.add_stop_name_id(moved_stop.name, stop_id)
+                for route_index in iter_bits(moved_stop.route_mask):
+                    route = self.routes[route_index]
+                    route.stop_mask = remove_bit(route.stop_mask, stop_id, moved_id)
+                if (self.transfer_mask >> moved_id) & 1:
+                    update.transfers_changed = True
+            else:
+                del self.stop_index[moved_stop.key]
+            self.transfer_mask = remove_bit(self.transfer_mask, stop_id, moved_id)
+            update.removed_stops.append((stop_id, moved_id))
+
+        for route_index in iter_bits(affected_route_mask):
+            route_mask = 0
+            for stop_id in iter_bits(self.routes[route_index].stop_mask & self.transfer_mask):
+                route_mask |= self.stops[stop_id].route_mask
+            route_mask &= ~(1 << route_index)
+            if route_mask != self.route_to_routes[route_index]:
+                self.route_to_routes[route_index] = route_mask
+                update.transfers_changed = True
+
+        # remove the routes which are not in the dictionary any more, they
+        # have no stops and no links now
+        removed_route_indexes = {self.route_index[route_id] for route_id in route_ids
+            if (route_id in self.route_index and route_id not in route_to_stops_dict)}
+        for route_index in sorted(removed_route_indexes, reverse=True):
+            moved_index = len(self.routes) - 1
+            moved_route = self.routes.pop()
+            moved_links = self.route_to_routes.pop()
+            if moved_index != route_index:
+                del self.route_index[self.routes[route_index].route_id]
+                moved_route.index = route_index
+                self.routes[route_index] = moved_route
+                self.route_index[moved_route.route_id] = route_index
+                self.route_to_routes[route_index] = moved_links
+                for stop_id in iter_bits(moved_route.stop_mask):
+                    stop = self.stops[stop_id]
+                    stop.route_mask = remove_bit(stop.route_mask, route_index, moved_index)
+                    stop.accessible_route_mask = remove_bit(stop.accessible_route_mask,
+                        route_index, moved_index)
+                for related_route in iter_bits(moved_links):
+                    self.route_to_routes[related_route] = remove_bit(
+                        self.route_to_routes[related_route], route_index, moved_index)
+                update.transfers_changed = True
+            else:
+                del self.route_index[moved_route.route_id]
+            update.removed_routes.append((route_index, moved_index))
+
+        if update.transfers_changed:
+            self.cached_transfer_graph.cache_clear()
+        return update
+
+    def add_stop_name_id(self, stop_name, stop_id):
+        """Adds the stop id to the ids of the stops with the name, which are 
+        kept in ascending order like in a network built from scratch.
+        """
+
+        self.stop_name_ids[stop_name] = tuple(sorted(self.stop_name_ids.get(stop_name, ()) + (stop_id,)))
+
+    def remove_stop_name_id(self, stop_name, stop_id):
+        """Removes the stop id from the ids of the stops with the name, and the 
+        name if no other stop has it.
+        """
+
+        name_ids = tuple(name_id for name_id in self.stop_name_ids[stop_name] if name_id != stop_id)
+        if name_ids:
+            self.stop_name_ids[stop_name] = name_ids
+        else:
+            del self.stop_name_ids[stop_name]
+
+    def find_routes(self, src_stop, dest_stop, closed_mask=0, closed_route_mask=0):
+        """Returns the list of route ids with the fewest transfers needed to
+        travel from the source stop to the destination stop, or None if no
+        route is possible. The stops are given by key or by name, a name
+        stands for all the stops with that name. The routes are visited level
+        by level starting from all the routes with the source stop, and ties
+        are broken by the order the routes were read. Raises KeyError if a
+        stop is not in the network.
+        """
+
+        src_route_mask = self.open_route_mask(src_stop, closed_mask)
+        dest_route_mask = self.open_route_mask(dest_stop, closed_mask)
+        if (not src_route_mask or not dest_route_mask):
+            return None
+        route_to_routes = self.transfer_graph(closed_mask, closed_route_mask)
+
+        src_route_mask &= ~closed_route_mask
+        dest_route_mask &= ~closed_route_mask
+        previous_route = dict.fromkeys(iter_bits(src_route_mask))
+        visited_mask = src_route_mask
+        route_queue = deque(previous_route)
+        expansions = 0
+        while route_queue:
+            route_index = route_queue.popleft()
+            expansions += 1
+            if ((dest_route_mask >> route_index) & 1):
+                mbta_profile.profiler.add("search_expansions", expansions)
+                needed_route_list = []
+                while route_index is not None:
+                    needed_route_list.append(self.routes[route_index].route_id)
+                    route_index = previous_route[route_index]
+                needed_route_list.reverse()
+                return needed_route_list
+            new_route_mask = route_to_routes[route_index] & ~visited_mask
+            visited_mask |= new_route_mask
+            for related_route in iter_bits(new_route_mask):
+                previous_route[related_route] = route_index
+                route_queue.append(related_route)
+        mbta_profile.profiler.add("search_expansions", expansions)
+        return None
+
+    def route_tree(self, src_stop, closed_mask=0, closed_route_mask=0):
+        """Returns the RouteTree of the breadth-first search over the routes from 
+        the source stop, given by key or by name, for many destinations. Raises 
+        KeyError if the stop is not in the network.
+        """
+
+        src_route_mask = self.open_route_mask(src_stop, closed_mask) & ~closed_route_mask
+        return RouteTree(self, src_route_mask, self.transfer_graph(closed_mask, closed_route_mask))
+
+    def open_route_mask(self, stop, closed_mask):
+        """Helper method for find_routes(). Returns the bitset of the routes of
+        the stops with the given key or name which are not closed.
+        """
+
+        stop_ids = self.get_stop_ids(stop)
+        if not stop_ids:
+            raise KeyError(stop)
+        route_mask = 0
+        for stop_id in stop_ids:
+            if not (closed_mask >> stop_id) & 1:
+                route_mask |= self.stops[stop_id].route_mask
+        return route_mask
+
+class RouteTree:
+    """Breadth-first search tree over the routes from the given routes, in the
+    same order as MBTANetwork.find_routes(), so the route list to any
+    destination is the one find_routes() returns. The tree is searched once
+    for all the routes, and each query only walks back from the first
+    reached route of the destination.
+    """
+
+    __slots__ = ("network", "positions", "previous_route", "paths")
+
+    def __init__(self, network, src_route_mask, route_to_routes):
+        self.network = network
+        # item i is the position of route i in the search order, or -1 if it
+        # can not be reached
+        self.positions = [-1] * len(network.routes)
+        self.previous_route = [None] * len(network.routes)
+        # key is a route index and value is the route list ending with it
+        self.paths = {}
+        route_queue = list(iter_bits(src_route_mask))
+        visited_mask = src_route_mask
+        for position, route_index in enumerate(route_queue):
+            self.positions[route_index] = position
+            new_route_mask = route_to_routes[route_index] & ~visited_mask
+            visited_mask |= new_route_mask
+            for related_route in iter_bits(new_route_mask):
+                self.previous_route[related_route] = route_index
+                route_queue.append(related_route)
+        mbta_profile.profiler.add("search_expansions", len(route_queue))
+
+    def find_last_route(self, dest_route_mask):
+        """Returns the index of the first reached route of the given bitset, the 
+        last route of the route list to a stop whose open routes are the 
+        bitset, or None if no route is possible.
+        """
+
+        positions = self.positions
+        last_route = None
+        for route_index in iter_bits(dest_route_mask):
+            position = positions[route_index]
+            if (position >= 0 and (last_route is None or position < positions[last_route])):
+                last_route = route_index
+        return last_route
+
+    def find_routes(self, dest_route_mask):
+        """Returns the list of route ids with the fewest transfers to a stop whose 
+        open routes are the given bitset, or None if no route is possible.
+        """
+
+        last_route = self.find_last_route(dest_route_mask)
+        if last_route is None:
+            return None
+        needed_route_list = self.paths.get(last_route)
+        if needed_route_list is None:
+            needed_route_list = []
+            route_index = last_route
+            while route_index is not None:
+                needed_route_list.append(self.network.routes[route_index].route_id)
+                route_index = self.previous_route[route_index]
+            needed_route_list.reverse()
+            self.paths[last_route] = needed_route_list
+        return list(needed_route_list)
+
+class RouteStopsView(Mapping):
+    """Read-only view of a network as a dictionary where key is the route id 
+    and value is the set of the stop keys of the route. The sets are built 
+    when they are read, so the network stays the only copy of the stops.
+    """
+
+    __slots__ = ("network",)
+
+    def __init__(self, network):
+        self.network = network
+
+    def __getitem__(self, route_id):
+        return self.network.route_stop_keys(route_id)
+
+    def __iter__(self):
+        return iter(self.network.route_index)
+
+    def __len__(self):
+        return len(self.network.routes)
+
+class StopNamesView(Mapping):
+    """Read-only view of a network as a dictionary where key is a stop key and 
+    value is its display name.
+    """
+
+    __slots__ = ("network",)
+
+    def __init__(self, network):
+        self.network = network
+
+    def __getitem__(self, stop_key):
+        return self.network.stops[self.network.stop_index[stop_key]].name
+
+    def __iter__(self):
+        return iter(self.network.stop_index)
+
+    def __len__(self):
+        return len(self.network.stops)
@@ -0,0 +1,178 @@
+"""Timers and counters for finding where the time of a run goes. The module
+keeps one global profiler. It is a NullProfiler whose methods do nothing
+until enable() is called, so the instrumented code costs only a method call
+when profiling is disabled.
+
+Timers count the calls and the total and maximum seconds of a named phase,
+and counters add up numbers such as requests, bytes, or search node
+expansions. Both can have a label, e.g. the API endpoint of a request.
+"""
+
+import json
+import threading
+import time
+
+class NullTimer:
+    """Context manager which does nothing.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+NULL_TIMER = NullTimer()
+
+class NullProfiler:
+    """Profiler used while profiling is disabled.
+    """
+
+    enabled = False
+
+    def timer(self, name, label=None):
+        return NULL_TIMER
+
+    def observe(self, name, seconds, label=None):
+        pass
+
+    def add(self, name, value=1, label=None):
+        pass
+
+class Timer:
+    """Context manager which adds the time spent in it to a profiler timer.
+    """
+
+    __slots__ = ("profiler", "name", "label", "start_time")
+
+    def __init__(self, profiler, name, label):
+        self.profiler = profiler
+        self.name = name
+        self.label = label
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.observe(self.name, time.perf_counter() - self.start_time, self.label)
+        return False
+
+class Profiler:
+    """Collects timers and counters. It is safe to use from several threads.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key is (name, label), value is [calls, total seconds, max seconds]
+        self.timers = {}
+        # key is (name, label), value is the sum of the added values
+        self.counters = {}
+
+    def timer(self, name, label=None):
+        """Returns a context manager which times the code inside it.
+        """
+
+        return Timer(self, name, label)
+
+    def observe(self, name, seconds, label=None):
+        """Adds one call which took the given seconds to a timer.
+        """
+
+        with self.lock:
+            timer = self.timers.get((name, label))
+            if timer is None:
+                self.timers[(name, label)] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    def add(self, name, value=1, label=None):
+        """Adds the value to a counter.
+        """
+
+        with self.lock:
+            self.counters[(name, label)] = self.counters.get((name, label), 0) + value
+
+    def report(self):
+        """Returns a text breakdown of all the timers and counters.
+        """
+
+        lines = ["%-36s %8s %12s %12s" % ("timer", "calls", "total s", "max s")]
+        with self.lock:
+            for (name, label), (calls, total, maximum) in sorted(self.timers.items(), key=str):
+                lines.append("%-36s %8i %12.4f %12.4f" % (format_key(name, label), calls, total, maximum))
+            lines.append("")
+            lines.append("%-36s %8s" % ("counter", "value"))
+            for (name, label), value in sorted(self.counters.items(), key=str):
+                lines.append("%-36s %8s" % (format_key(name, label), value))
+        return "\n".join(lines)
+
+    def to_json(self):
+        """Returns the timers and counters as a json string.
+        """
+
+        with self.lock:
+            data = {
+                "timers": [{"name": name, "label": label, "calls": calls, "total_seconds": total,
+                    "max_seconds": maximum} for (name, label), (calls, total, maximum) in self.timers.items()],
+                "counters": [{"name": name, "label": label, "value": value}
+                    for (name, label), value in self.counters.items()],
+            }
+        return json.dumps(data, indent=2)
+
+    def to_prometheus(self):
+        """Returns the timers and counters in the Prometheus text format.
+        """
+
+        lines = []
+        with self.lock:
+            timer_names = sorted({name for name, label in self.timers})
+            for name in timer_names:
+                metric = "mbta_%s_seconds" % name
+                lines.append("# TYPE %s summary" % metric)
+                for (timer_name, label), (calls, total, maximum) in sorted(self.timers.items(), key=str):
+                    if timer_name == name:
+                        lines.append("%s_count%s %i" % (metric, format_labels(label), calls))
+                        lines.append("%s_sum%s %.6f" % (metric, format_labels(label), total))
+            counter_names = sorted({name for name, label in self.counters})
+            for name in counter_names:
+                metric = "mbta_%s_total" % name
+                lines.append("# TYPE %s counter" % metric)
+                for (counter_name, label), value in sorted(self.counters.items(), key=str):
+                    if counter_name == name:
+                        lines.append("%s%s %s" % (metric, format_labels(label), value))
+        return "\n".join(lines) + "\n"
+
+def format_key(name, label):
+    if label is None:
+        return name
+    return "%s[%s]" % (name, label)
+
+def format_labels(label):
+    if label is None:
+        return ""
+    return '{label="%s"}' % str(label).replace("\\", "\\\\").replace('"', '\\"')
+
+profiler = NullProfiler()
+
+def enable():
+    """Replaces the global profiler with a new Profiler and returns it.
+    """
+
+    global profiler
+    profiler = Profiler()
+    return profiler
+
+def disable():
+    """Replaces the global profiler with a NullProfiler.
+    """
+
+    global profiler
+    profiler = NullProfiler()
@@ -0,0 +1,261 @@
+"""Network resilience sweep. For every stop it finds how closing only that
+stop changes the trips between all the other stops: the ordered stop pairs
+which lose connectivity and the extra transfers the pairs which are still
+connected need.
+
+Closing a stop only changes the route graph if the stop is the only shared
+stop of some pair of routes, so every other stop is reported without any
+search. Articulation points of the stop-route graph are the stops whose
+closure can disconnect other stops. For the remaining stops the all-pairs
+transfers are recomputed in a process pool, on stop classes: stops with the
+same route bitset have the same answers, so each class is searched once, and
+only the classes with a route whose transfers changed are searched again.
+"""
+
+from multiprocessing import Pool
+
+from mbta_network import iter_bits
+
+class ResilienceResult:
+    """Impact of closing one stop, given by its name and its key, as several
+    stops can have the same name.
+    """
+
+    __slots__ = ("stop", "key", "articulation", "removed_links", "disconnected_pairs",
+        "affected_pairs", "extra_transfers", "max_extra_transfers")
+
+    def __init__(self, stop, key, articulation, removed_links, disconnected_pairs=0,
+            affected_pairs=0, extra_transfers=0, max_extra_transfers=0):
+        self.stop = stop
+        self.key = key
+        self.articulation = articulation
+        self.removed_links = removed_links
+        self.disconnected_pairs = disconnected_pairs
+        self.affected_pairs = affected_pairs
+        self.extra_transfers = extra_transfers
+        self.max_extra_transfers = max_extra_transfers
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def find_articulation_stops(network):
+    """Returns the bitset of the stops whose removal splits the graph where the
+    stops and routes are nodes and each stop is linked to its routes.
+    """
+
+    # nodes 0 .. stops-1 are the stops, the rest are the routes
+    num_stops = len(network.stops)
+    def neighbors(node):
+        if node < num_stops:
+            return [num_stops + route_index for route_index in iter_bits(network.stops[node].route_mask)]
+        return list(iter_bits(network.routes[node - num_stops].stop_mask))
+
+    num_nodes = num_stops + len(network.routes)
+    discovery = [0] * num_nodes
+    low = [0] * num_nodes
+    articulation_mask = 0
+    counter = 1
+    for root in range(num_nodes):
+        if discovery[root]:
+            continue
+        discovery[root] = low[root] = counter
+        counter += 1
+        root_children = 0
+        # iterative depth-first search, each item is a node, its parent and the
+        # iterator over its neighbors
+        stack = [(root, -1, iter(neighbors(root)))]
+        while stack:
+            node, parent, neighbor_iter = stack[-1]
+            for next_node in neighbor_iter:
+                if next_node == parent:
+                    continue
+                if discovery[next_node]:
+                    low[node] = min(low[node], discovery[next_node])
+                else:
+                    discovery[next_node] = low[next_node] = counter
+                    counter += 1
+                    if node == root:
+                        root_children += 1
+                    stack.append((next_node, node, iter(neighbors(next_node))))
+                    break
+            else:
+                stack.pop()
+                if parent >= 0:
+                    low[parent] = min(low[parent], low[node])
+                    if (parent != root and parent < num_stops and low[node] >= discovery[parent]):
+                        articulation_mask |= 1 << parent
+        if (root < num_stops and root_children > 1):
+            articulation_mask |= 1 << root
+    return articulation_mask
+
+def find_removed_links(network):
+    """Returns a dictionary where key is a stop id and value is the list of route
+    pairs which are linked only by that stop, so closing it removes the links.
+    """
+
+    link_stops = {}
+    for stop_id in iter_bits(network.transfer_mask):
+        route_list = list(iter_bits(network.stops[stop_id].route_mask))
+        for position, route1 in enumerate(route_list):
+            for route2 in route_list[position + 1:]:
+                link_stops.setdefault((route1, route2), []).append(stop_id)
+    removed_links = {}
+    for route_pair, stop_list in link_stops.items():
+        if len(stop_list) == 1:
+            removed_links.setdefault(stop_list[0], []).append(route_pair)
+    return removed_links
+
+def get_route_levels(route_to_routes, src_route_mask):
+    """Returns the list of the route bitsets reached with 0, 1, 2, ... transfers
+    from the given routes, searched level by level with bitsets.
+    """
+
+    level_masks = []
+    visited_mask = frontier_mask = src_route_mask
+    while frontier_mask:
+        level_masks.append(frontier_mask)
+        next_mask = 0
+        for route_index in iter_bits(frontier_mask):
+            next_mask |= route_to_routes[route_index]
+        frontier_mask = next_mask & ~visited_mask
+        visited_mask |= frontier_mask
+    return level_masks
+
+def get_class_row(route_to_routes, src_route_mask, route_classes, num_classes):
+    """Returns a list where item j is the number of transfers from a stop with
+    the given routes to a stop of class j, or -1 if no route is possible.
+    """
+
+    row = [-1] * num_classes
+    for transfers, level_mask in enumerate(get_route_levels(route_to_routes, src_route_mask)):
+        for route_index in iter_bits(level_mask):
+            for dest_class in route_classes[route_index]:
+                if row[dest_class] < 0:
+                    row[dest_class] = transfers
+    return row
+
+# data shared with the worker processes by init_worker()
+worker_data = {}
+
+def init_worker(route_to_routes, class_masks, class_counts, route_classes, base_rows, base_route_levels):
+    worker_data["route_to_routes"] = route_to_routes
+    worker_data["class_masks"] = class_masks
+    worker_data["class_counts"] = class_counts
+    worker_data["route_classes"] = route_classes
+    worker_data["base_rows"] = base_rows
+    worker_data["base_route_levels"] = base_route_levels
+
+def compare_closure(task):
+    """Recomputes the transfers with the given route links removed and compares 
+    them with the transfers of the open network. The task is the stop name and 
+    key, its class, whether it is an articulation stop, and the removed route links. 
+    The transfers from a class only change if the transfers from one of its 
+    routes change, so only the rows of those classes are recomputed. Returns 
+    a ResilienceResult.
+    """
+
+    stop_name, stop_key, stop_class, articulation, removed_links = task
+    route_to_routes = list(worker_data["route_to_routes"])
+    for route1, route2 in removed_links:
+        route_to_routes[route1] &= ~(1 << route2)
+        route_to_routes[route2] &= ~(1 << route1)
+    class_masks = worker_data["class_masks"]
+    class_counts = list(worker_data["class_counts"])
+    # the closed stop is not a source or destination any more
+    class_counts[stop_class] -= 1
+    route_classes = worker_data["route_classes"]
+    base_rows = worker_data["base_rows"]
+    num_classes = len(class_masks)
+
+    changed_route_mask = 0
+    for route_index, base_levels in enumerate(worker_data["base_route_levels"]):
+        if get_route_levels(route_to_routes, 1 << route_index) != base_levels:
+            changed_route_mask |= 1 << route_index
+
+    result = ResilienceResult(stop_name, stop_key, articulation, len(removed_links))
+    for src_class, src_route_mask in enumerate(class_masks):
+        if not (src_route_mask & changed_route_mask) or not class_counts[src_class]:
+            continue
+        row = get_class_row(route_to_routes, src_route_mask, route_classes, num_classes)
+        base_row = base_rows[src_class]
+        if row == base_row:
+            continue
+        for dest_class, transfers in enumerate(row):
+            base = base_row[dest_class]
+            if transfers == base:
+                continue
+            num_pairs = class_counts[src_class] * class_counts[dest_class]
+            if src_class == dest_class:
+                # a stop paired with itself is not a trip
+                num_pairs -= class_counts[src_class]
+            if num_pairs <= 0:
+                continue
+            if transfers < 0:
+                result.disconnected_pairs += num_pairs
+            else:
+                result.affected_pairs += num_pairs
+                result.extra_transfers += (transfers - base) * num_pairs
+                result.max_extra_transfers = max(result.max_extra_transfers, transfers - base)
+    return result
+
+def iter_resilience(network, processes=None):
+    """Yields the ResilienceResult of closing each stop of the network. The
+    stops whose closure does not change the route graph are yielded first,
+    then the others as soon as their worker process finishes them.
+    processes is the size of the process pool, 1 runs in this process.
+    """
+
+    articulation_mask = find_articulation_stops(network)
+    removed_links = find_removed_links(network)
+
+    class_index = {}
+    class_masks = []
+    class_counts = []
+    stop_class = []
+    for stop in network.stops:
+        class_id = class_index.get(stop.route_mask)
+        if class_id is None:
+            class_id = len(class_masks)
+            class_index[stop.route_mask] = class_id
+            class_masks.append(stop.route_mask)
+            class_counts.append(0)
+        class_counts[class_id] += 1
+        stop_class.append(class_id)
+
+    tasks = []
+    for stop in network.stops:
+        articulation = bool((articulation_mask >> stop.index) & 1)
+        if stop.index in removed_links:
+            tasks.append((stop.name, stop.key, stop_class[stop.index], articulation,
+                removed_links[stop.index]))
+        else:
+            yield ResilienceResult(stop.name, stop.key, articulation, 0)
+    if not tasks:
+        return
+
+    num_classes = len(class_masks)
+    route_classes = [[] for route in network.routes]
+    for class_id, route_mask in enumerate(class_masks):
+        for route_index in iter_bits(route_mask):
+            route_classes[route_index].append(class_id)
+    base_rows = [get_class_row(network.route_to_routes, route_mask, route_classes, num_classes)
+        for route_mask in class_masks]
+    base_route_levels = [get_route_levels(network.route_to_routes, 1 << route.index)
+        for route in network.routes]
+    init_args = (network.route_to_routes, class_masks, class_counts, route_classes,
+        base_rows, base_route_levels)
+    if processes == 1:
+        init_worker(*init_args)
+        for task in tasks:
+            yield compare_closure(task)
+        return
+    with Pool(processes, initializer=init_worker, initargs=init_args) as pool:
+        yield from pool.imap_unordered(compare_closure, tasks)
+
+def rank_results(results):
+    """Returns the results sorted by the disconnected pairs, then the extra
+    transfers, the most harmful closure first.
+    """
+
+    return sorted(results, key=lambda result: (-result.disconnected_pairs,
+        -result.extra_transfers, result.stop, result.key))
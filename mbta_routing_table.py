@@ -0,0 +1,236 @@
+"""Precomputed routing table with the fewest-transfer route list of every
+ordered pair of stops, written to a versioned file which query processes map
+into memory with mmap. All the processes which map the same file share one
+physical copy of it, and a lookup reads a few integers from the mapping
+without building any graph.
+
+The answer for a pair only depends on the set of routes of each stop, so the
+stops are grouped into classes with the same route bitset and the table holds
+one entry for each pair of classes. A name of several stops stands for all of
+them, like in MBTANetwork.find_routes(), so it gets the class of the union of
+their route bitsets. Each entry is the id of a route list in a
+shared-suffix dictionary: node i is a route id and the id of the node with
+the rest of the list, so route lists which end the same way share nodes.
+
+File layout, all integers little-endian:
+
+    magic b"MBTARTBL", version (uint32), header length (uint32)
+    json header with the route ids, the stop keys and names, the class of
+    each stop, the class of each name of several stops,
+    the number of classes and the number of nodes
+    padding to a multiple of 4 bytes
+    node routes (uint32 x nodes), node next ids (uint32 x nodes)
+    class table (uint32 x classes x classes)
+
+Node 0 means "no route is possible" and ends every route list.
+"""
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from collections import deque
+
+from mbta_names import ALIASES, normalize_name
+from mbta_network import iter_bits
+
+MAGIC = b"MBTARTBL"
+VERSION = 3
+PREFIX = struct.Struct("<8sII")
+
+def build_class_table(network):
+    """Returns the class of each stop, the class of each name of several stops,
+    the node routes, the node next ids, and the class table as flat lists. The
+    route list of each class pair is the one MBTANetwork.find_routes() returns
+    without closed stops.
+    """
+
+    class_index = {}
+    class_masks = []
+    def get_class(route_mask):
+        class_id = class_index.get(route_mask)
+        if class_id is None:
+            class_id = len(class_masks)
+            class_index[route_mask] = class_id
+            class_masks.append(route_mask)
+        return class_id
+
+    stop_class = [get_class(stop.route_mask) for stop in network.stops]
+    name_class = {}
+    for stop_name, stop_ids in network.stop_name_ids.items():
+        if len(stop_ids) > 1:
+            route_mask = 0
+            for stop_id in stop_ids:
+                route_mask |= network.stops[stop_id].route_mask
+            name_class[stop_name] = get_class(route_mask)
+
+    node_routes = [0]
+    node_next = [0]
+    node_index = {}
+    def add_node(route_index, next_node):
+        node = node_index.get((route_index, next_node))
+        if node is None:
+            node = len(node_routes)
+            node_index[(route_index, next_node)] = node
+            node_routes.append(route_index)
+            node_next.append(next_node)
+        return node
+
+    num_classes = len(class_masks)
+    route_classes = [[] for route in network.routes]
+    for class_id, route_mask in enumerate(class_masks):
+        for route_index in iter_bits(route_mask):
+            route_classes[route_index].append(class_id)
+
+    class_table = [0] * (num_classes * num_classes)
+    for src_class, src_route_mask in enumerate(class_masks):
+        # breadth-first search over the routes in the same order as
+        # MBTANetwork.find_routes(), the first visited route of a class is
+        # the last route of its route list
+        row = src_class * num_classes
+        found = [False] * num_classes
+        previous_route = dict.fromkeys(iter_bits(src_route_mask))
+        visited_mask = src_route_mask
+        route_queue = deque(previous_route)
+        while route_queue:
+            route_index = route_queue.popleft()
+            node = 0
+            for dest_class in route_classes[route_index]:
+                if found[dest_class]:
+                    continue
+                found[dest_class] = True
+                if not node:
+                    # the list is stored from its last route back to the first,
+                    # so each node points to the rest of the list
+                    current = route_index
+                    while current is not None:
+                        node = add_node(current, node)
+                        current = previous_route[current]
+                class_table[row + dest_class] = node
+            new_route_mask = network.route_to_routes[route_index] & ~visited_mask
+            visited_mask |= new_route_mask
+            for related_route in iter_bits(new_route_mask):
+                previous_route[related_route] = route_index
+                route_queue.append(related_route)
+    return stop_class, name_class, node_routes, node_next, num_classes, class_table
+
+def write_routing_table(network, file_name):
+    """Precomputes the routing table of the network and writes it to the file.
+    """
+
+    stop_class, name_class, node_routes, node_next, num_classes, class_table = build_class_table(network)
+    header = json.dumps({
+        "routes": [route.route_id for route in network.routes],
+        "stops": [stop.key for stop in network.stops],
+        "stop_names": [stop.name for stop in network.stops],
+        "stop_class": stop_class,
+        "name_class": name_class,
+        "num_classes": num_classes,
+        "num_nodes": len(node_routes),
+    }).encode()
+    with open(file_name, "wb") as table_file:
+        table_file.write(PREFIX.pack(MAGIC, VERSION, len(header)))
+        table_file.write(header)
+        table_file.write(b"\0" * (-(PREFIX.size + len(header)) % 4))
+        for values in (node_routes, node_next, class_table):
+            data = array("I", values)
+            if sys.byteorder == "big":
+                data.byteswap()
+            table_file.write(data.tobytes())
+
+class RoutingTable:
+    """Read-only view of a routing table file mapped into memory.
+    """
+
+    def __init__(self, file_name):
+        with open(file_name, "rb") as table_file:
+            self.mapping = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if sys.byteorder != "little":
+            raise ValueError("Routing table files can only be mapped on little-endian machines.")
+        magic, version, header_length = PREFIX.unpack_from(self.mapping, 0)
+        if magic != MAGIC:
+            raise ValueError("%s is not a routing table file." % file_name)
+        if version != VERSION:
+            raise ValueError("The routing table version %i is not supported, the supported "
+                "version is %i." % (version, VERSION))
+        header = json.loads(self.mapping[PREFIX.size:PREFIX.size + header_length])
+        self.route_ids = header["routes"]
+        # key is a stop key or name and value is its class, a name stands for
+        # all the stops with that name and a key comes before a name
+        stop_class = header["stop_class"]
+        self.stop_classes = {}
+        for stop_id, stop_name in enumerate(header["stop_names"]):
+            self.stop_classes[stop_name] = stop_class[stop_id]
+        self.stop_classes.update(header["name_class"])
+        for stop_id, stop_key in enumerate(header["stops"]):
+            self.stop_classes[stop_key] = stop_class[stop_id]
+        # key is a normalized stop name or alias and value is the list of the
+        # stop names it stands for, like in mbta_names.StopNameIndex
+        self.normalized_names = {}
+        for stop_name in sorted(set(header["stop_names"])):
+            self.normalized_names.setdefault(normalize_name(stop_name), []).append(stop_name)
+        for alias, stop_name in ALIASES.items():
+            if stop_name in self.normalized_names.get(normalize_name(stop_name), ()):
+                self.normalized_names.setdefault(normalize_name(alias), []).append(stop_name)
+        self.num_classes = header["num_classes"]
+        num_nodes = header["num_nodes"]
+
+        offset = PREFIX.size + header_length
+        offset += -offset % 4
+        # the arrays are views of the mapping, nothing is copied, so they are
+        # read in the byte order of the machine, which must be little-endian
+        self.values = memoryview(self.mapping)[offset:].cast("I")
+        self.node_routes = self.values[:num_nodes]
+        self.node_next = self.values[num_nodes:2 * num_nodes]
+        self.class_table = self.values[2 * num_nodes:2 * num_nodes + self.num_classes * self.num_classes]
+
+    def get_class(self, stop):
+        """Helper method for find_routes(). Returns the class of the stop given 
+        by key or by name. A name which is not in the table is resolved after 
+        folding the case and punctuation and looking up the known aliases, if 
+        it stands for exactly one stop name. Raises KeyError if the stop is not 
+        in the table.
+        """
+
+        stop_class = self.stop_classes.get(stop)
+        if stop_class is not None:
+            return stop_class
+        stop_name_list = self.normalized_names.get(normalize_name(stop))
+        if stop_name_list is None or len(stop_name_list) > 1:
+            raise KeyError(stop)
+        return self.stop_classes[stop_name_list[0]]
+
+    def __contains__(self, stop):
+        try:
+            self.get_class(stop)
+        except KeyError:
+            return False
+        return True
+
+    def find_routes(self, src_stop, dest_stop):
+        """Returns the list of route ids with the fewest transfers needed to
+        travel from the source stop to the destination stop, or None if no
+        route is possible. The stops are given by key or by name, a name stands 
+        for all the stops with that name. The names are resolved like in 
+        get_class(). Raises KeyError if a stop is not in the table.
+        """
+
+        src_class = self.get_class(src_stop)
+        dest_class = self.get_class(dest_stop)
+        node = self.class_table[src_class * self.num_classes + dest_class]
+        if not node:
+            return None
+        needed_route_list = []
+        while node:
+            needed_route_list.append(self.route_ids[self.node_routes[node]])
+            node = self.node_next[node]
+        return needed_route_list
+
+    def close(self):
+        """Releases the views and unmaps the file.
+        """
+
+        for view in (self.node_routes, self.node_next, self.class_table, self.values):
+            view.release()
+        self.mapping.close()
@@ -0,0 +1,235 @@
+"""Long-running query service for the MBTA data. The network is loaded once
+and kept in memory, and a local HTTP server answers queries with JSON:
+
+GET /routes                                  long names of the subway routes
+GET /stops                                   unique stop count, route with
+                                             most and fewest stops, and the
+                                             wheelchair accessible stops
+GET /trip?stop1=NAME&stop2=NAME&mode=MODE    routes from stop1 to stop2, with
+                                             legs=1 also the boarding and
+                                             alighting stop of each route
+GET /stops/search?q=TEXT&limit=N             ranked stop names for the text,
+                                             for autocomplete
+GET /metrics                                 profile in Prometheus text
+                                             format, if profiling is enabled
+
+The network is refreshed in a background thread. A full refresh builds a new
+reader and then replaces the current one, so queries are never blocked and
+always see a complete network. With update functions, a refresh instead
+downloads the current data while queries go on, and then patches the current
+reader with only the changes since the last refresh. Queries share a
+read-write lock, so they run at the same time and only wait while the changes
+are applied, and they still see a complete network.
+"""
+
+import json
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import mbta_profile
+from mbta_closures import SCENARIOS
+
+class NetworkState:
+    """A loaded reader with the results which do not change until the next
+    refresh.
+    """
+
+    __slots__ = ("reader", "route_names", "stop_summary")
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.route_names = list(reader.route_long_names)
+        self.stop_summary = reader.get_stop_summary()
+        # the closure scenario of each mode is compiled once for each network
+        for scenario in SCENARIOS.values():
+            reader.get_closures(scenario)
+
+class ReadWriteLock:
+    """Lock which many readers can hold at the same time, or one writer alone.
+    A waiting writer stops new readers, so a steady stream of queries can not
+    delay a refresh forever.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.num_readers = 0
+        self.num_waiting_writers = 0
+        self.writer_active = False
+
+    @contextmanager
+    def read_lock(self):
+        with self.condition:
+            while self.writer_active or self.num_waiting_writers:
+                self.condition.wait()
+            self.num_readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.num_readers -= 1
+                if not self.num_readers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def write_lock(self):
+        with self.condition:
+            self.num_waiting_writers += 1
+            while self.writer_active or self.num_readers:
+                self.condition.wait()
+            self.num_waiting_writers -= 1
+            self.writer_active = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writer_active = False
+                self.condition.notify_all()
+
+class MBTAService:
+    """Keeps the current network state and answers queries about it.
+    load_reader is a function which returns a new reader with the route and
+    stop data loaded. fetch_update and apply_update are optional functions
+    which patch a loaded reader with the current data: fetch_update takes
+    the reader and returns the new data without changing the reader, e.g.
+    with fetch_stop_snapshot(), or None if it could not be retrieved, and
+    apply_update takes the reader and the new data and patches the reader,
+    e.g. with apply_refresh().
+    """
+
+    def __init__(self, load_reader, refresh_interval=3600, fetch_update=None, apply_update=None):
+        self.load_reader = load_reader
+        self.fetch_update = fetch_update
+        self.apply_update = apply_update
+        self.refresh_interval = refresh_interval
+        self.lock = ReadWriteLock()
+        self.stop_event = threading.Event()
+        self.refresh_thread = None
+        self.state = None
+        self.refresh()
+
+    def refresh(self):
+        """Loads a new network and replaces the current state with it, or 
+        patches the current network if there are update functions. The new 
+        data is downloaded without the lock, and only the patch holds it.
+        """
+
+        if (self.apply_update is None or self.state is None):
+            self.state = NetworkState(self.load_reader())
+            return
+        reader = self.state.reader
+        update = self.fetch_update(reader)
+        if update is None:
+            return
+        with self.lock.write_lock():
+            self.apply_update(reader, update)
+            self.state = NetworkState(reader)
+
+    def refresh_forever(self):
+        """Refreshes the network every refresh_interval seconds until stop() is
+        called. A failed refresh keeps the current network.
+        """
+
+        while not self.stop_event.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as error:
+                print("Refreshing the network failed: %s" % error)
+
+    def start_refresh(self):
+        """Starts the background refresh thread.
+        """
+
+        if self.refresh_interval > 0:
+            self.refresh_thread = threading.Thread(target=self.refresh_forever, daemon=True)
+            self.refresh_thread.start()
+
+    def stop(self):
+        """Stops the background refresh thread.
+        """
+
+        self.stop_event.set()
+
+    def handle_query(self, path, query):
+        """Returns the HTTP status code and the JSON result of the query.
+        """
+
+        if (self.apply_update is None):
+            return self.answer_query(path, query)
+        with self.lock.read_lock():
+            return self.answer_query(path, query)
+
+    def answer_query(self, path, query):
+        """Helper method for handle_query(). It is called while holding the read 
+        lock if the reader is patched in place by refresh().
+        """
+
+        state = self.state
+        if path == "/routes":
+            return 200, {"routes": state.route_names}
+        if path == "/stops":
+            return 200, state.stop_summary
+        if path == "/trip":
+            src_stop = query.get("stop1", [""])[0]
+            dest_stop = query.get("stop2", [""])[0]
+            mode = query.get("mode", ["normal"])[0]
+            if not src_stop or not dest_stop:
+                return 400, {"error": "stop1 and stop2 are required."}
+            if mode not in SCENARIOS:
+                return 400, {"error": "The mode %s is invalid." % mode}
+            legs = query.get("legs", ["0"])[0] in ("1", "true")
+            trip = state.reader.get_trip(src_stop, dest_stop, SCENARIOS[mode], legs)
+            return (200 if trip["error"] is None else 404), trip
+        if path == "/stops/search":
+            text = query.get("q", [""])[0]
+            try:
+                limit = int(query.get("limit", ["10"])[0])
+            except ValueError:
+                return 400, {"error": "limit must be an integer."}
+            return 200, {"query": text, "stops": state.reader.suggest_stop_names(text, limit)}
+        return 404, {"error": "Unknown path %s." % path}
+
+    def make_server(self, host, port):
+        """Returns an HTTP server which answers queries with this service.
+        """
+
+        service = self
+
+        class QueryHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if (url.path == "/metrics" and mbta_profile.profiler.enabled):
+                    self.send_body(200, "text/plain; version=0.0.4",
+                        mbta_profile.profiler.to_prometheus().encode())
+                    return
+                with mbta_profile.profiler.timer("service_query", url.path):
+                    status_code, result = service.handle_query(url.path, parse_qs(url.query))
+                self.send_body(status_code, "application/json", json.dumps(result).encode())
+
+            def send_body(self, status_code, content_type, body):
+                self.send_response(status_code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return ThreadingHTTPServer((host, port), QueryHandler)
+
+    def serve(self, host="127.0.0.1", port=8080):
+        """Answers queries until the process is interrupted.
+        """
+
+        httpd = self.make_server(host, port)
+        self.start_refresh()
+        print("Serving MBTA queries on http://%s:%i" % httpd.server_address[:2])
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            httpd.server_close()
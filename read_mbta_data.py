@@ -6,107 +6,629 @@ if a route is possible then prints the ordered list of routes need to be
 taken.
 """
 
-import requests
 import argparse
+import json
+import os
+import sys
+
+import mbta_profile
+from mbta_batch import iter_trip_results, read_queries
+from mbta_cache import SnapshotCache
+from mbta_client import MBTAClient
+from mbta_journeys import JourneyPlanner
+from mbta_closures import SCENARIOS, ClosureScenario, CompiledClosures
+from mbta_names import StopNameIndex
+from mbta_network import MBTANetwork, RouteStopsView, StopNamesView
+from mbta_resilience import iter_resilience, rank_results
+from mbta_routing_table import RoutingTable, write_routing_table
+from mbta_service import MBTAService
+
+# the GTFS route types of the API, the subway is light rail and heavy rail
+ROUTE_TYPES = {"light_rail": 0, "subway": 1, "commuter_rail": 2, "bus": 3, "ferry": 4}
+SUBWAY_ROUTE_TYPES = (0, 1)
+
+# the number of route patterns in each page of a route pattern request, each
+# pattern comes with its representative trip and the stops of the trip
+ROUTE_PATTERN_PAGE_LIMIT = 100
+# the parameters of a route pattern request, only the fields which are used
+# are requested
+ROUTE_PATTERN_PARAMS = {'include': 'representative_trip.stops',
+    'fields[route_pattern]': 'direction_id,route,representative_trip', 'fields[trip]': 'stops',
+    'fields[stop]': 'name,wheelchair_boarding,parent_station', 'page[limit]': ROUTE_PATTERN_PAGE_LIMIT}
+# the number of compiled closure scenarios kept for the network
+MAX_COMPILED_CLOSURES = 64
+
+def parse_route_types(text):
+    """Returns the tuple of the route type numbers in the comma separated text. 
+    Each item is a number, a name in ROUTE_TYPES, or "all" for every type.
+    """
+
+    route_types = []
+    for item in text.split(","):
+        item = item.strip().lower()
+        if (item == "all"):
+            route_types.extend(ROUTE_TYPES.values())
+        elif (item in ROUTE_TYPES):
+            route_types.append(ROUTE_TYPES[item])
+        elif (item.isdigit()):
+            route_types.append(int(item))
+        elif item:
+            raise ValueError("The route type %s is invalid." % item)
+    return tuple(sorted(set(route_types)))
+
+def get_stop_key(stop_info):
+    """Returns the key which identifies the stop: the id of its parent station, 
+    or its own id if it has no parent station.
+    """
+
+    parent_data = stop_info.get("relationships", {}).get("parent_station", {}).get("data")
+    if (isinstance(parent_data, dict) and parent_data.get("id")):
+        return parent_data["id"]
+    return stop_info.get("id", stop_info["attributes"]["name"])
+
+def get_route_pattern_responses(page):
+    """Returns one response for each route pattern of a page of route patterns, 
+    in the same format as the response of a single route stop request, with 
+    the direction of the pattern added as "direction_id". The stops of a 
+    pattern are the stops of its representative trip in travel order. The 
+    included stops are looked up by id, as each of them is included once for 
+    all the patterns of the page.
+    """
+
+    included = {(resource["type"], resource["id"]): resource for resource in page.get("included") or ()}
+    resp_list = []
+    for pattern_info in page["data"]:
+        relationships = pattern_info.get("relationships", {})
+        route_data = relationships.get("route", {}).get("data")
+        trip_data = relationships.get("representative_trip", {}).get("data")
+        if not (isinstance(route_data, dict) and isinstance(trip_data, dict)):
+            continue
+        trip_info = included.get(("trip", trip_data["id"]), {})
+        stop_info_list = []
+        for stop_data in trip_info.get("relationships", {}).get("stops", {}).get("data") or ():
+            stop_info = included.get(("stop", stop_data["id"]))
+            if (stop_info is not None):
+                stop_info_list.append(stop_info)
+        if stop_info_list:
+            resp_list.append({"data": stop_info_list, "included": [{"type": "route", "id": route_data["id"]}],
+                "direction_id": pattern_info.get("attributes", {}).get("direction_id", 0)})
+    return resp_list
 
 class MBTADataReader:
     """Contains methods for retrieving data from MBTA API and shows the data.
     """
 
-    routeId_list = []
-    route_to_stops_dict = {}
-    stop_set = set()
+    def __init__(self, client=None, route_types=SUBWAY_ROUTE_TYPES):
+        # all the requests are sent with one shared client, so connections
+        # are reused between requests
+        self.client = client if client is not None else MBTAClient()
+        self.route_types = tuple(route_types)
+        # every reader keeps its own data, so readers in the same process do 
+        # not share state
+        self.routeId_list = []
+        self.route_long_names = []
+        # the stops read by add_stop_data() which are not in the network yet, 
+        # build_transfer_graph() moves them to the network, which keeps the 
+        # only copy of the stops of the routes, see route_to_stops_dict
+        self.pending_route_to_stops_dict = {}
+        self.pending_route_to_accessible_dict = {}
+        self.pending_stop_names = {}
+        # key is the route id and value is the list of the stop patterns of 
+        # the route, see read_stop_data()
+        self.route_to_sequence_dict = {}
+        self.min_max_routes = None
+        self.network = None
+        self.name_index = None
+        self.journey_planner = None
+        self.compiled_closures = {}
+
+    @property
+    def route_to_stops_dict(self):
+        """Read-only dictionary where key is the route id and value is the set 
+        of the keys of the stops of the route, a view of the network. A stop 
+        key is the id of the parent station or of the stop.
+        """
+
+        return RouteStopsView(self.network) if (self.network is not None) else {}
+
+    @property
+    def stop_names(self):
+        """Read-only dictionary where key is a stop key and value is the stop 
+        name, a view of the network.
+        """
+
+        return StopNamesView(self.network) if (self.network is not None) else {}
+
+    @property
+    def stop_set(self):
+        """The set of the keys of all the stops, a view of the network.
+        """
+
+        return self.network.stop_index.keys() if (self.network is not None) else frozenset()
+
+    @property
+    def accessible_stop_set(self):
+        """The set of the keys of the stops which are wheelchair accessible on 
+        any of their routes.
+        """
+
+        if (self.network is None):
+            return set()
+        return self.network.accessible_stop_keys()
 
     def show_route_names(self):
-        """This method makes a HTTP get request to retrieve subway routes data
-        and shows the log names of all the subway routes.
+        """This method retrieves the routes data of the selected route types with 
+        load_route_names() and shows the log names of all the routes.
         """
 
-        # Here used the filter service of the API to filter route data corresponding
-        # to only subway routes. As types of the subway routes are 0 and 1, 
-        # 0 and 1 needs to be provided in the HTTP get request.
-        resp = requests.get('https://api-v3.mbta.com/routes?filter[type]=0,1')
-        
-        if resp.status_code != 200:
-            # This means something went wrong.
-            print("Something went wrong with request GET /routes/. The response "
-                + "status code is: %i" % resp.status_code)
+        route_long_names = self.load_route_names()
+        if route_long_names is None:
             return
-        
-        server_data = resp.json()
-        route_long_names = self.get_route_names(server_data)   
-        print("The long names for all the subway routes (route type 0 and 1) are: "
-            + str(route_long_names).strip("[]"))
+        if (self.route_types == SUBWAY_ROUTE_TYPES):
+            print("The long names for all the subway routes (route type 0 and 1) are: "
+                + str(route_long_names).strip("[]"))
+        else:
+            print("The long names for all the routes of type %s are: " % ", ".join(map(str, self.route_types))
+                + str(route_long_names).strip("[]"))
+
+    def load_route_names(self):
+        """This method makes a HTTP get request to retrieve the routes data of 
+        the selected route types, following the paging links, and returns the 
+        long names of all the routes, or None if the request failed.
+        """
+
+        route_data = self.fetch_route_data()
+        if route_data is None:
+            return
+        return self.get_route_names({"data": route_data})
+
+    def fetch_route_data(self):
+        """Helper method for load_route_names() and fetch_stop_snapshot(). This 
+        method returns the list of the routes of the selected route types from 
+        all the pages of the response, or None if the request failed.
+        """
+
+        # Here used the filter service of the API to filter route data corresponding
+        # to only the selected route types. The default types are the subway 
+        # types 0 and 1.
+        route_data = []
+        with mbta_profile.profiler.timer("phase", "load_route_names"):
+            for status_code, page in self.client.iter_pages('/routes',
+                    {'filter[type]': ','.join(map(str, self.route_types))}):
+                if status_code != 200:
+                    # This means something went wrong.
+                    print("Something went wrong with request GET /routes/. The response "
+                        + "status code is: %i" % status_code)
+                    return
+                route_data.extend(page["data"])
+        return route_data
 
     def get_route_names(self, json_data):
         """Helper method for show_route_names(). This method takes json data for 
         subway routes as input, parses the data, and returns long names of 
-        the subway routes. Also saves route id for future use.
+        the subway routes. Also saves route id and long name for future use, 
+        replacing the ones of an earlier call, so a refresh does not add 
+        duplicates.
         """
 
+        routeId_list = []
         route_long_names = []
         
         for route_info in json_data["data"]:
-            self.routeId_list.append(route_info["id"])
+            routeId_list.append(route_info["id"])
             route_long_names.append(route_info["attributes"]["long_name"])
+        self.routeId_list = routeId_list
+        self.route_long_names = route_long_names
         
         return route_long_names
 
-    def show_stop_info(self):
-        """This method loops through the route IDs retrieved in get_route_names()
-        method and for each route retrieve the correspong stops. Then it prints 
-        the total number of unique stops, the route with most stops, the route 
-        with fewest stops, and the name of the stops which are wheelchair accessible.
+    def show_stop_info(self, bulk=False):
+        """This method retrieves the stops of all the routes with load_stop_info(). 
+        Then it prints the total number of unique stops, the route with most 
+        stops, the route with fewest stops, and the name of the stops which are 
+        wheelchair accessible.
         """
 
-        resp_list = []
-        for routeId in self.routeId_list:
-            resp = requests.get('https://api-v3.mbta.com/stops?filter[route]=' + routeId +
-            '&include=route')
-            if resp.status_code != 200:
-                # This means something went wrong.
-                print("Something went wrong with request GET /stops/. The response status code is: %i" % resp.status_code)
-            else:
-                resp_list.append(resp.json())
-        
-        num_unique_stops = self.get_total_stops(resp_list)
-        print("Total number of unique stops is: %i" % num_unique_stops)
+        self.load_stop_info(bulk)
+
+        print("Total number of unique stops is: %i" % len(self.stop_set))
         
         min_route, max_route = self.get_route_max_min_stops()
         print("The route with most stops is: %s" % max_route)
         print("The route with fewest stops is: %s" % min_route)
 
-        accessible_stop_set = self.get_accessible_stops(resp_list)
-        print("Stops which are wheelchair accessible are: " + str(accessible_stop_set).strip("{}"))
+        accessible_stop_names = {self.get_stop_name(stop_key) for stop_key in self.accessible_stop_set}
+        print("Stops which are wheelchair accessible are: " + str(accessible_stop_names).strip("{}"))
+
+    def load_stop_info(self, bulk=False):
+        """This method loops through the route IDs retrieved in get_route_names()
+        method and for each route retrieve the correspong stops. The requests for 
+        all the routes are sent concurrently by the client, and each response is 
+        added by add_stop_data() as soon as it is received and then dropped, so 
+        all the responses are never kept at the same time. Then it builds the 
+        network used for trip queries. If bulk is True, the stops of all the 
+        routes are retrieved with as few requests as possible by 
+        iter_stops_bulk().
+        """
+
+        with mbta_profile.profiler.timer("phase", "load_stop_info"):
+            if bulk:
+                resp_iter = self.iter_stops_bulk()
+            else:
+                resp_iter = self.iter_stops()
+            for resp in resp_iter:
+                with mbta_profile.profiler.timer("phase", "add_stop_data"):
+                    self.add_stop_data(resp)
+        self.build_transfer_graph()
+
+    def get_stop_summary(self):
+        """This method returns a dictionary with the total number of unique stops, 
+        the route with most stops, the route with fewest stops, and the sorted 
+        names of the stops which are wheelchair accessible.
+        """
+
+        min_route, max_route = None, None
+        if self.route_to_stops_dict:
+            min_route, max_route = self.get_route_max_min_stops()
+        return {"num_unique_stops": len(self.stop_set), "max_route": max_route,
+            "min_route": min_route, "accessible_stops": sorted({self.get_stop_name(stop_key)
+                for stop_key in self.accessible_stop_set})}
+
+    def iter_stops(self, route_id_list=None, failed_routes=None):
+        """Helper method for show_stop_info(). This method sends one request for 
+        the route patterns of each route, the saved route ids if none are 
+        given, with the representative trip of each pattern and the stops of 
+        the trip included, and follows the paging links. It yields one 
+        response for each pattern in the order of the route ids, see 
+        get_route_pattern_responses(), so each direction and branch of a route 
+        keeps its own stop sequence. The ids of the routes with a failed page 
+        are added to the failed_routes set if it is given, as the patterns of 
+        their pages before it are still yielded.
+        """
+
+        if (route_id_list is None):
+            route_id_list = self.routeId_list
+        params_list = [dict(ROUTE_PATTERN_PARAMS, **{'filter[route]': routeId}) for routeId in route_id_list]
+        for params, status_code, page in self.client.iter_many_pages('/route_patterns', params_list):
+            if status_code != 200:
+                # This means something went wrong.
+                print("Something went wrong with request GET /route_patterns/. The response status code is: %i"
+                    % status_code)
+                if (failed_routes is not None):
+                    failed_routes.add(params['filter[route]'])
+                continue
+            for resp in get_route_pattern_responses(page):
+                if resp["included"][0]["id"] == params['filter[route]']:
+                    yield resp
+
+    def iter_stops_bulk(self, route_id_list=None, failed_routes=None):
+        """Helper method for show_stop_info(). This method retrieves the route 
+        patterns of all the routes, the saved route ids if none are given, with 
+        one request filtered by the comma separated route ids, with the 
+        representative trip of each pattern and the stops of the trip 
+        included, and follows the paging links. A stop 
+        is included only once even if it is on several routes, so the stops of 
+        each route are taken from the trips of its patterns, see 
+        get_route_pattern_responses(). Yields one response for each pattern, 
+        like iter_stops(). If a page fails, the patterns of the pages before it 
+        are still yielded and all the route ids are added to the failed_routes 
+        set if it is given, as any of them can have patterns on the missing 
+        pages.
+        """
+
+        if (route_id_list is None):
+            route_id_list = self.routeId_list
+        params = dict(ROUTE_PATTERN_PARAMS, **{'filter[route]': ','.join(route_id_list)})
+        route_id_set = set(route_id_list)
+        for status_code, page in self.client.iter_pages('/route_patterns', params):
+            if status_code != 200:
+                # This means something went wrong.
+                print("Something went wrong with request GET /route_patterns/. The response status code is: %i"
+                    % status_code)
+                if (failed_routes is not None):
+                    failed_routes.update(route_id_list)
+                break
+            for resp in get_route_pattern_responses(page):
+                if resp["included"][0]["id"] in route_id_set:
+                    yield resp
+
+    def add_stop_data(self, resp):
+        """Helper method for show_stop_info() and get_total_stops(). This method 
+        parses one server response containg stop information of one route in a 
+        single pass. It adds the stops to the pending route to stops 
+        dictionary, and saves the stops which are wheelchair accessible and the 
+        stop names, until build_transfer_graph() adds them to the network. The 
+        stops are identified by their keys, see get_stop_key().
+        """
+
+        self.read_stop_data(resp, self.pending_route_to_stops_dict, self.pending_route_to_accessible_dict,
+            self.pending_stop_names, self.route_to_sequence_dict)
+        self.min_max_routes = None
+
+    def read_stop_data(self, resp, route_to_stops_dict, route_to_accessible_dict, stop_names,
+            route_to_sequence_dict=None):
+        """Helper method for add_stop_data() and fetch_stop_snapshot(). This method 
+        adds the stop keys of one server response to the given route to stops 
+        and route to accessible stops dictionaries, and to the route to stop 
+        sequence dictionary if one is given. It saves the stop names in the 
+        given stop name dictionary, and returns the stop set and the accessible 
+        stop set of the route.
+        The value of the route to stop sequence dictionary is the list of the 
+        (direction, stop keys) patterns of the route. A route pattern response 
+        of iter_stops() adds one pattern with its direction and its stops in 
+        travel order. The pages of a stop response without a direction make 
+        one pattern with the direction None, which is traveled both ways.
+        """
+
+        # each response belongs to one route
+        # get the route id for this response
+        route_key = resp["included"][0]["id"]
+        route_stop_set = route_to_stops_dict.setdefault(route_key, set())
+        route_accessible_set = route_to_accessible_dict.setdefault(route_key, set())
+        route_sequence = None
+        if (route_to_sequence_dict is not None):
+            route_patterns = route_to_sequence_dict.setdefault(route_key, [])
+            direction = resp.get("direction_id")
+            if (direction is None and route_patterns and route_patterns[-1][0] is None):
+                route_sequence = route_patterns[-1][1]
+            else:
+                route_sequence = []
+                route_patterns.append((direction, route_sequence))
+            sequence_keys = set(route_sequence)
+        for stop_info in resp["data"]:
+            stop_attributes = stop_info["attributes"]
+            stop_key = get_stop_key(stop_info)
+            stop_names[stop_key] = stop_attributes["name"]
+            # the platforms of a station have the same key, so the station is 
+            # only added at its first platform
+            if (route_sequence is not None and stop_key not in sequence_keys):
+                sequence_keys.add(stop_key)
+                route_sequence.append(stop_key)
+            route_stop_set.add(stop_key)
+            if (stop_attributes["wheelchair_boarding"] == 1):
+                route_accessible_set.add(stop_key)
+        return route_stop_set, route_accessible_set
+
+    def get_stop_name(self, stop_key):
+        """This method returns the name of the stop with the given key.
+        """
+
+        return self.stop_names.get(stop_key, stop_key)
 
     def get_total_stops(self, resp_list):
-        """Helper method for show_stop_info(). This method parses the server 
-        responses containg stop information and saves all the unique stop ids. 
-        It also creates a dictionary where key is the route id and value is all 
-        the stops corresponding to this route.
+        """This method parses the server responses containg stop information and 
+        saves all the unique stop names. It also creates a dictionary where key 
+        is the route id and value is all the stops corresponding to this route, 
+        and builds the network used for trip queries.
         """
   
         for resp in resp_list:
-            # each response belongs to one route
-            # get the route id for this response
-            route_key = resp["included"][0]["id"]
-            for stop_info in resp["data"]:
-                stop_name = stop_info["attributes"]["name"]
-                self.stop_set.add(stop_name)
-                self.route_to_stops_dict.setdefault(route_key,set()).add(stop_name)
+            self.add_stop_data(resp)
+        self.build_transfer_graph()
         return len(self.stop_set)
         
+    def build_transfer_graph(self):
+        """Helper method for get_total_stops(). This method builds the network 
+        model used by find_src_to_dest() once, so it is not rebuilt for every 
+        query. The network interns the stop names and route ids to integer ids 
+        and keeps the route to routes bitsets. The pending stops read by 
+        add_stop_data() are added to the stops of the current network and then 
+        dropped, so the network is the only copy of them. It also builds the 
+        stop name index which resolves the stop names users type.
+        """
+
+        route_to_stops_dict = self.pending_route_to_stops_dict
+        route_to_accessible_dict = self.pending_route_to_accessible_dict
+        stop_names = self.pending_stop_names
+        if (self.network is not None):
+            route_to_stops_dict = self.network.get_route_to_stops_dict()
+            route_to_accessible_dict = self.network.get_route_to_accessible_dict()
+            for route_id, route_stop_set in self.pending_route_to_stops_dict.items():
+                route_to_stops_dict.setdefault(route_id, set()).update(route_stop_set)
+            for route_id, route_accessible_set in self.pending_route_to_accessible_dict.items():
+                route_to_accessible_dict.setdefault(route_id, set()).update(route_accessible_set)
+            stop_names = self.network.get_stop_names()
+            stop_names.update(self.pending_stop_names)
+        self.pending_route_to_stops_dict = {}
+        self.pending_route_to_accessible_dict = {}
+        self.pending_stop_names = {}
+        with mbta_profile.profiler.timer("phase", "build_transfer_graph"):
+            self.network = MBTANetwork(route_to_stops_dict, stop_names, route_to_accessible_dict)
+        self.min_max_routes = None
+        with mbta_profile.profiler.timer("phase", "build_name_index"):
+            self.name_index = StopNameIndex(self.network.stop_name_ids)
+        self.journey_planner = None
+        self.compiled_closures = {}
+
+    def refresh_stop_info(self, bulk=False):
+        """This method retrieves the routes and the stops of all the routes again 
+        with fetch_stop_snapshot() and updates the data with apply_refresh(), so 
+        only the changed routes and stops are patched. Returns the changes, or 
+        None if the routes, or in bulk mode any page of the stops, could not be 
+        retrieved.
+        """
+
+        snapshot = self.fetch_stop_snapshot(bulk)
+        if snapshot is None:
+            return None
+        return self.apply_refresh(snapshot)
+
+    def fetch_stop_snapshot(self, bulk=False):
+        """Helper method for refresh_stop_info(). This method retrieves the routes 
+        and the stops of all the routes, like show_route_names() and 
+        load_stop_info(), without changing the reader, so queries can still 
+        read it meanwhile. Returns a dictionary with the routes response and 
+        the route to stops, route to accessible stops, stop name and route to 
+        stop sequence dictionaries, or None if the routes could not be 
+        retrieved. A route with a failed page is left out of the snapshot, so 
+        its current stops are kept instead of being replaced by the stops of 
+        the pages before the failed one. In bulk mode one failed page can 
+        leave out any route, so None is returned.
+        """
+
+        route_data = self.fetch_route_data()
+        if route_data is None:
+            return None
+        route_id_list = [route_info["id"] for route_info in route_data]
+        snapshot = {"routes": {"data": route_data}, "route_to_stops_dict": {},
+            "route_to_accessible_dict": {}, "stop_names": {}, "route_to_sequence_dict": {}}
+        failed_routes = set()
+        with mbta_profile.profiler.timer("phase", "refresh_stop_info"):
+            if bulk:
+                resp_iter = self.iter_stops_bulk(route_id_list, failed_routes)
+            else:
+                resp_iter = self.iter_stops(route_id_list, failed_routes)
+            for resp in resp_iter:
+                self.read_stop_data(resp, snapshot["route_to_stops_dict"],
+                    snapshot["route_to_accessible_dict"], snapshot["stop_names"],
+                    snapshot["route_to_sequence_dict"])
+        if (bulk and failed_routes):
+            return None
+        for route_id in failed_routes:
+            snapshot["route_to_stops_dict"].pop(route_id, None)
+            snapshot["route_to_accessible_dict"].pop(route_id, None)
+            snapshot["route_to_sequence_dict"].pop(route_id, None)
+        return snapshot
+
+    def apply_refresh(self, snapshot):
+        """This method saves the routes of a snapshot of fetch_stop_snapshot() 
+        and patches the network with its stops with apply_stop_snapshot(). The 
+        routes which are not in the snapshot any more are removed, and the 
+        current stops of a route whose request failed are kept. Returns the 
+        changes.
+        """
+
+        self.get_route_names(snapshot["routes"])
+        route_id_set = set(self.routeId_list)
+        removed_routes = [route_id for route_id in self.route_to_stops_dict if route_id not in route_id_set]
+        with mbta_profile.profiler.timer("phase", "apply_stop_snapshot"):
+            return self.apply_stop_snapshot(snapshot["route_to_stops_dict"],
+                snapshot["route_to_accessible_dict"], removed_routes,
+                snapshot["route_to_sequence_dict"], snapshot["stop_names"])
+
+    def apply_stop_snapshot(self, route_to_stops_dict, route_to_accessible_dict, removed_routes=(),
+            route_to_sequence_dict=None, stop_names=None):
+        """This method compares the stops and accessible stops of the given 
+        routes with the ones of the network and patches the network in place, 
+        with the route with most and fewest stops, the stop name index and the 
+        compiled closure scenarios. stop_names gives the names of the stops, and 
+        a stop whose name changed is renamed in the network, the name index and 
+        the compiled closures. Only the routes and stops which changed are 
+        visited, and the cached transfer graphs are kept unless the links 
+        between the routes changed. The stop sequences of the routes are 
+        replaced if they are given, and the journey planner is built again at 
+        the next journey query if any route changed. Returns a dictionary with 
+        the changed routes, the keys of the added, removed and renamed stops, 
+        and the keys of the stops whose wheelchair accessibility changed.
+        """
+
+        stop_names = stop_names or {}
+        if (route_to_sequence_dict is not None):
+            for route_id, route_sequence in route_to_sequence_dict.items():
+                if (self.route_to_sequence_dict.get(route_id) != route_sequence):
+                    self.route_to_sequence_dict[route_id] = route_sequence
+                    self.journey_planner = None
+        for route_id in removed_routes:
+            self.route_to_sequence_dict.pop(route_id, None)
+
+        if (self.network is None):
+            self.pending_route_to_stops_dict = dict(route_to_stops_dict)
+            self.pending_route_to_accessible_dict = dict(route_to_accessible_dict)
+            self.pending_stop_names = dict(stop_names)
+            self.min_max_routes = None
+            self.build_transfer_graph()
+            return {"changed_routes": sorted(route_to_stops_dict), "added_stops": sorted(self.stop_set),
+                "removed_stops": [], "renamed_stops": [],
+                "accessibility_changed": sorted(self.accessible_stop_set)}
+
+        network = self.network
+        changed_routes = []
+        # the routes given to the network, the changed routes and the routes 
+        # whose accessible stops changed
+        patched_routes = []
+        old_stop_counts = {}
+        for route_id, route_stop_set in route_to_stops_dict.items():
+            if (route_id not in network.route_index):
+                changed_routes.append(route_id)
+                patched_routes.append(route_id)
+                old_stop_counts[route_id] = None
+                continue
+            old_stop_set = network.route_stop_keys(route_id)
+            if (old_stop_set != route_stop_set):
+                changed_routes.append(route_id)
+                patched_routes.append(route_id)
+                old_stop_counts[route_id] = len(old_stop_set)
+            elif (network.route_accessible_keys(route_id) != route_to_accessible_dict.get(route_id, set())):
+                patched_routes.append(route_id)
+        for route_id in removed_routes:
+            if (route_id in network.route_index and route_id not in route_to_stops_dict):
+                changed_routes.append(route_id)
+                patched_routes.append(route_id)
+                old_stop_counts[route_id] = None
+
+        if changed_routes:
+            self.journey_planner = None
+        network_update = network.update_routes(route_to_stops_dict, patched_routes, stop_names,
+            route_to_accessible_dict)
+        self.update_route_max_min_stops(old_stop_counts)
+        for stop_id, stop_key, old_stop_name, stop_name in network_update.renamed_stops:
+            if (old_stop_name not in network.stop_name_ids):
+                self.name_index.remove_stop_name(old_stop_name)
+            self.name_index.add_stop_name(stop_name)
+        for stop_id, stop_key, stop_name in network_update.added_stops:
+            self.name_index.add_stop_name(stop_name)
+        for stop_key, stop_name in network_update.removed_stop_names:
+            # the name stays in the index while another stop has it
+            if (stop_name not in network.stop_name_ids):
+                self.name_index.remove_stop_name(stop_name)
+        changes = {"changed_routes": changed_routes,
+            "added_stops": sorted(stop_key for stop_id, stop_key, stop_name in network_update.added_stops),
+            "removed_stops": sorted(stop_key for stop_key, stop_name in network_update.removed_stop_names),
+            "renamed_stops": sorted(rename[1] for rename in network_update.renamed_stops),
+            "accessibility_changed": sorted(network_update.accessibility_changed)}
+
+        for scenario, closures in self.compiled_closures.items():
+            self.compiled_closures[scenario] = scenario.update_compiled(closures, network_update)
+        return changes
+
+    def update_route_max_min_stops(self, old_stop_counts):
+        """Helper method for apply_stop_snapshot(). This method takes the old stop 
+        count of each changed route, None for an added or removed route, and 
+        keeps the route with most and fewest stops unless a changed route may 
+        replace one of them. Then they are found again by 
+        get_route_max_min_stops() when they are needed.
+        """
+
+        if (self.min_max_routes is None):
+            return
+        min_route, max_route = self.min_max_routes
+        min_count = self.network.num_route_stops(min_route)
+        max_count = self.network.num_route_stops(max_route)
+        for route_id in old_stop_counts:
+            if (route_id in (min_route, max_route) or route_id not in self.network.route_index):
+                self.min_max_routes = None
+                return
+            stop_count = self.network.num_route_stops(route_id)
+            if (stop_count <= min_count or stop_count >= max_count):
+                self.min_max_routes = None
+                return
+
     def get_route_max_min_stops(self):
-        """Helper method for show_stop_info(). This method loops through the route 
-        to stop dictionary. Check the total number of stops corresponding to each 
-        route and finds the route with the most stops and the route with fewest 
-        stops.
+        """Helper method for show_stop_info(). This method loops through the 
+        routes of the network. Check the total number of stops corresponding to 
+        each route and finds the route with the most stops and the route with 
+        fewest stops. The result is kept until the stops of the routes change. 
+        Returns None for both routes if the network has no route.
         """
 
+        if (self.min_max_routes is not None):
+            return self.min_max_routes
+        if (self.network is None or not self.network.route_index):
+            return None, None
         min = 0
         max = 0
-        for route_key in self.route_to_stops_dict.keys():
-            stop_count = len(self.route_to_stops_dict[route_key])
+        for route_key in self.network.route_index:
+            stop_count = self.network.num_route_stops(route_key)
             if min == 0:
                 min = stop_count
                 min_route = route_key
@@ -121,12 +643,13 @@ class MBTADataReader:
                 if (max < stop_count):
                     max = stop_count
                     max_route = route_key
+        self.min_max_routes = (min_route, max_route)
         return min_route, max_route
 
     def get_accessible_stops(self, resp_list): 
-        """Helper method for show_stop_info(). This method parses the server 
-        responses containg stop information and saves the stop names which 
-        are wheelchair accessible.
+        """This method parses the server responses containg stop information and 
+        returns the stop names which are wheelchair accessible. show_stop_info() 
+        does not use it, as add_stop_data() saves them while reading the stops.
         """
 
         accessible_stop_set = set()     
@@ -138,15 +661,39 @@ class MBTADataReader:
 
         return accessible_stop_set
 
-    def trip_src_to_dest_stop(self, src_stop, dest_stop, banned_stops):
+    def trip_src_to_dest_stop(self, src_stop, dest_stop, banned_stops, legs=False):
         """This method takes a source stop, a destination stop, and a set of stop 
         names which are closed as inputs and tries to find if traveling from 
         source to destination is possible. If possible, then it prints the 
         ordered list of routes that need to be taken to travel from source to 
-        destination.
+        destination. With legs, it prints where each route is boarded and 
+        alighted instead.
         """
 
+        if legs:
+            self.show_journey(self.find_journey(src_stop, dest_stop, banned_stops))
+            return
         needed_route_list = self.find_src_to_dest(src_stop, dest_stop, banned_stops)
+        self.show_route_list(needed_route_list)
+
+    def show_journey(self, journey):
+        """Helper method for trip_src_to_dest_stop(). This method prints the legs 
+        of the journey, or that no route is possible.
+        """
+
+        if (journey is None):
+            print("No route is possible.")
+            return
+        for leg_num, leg in enumerate(journey.legs, 1):
+            print("%i. Take %s from %s to %s (%i stops)." % (leg_num, leg.route_id,
+                leg.board_stop.name, leg.alight_stop.name, leg.num_stops))
+        print("The trip needs %i transfers and travels %i stops." % (journey.num_transfers, journey.num_stops))
+
+    def show_route_list(self, needed_route_list):
+        """Helper method for trip_src_to_dest_stop(). This method prints the 
+        ordered list of routes, or that no route is possible.
+        """
+
         if (not needed_route_list):
             print("No route is possible.")
         else:
@@ -158,97 +705,157 @@ class MBTADataReader:
             else:
                 print("The routes needed are: " + str(needed_route_list).strip("[]"))
 
+    def get_trip(self, src_stop, dest_stop, banned_stops, legs=False):
+        """This method takes the same inputs as trip_src_to_dest_stop() and returns 
+        the result as a dictionary instead of printing it. The value of "routes" 
+        is the ordered list of routes, or None if no route is possible, and the 
+        value of "error" says which stop name is invalid, with the stop names 
+        the user may mean in "suggestions". With legs, the routes come from 
+        find_journey() and the journey is added as "journey".
+        """
+
+        trip = {"source": src_stop, "destination": dest_stop, "routes": None, "error": None,
+            "suggestions": []}
+        src_stop = self.resolve_stop_name(src_stop)
+        dest_stop = self.resolve_stop_name(dest_stop)
+        if (src_stop is None):
+            trip["error"] = "The source stop name is invalid."
+            trip["suggestions"] = self.suggest_stop_names(trip["source"])
+        elif (dest_stop is None):
+            trip["error"] = "The destination stop name is invalid."
+            trip["suggestions"] = self.suggest_stop_names(trip["destination"])
+        else:
+            trip["source"] = src_stop
+            trip["destination"] = dest_stop
+            if legs:
+                with mbta_profile.profiler.timer("phase", "find_journey"):
+                    closures = self.get_closures(banned_stops)
+                    journey = self.get_journey_planner().find_journey(src_stop, dest_stop,
+                        closures.stop_mask, closures.route_mask)
+                trip["journey"] = journey.to_dict() if journey is not None else None
+                trip["routes"] = journey.route_ids() if journey is not None else None
+            else:
+                with mbta_profile.profiler.timer("phase", "find_routes"):
+                    closures = self.get_closures(banned_stops)
+                    trip["routes"] = self.network.find_routes(src_stop, dest_stop,
+                        closures.stop_mask, closures.route_mask)
+        return trip
+
+    def get_trips(self, queries, processes=1):
+        """This method takes an iterable of (source stop, destination stop, 
+        closures) tuples and yields the result of each query in the format of 
+        get_trip() with the row number of the query added. The queries are 
+        grouped by closure set and source stop, so each source searches the 
+        routes once for all its destinations, see mbta_batch. With more than 
+        one process the results do not come in the order of the queries.
+        """
+
+        return iter_trip_results(self, queries, processes)
+
+    def get_closures(self, banned_stops):
+        """Helper method for get_trip() and find_src_to_dest(). This method takes 
+        either a set of closed stop names or a ClosureScenario, and returns the 
+        closed stops and routes as bitsets of the network. A scenario is compiled 
+        only once for each network, and at most MAX_COMPILED_CLOSURES scenarios 
+        are kept, dropping the oldest first.
+        """
+
+        if isinstance(banned_stops, ClosureScenario):
+            closures = self.compiled_closures.get(banned_stops)
+            if (closures is None):
+                closures = banned_stops.compile(self.network)
+                if (len(self.compiled_closures) >= MAX_COMPILED_CLOSURES):
+                    del self.compiled_closures[next(iter(self.compiled_closures))]
+                self.compiled_closures[banned_stops] = closures
+            return closures
+        return CompiledClosures(self.network.stop_mask(banned_stops), 0)
+
+    def resolve_stop_name(self, stop_name):
+        """This method returns the stop key or stop name the given name means, 
+        after folding the case and punctuation and looking up the known aliases, 
+        or None if it is not a stop.
+        """
+
+        if (stop_name in self.stop_set or (self.network is not None
+                and stop_name in self.network.stop_name_ids)):
+            return stop_name
+        if (self.name_index is None):
+            return None
+        return self.name_index.resolve(stop_name)
+
+    def suggest_stop_names(self, text, limit=5):
+        """This method returns the ranked list of the stop names the given text 
+        may mean, the stop names starting with it first, then the stop names 
+        with a few spelling differences.
+        """
+
+        if (self.name_index is None):
+            return []
+        return self.name_index.suggest(text, limit)
+
     def find_src_to_dest(self, src_stop, dest_stop, banned_stops):
         """Helper method for trip_src_to_dest_stop(). This method calculates the 
-        routes needed to travel from source to destination. At first it checks if 
-        source and destination stops are in the same route, then it returns that 
-        route. If not, then it creates a dictionary where key is the route id and 
-        value is all the routes which can be traveled from the key route. If two 
-        route has any common stop, traveling from one route to another is possible. 
-        After creating the dictionary, it tries to find if two routes can be used 
-        to travel from source to destination where the first route contains the 
-        source stop and the second route contains the destination stop. If it is not 
-        possible to use two routes, then it takes each route which contains the 
-        source stop and tries to find a path from this route to some other route 
-        which contains the destination route.
-        """
-
-        needed_route_list = []
-        route_with_src = []
-        route_with_dest = []
-        if (src_stop not in self.stop_set):
-            print("The source stop name is invalid.")
-            return
-        if (dest_stop not in self.stop_set):
-            print("The destination stop name is invalid.")
+        routes needed to travel from source to destination. The closed stops, 
+        given as a set of stop names or a ClosureScenario, are turned into 
+        bitsets, and the network built by build_transfer_graph() runs a 
+        breadth-first search over the routes, so the returned route list needs 
+        the fewest transfers. The stop names are resolved with 
+        resolve_stop_name(), so the case and punctuation do not matter.
+        """
+
+        stop_pair = self.resolve_stop_pair(src_stop, dest_stop)
+        if (stop_pair is None):
             return
+        src_stop, dest_stop = stop_pair
 
-        # check if source and destination are in the same route    
-        for route_key in self.route_to_stops_dict:
-            stop_set_for_route = self.route_to_stops_dict[route_key]
-            stop_set_for_route = stop_set_for_route - banned_stops
-            if (src_stop in stop_set_for_route and dest_stop in stop_set_for_route):
-                needed_route_list.append(route_key)
-                break
-            elif (src_stop in stop_set_for_route):
-                route_with_src.append(route_key)
-            elif (dest_stop in stop_set_for_route):
-                route_with_dest.append(route_key)       
-                
-        if (len(needed_route_list) == 1):
-            # source and destination are in the same route, return it
-            return needed_route_list
-        else:
-            # if there is no route with the source stop or there is no route 
-            # with the destination stop then return
-            if (not route_with_src or not route_with_dest):
-                return 
-            # create the route to routes dictionary
-            route_to_routes_dict = {}
-            for route_key1 in self.route_to_stops_dict:
-                for route_key2 in self.route_to_stops_dict:
-                    if (route_key1 != route_key2):
-                        stop_set1 = self.route_to_stops_dict[route_key1]
-                        stop_set2 = self.route_to_stops_dict[route_key2]
-                        if (len(banned_stops) > 0):
-                            stop_set1 = stop_set1-banned_stops
-                            stop_set2 = stop_set2-banned_stops
-                        if (len(stop_set1.intersection(stop_set2)) > 0):
-                            route_to_routes_dict.setdefault(route_key1,set()).add(route_key2)
-
-            # print(route_to_routes_dict)
-            # check if there is a path containing two routes
-            for route_key_src in route_with_src:
-                for route_key_dest in route_with_dest:
-                    if (route_key_dest in route_to_routes_dict[route_key_src]):
-                        needed_route_list.append(route_key_src)
-                        needed_route_list.append(route_key_dest)
-                        break
-            if (len(needed_route_list) == 2):
-                return needed_route_list
-            else:
-                # there is no path containing two routes, call the recursive method 
-                # find_routes with each route containing the source stop
-                for route_key_src in route_with_src:
-                    if (self.find_routes(route_key_src, route_with_dest, route_to_routes_dict, needed_route_list)):
-                        break
-                return needed_route_list
-
-    def find_routes(self, route_key_src, route_with_dest, route_to_routes_dict, needed_route_list):
-        """Helper recursive method for find_src_to_dest(). Starting from a route 
-        with source route, for each route, it appends the route into the result 
-        list, and then call this method again with the new route until a route 
-        with destination stop is reached.
-        """
-
-        for route_key_dest in route_with_dest:
-            if (route_key_dest in route_to_routes_dict[route_key_src]):
-                needed_route_list.append(route_key_src)
-                needed_route_list.append(route_key_dest)
-                return True
-        for related_route in route_to_routes_dict[route_key_src]:
-            needed_route_list.append(route_key_src)
-            self.find_routes(related_route, route_with_dest, route_to_routes_dict, needed_route_list)
+        with mbta_profile.profiler.timer("phase", "find_routes"):
+            closures = self.get_closures(banned_stops)
+            return self.network.find_routes(src_stop, dest_stop, closures.stop_mask, closures.route_mask)
+
+    def resolve_stop_pair(self, src_stop, dest_stop):
+        """Helper method for find_src_to_dest() and find_journey(). This method 
+        resolves the source and destination stop names with resolve_stop_name() 
+        and returns them, or prints which one is invalid with the stop names 
+        the user may mean and returns None.
+        """
+
+        for stop_kind, stop_name in (("source", src_stop), ("destination", dest_stop)):
+            if (self.resolve_stop_name(stop_name) is None):
+                print("The %s stop name is invalid." % stop_kind)
+                suggestions = self.suggest_stop_names(stop_name)
+                if suggestions:
+                    print("Did you mean: " + ", ".join(suggestions) + "?")
+                return None
+        return self.resolve_stop_name(src_stop), self.resolve_stop_name(dest_stop)
+
+    def get_journey_planner(self):
+        """This method returns the journey planner of the network, which is built 
+        from the stop sequences of the routes at the first journey query after 
+        the network is built or changed.
+        """
+
+        if (self.journey_planner is None):
+            with mbta_profile.profiler.timer("phase", "build_journey_planner"):
+                self.journey_planner = JourneyPlanner(self.network, self.route_to_sequence_dict)
+        return self.journey_planner
+
+    def find_journey(self, src_stop, dest_stop, banned_stops):
+        """This method takes the same inputs as find_src_to_dest() and returns the 
+        Journey with the fewest transfers, then the fewest stops traveled, or 
+        None if no journey is possible. Each leg of the journey says where the 
+        route is boarded and alighted. Unlike find_src_to_dest(), the search 
+        runs over the ordered stops of the routes, see mbta_journeys.
+        """
+
+        stop_pair = self.resolve_stop_pair(src_stop, dest_stop)
+        if (stop_pair is None):
+            return None
+        src_stop, dest_stop = stop_pair
+
+        with mbta_profile.profiler.timer("phase", "find_journey"):
+            closures = self.get_closures(banned_stops)
+            return self.get_journey_planner().find_journey(src_stop, dest_stop,
+                closures.stop_mask, closures.route_mask)
 
 def main():
     myParser = argparse.ArgumentParser(description=__doc__)
@@ -259,28 +866,218 @@ def main():
     myParser.add_argument('--mode', type=str, nargs='?', default="normal",
         help="the default mode is normal, if user specifies the mode as covid19, then some stops will be considered as closed.")
 
+    myParser.add_argument('--closures', type=str, default="",
+        help="a json file with the closed \"stops\", stop \"name_patterns\" and \"routes\", optional input. It is used instead of --mode.")
+    myParser.add_argument('--legs', action='store_true',
+        help="show where each route is boarded and alighted and the number of stops traveled, with the fewest transfers, then the fewest stops.")
+
+    myParser.add_argument('--api-key', type=str, default=os.environ.get("MBTA_API_KEY"),
+        help="the MBTA API key, optional input. The default is the MBTA_API_KEY environment variable.")
+    myParser.add_argument('--timeout', type=float, default=10.0,
+        help="the timeout in seconds for each HTTP request, the default is 10.")
+    myParser.add_argument('--max-workers', type=int, default=4,
+        help="the maximum number of HTTP requests sent at the same time, the default is 4.")
+
+    myParser.add_argument('--route-types', type=str, default="0,1",
+        help="the comma separated route types to load, as numbers or names (light_rail, subway, commuter_rail, bus, ferry) or all, the default is 0,1.")
+    myParser.add_argument('--bulk', action='store_true',
+        help="retrieve the stops of all the routes with as few requests as possible.")
+
+    myParser.add_argument('--cache', type=str, default="",
+        help="the file for the snapshot cache of the API responses, optional input.")
+    myParser.add_argument('--cache-ttl', type=float, default=3600,
+        help="the number of seconds a cached response is used before it is revalidated, the default is 3600.")
+    myParser.add_argument('--offline', action='store_true',
+        help="use only the snapshot cache and send no HTTP requests, needs --cache.")
+
+    myParser.add_argument('--serve', action='store_true',
+        help="run a local HTTP server which loads the network once and answers queries with JSON.")
+    myParser.add_argument('--host', type=str, default="127.0.0.1",
+        help="the address the server listens on, the default is 127.0.0.1.")
+    myParser.add_argument('--port', type=int, default=8080,
+        help="the port the server listens on, the default is 8080.")
+    myParser.add_argument('--refresh-interval', type=float, default=3600,
+        help="the number of seconds between background refreshes of the network in serve mode, the default is 3600.")
+
+    myParser.add_argument('--build-table', type=str, default="",
+        help="write the precomputed routing table of all the stop pairs to this file.")
+    myParser.add_argument('--table', type=str, default="",
+        help="answer a normal mode trip query from a routing table file written with --build-table, without loading the network.")
+
+    myParser.add_argument('--resilience', action='store_true',
+        help="for every stop, find the stop pairs which lose connectivity and the extra transfers needed if only that stop is closed.")
+    myParser.add_argument('--resilience-output', type=str, default="",
+        help="write each resilience result to this file as a json line as soon as it is computed.")
+    myParser.add_argument('--processes', type=int, default=None,
+        help="the number of worker processes of the resilience sweep and of the query batch, the default is the number of CPUs.")
+
+    myParser.add_argument('--queries', type=str, default="",
+        help="answer the trip queries of this CSV or JSONL file, with the source, destination and closures of each query, and write the results as JSON lines.")
+    myParser.add_argument('--queries-output', type=str, default="",
+        help="the file for the results of --queries, the default is the standard output.")
+
+    myParser.add_argument('--profile', action='store_true',
+        help="print a breakdown of the time spent in each phase, the HTTP requests, and the search counters.")
+    myParser.add_argument('--profile-output', type=str, default="",
+        help="write the profile to this file, in Prometheus text format if the name ends with .prom, otherwise as json.")
+
     args = myParser.parse_args()
+    if (args.offline and not args.cache):
+        myParser.error("--offline needs --cache")
+    if (args.table and (args.mode != "normal" or args.closures or args.legs)):
+        myParser.error("--table answers only normal mode queries, it cannot be used with --mode, --closures or --legs")
+    try:
+        args.route_types = parse_route_types(args.route_types)
+    except ValueError as error:
+        myParser.error(str(error))
+
+    if (args.profile or args.profile_output):
+        mbta_profile.enable()
+
+    cache = SnapshotCache(args.cache, args.cache_ttl) if args.cache else None
+    client = MBTAClient(api_key=args.api_key, timeout=args.timeout, max_workers=args.max_workers,
+        cache=cache, offline=args.offline)
+
+    try:
+        run(args, client)
+    finally:
+        if args.profile:
+            print(mbta_profile.profiler.report())
+        if args.profile_output:
+            write_profile(args.profile_output)
 
-    my_mbta_data_reader = MBTADataReader()
+def run(args, client):
+    """Runs the program with the parsed command line arguments.
+    """
+
+    if (args.table and args.stop1 and args.stop2):
+        # answer from the precomputed routing table without loading the network
+        routing_table = RoutingTable(args.table)
+        try:
+            try:
+                needed_route_list = routing_table.find_routes(args.stop1, args.stop2)
+            except KeyError:
+                print("The %s stop name is invalid." % ("source" if args.stop1 not in routing_table
+                    else "destination"))
+                needed_route_list = None
+            MBTADataReader(client).show_route_list(needed_route_list)
+        finally:
+            routing_table.close()
+        return
+
+    if args.queries:
+        reader = MBTADataReader(client, args.route_types)
+        reader.load_route_names()
+        reader.load_stop_info(args.bulk)
+        check_network_loaded(reader, args)
+        write_trips(reader, args.queries, args.queries_output, args.processes)
+        return
+
+    if args.serve:
+        def load_reader():
+            reader = MBTADataReader(client, args.route_types)
+            reader.load_route_names()
+            reader.load_stop_info(args.bulk)
+            check_network_loaded(reader, args)
+            return reader
+        def fetch_update(reader):
+            return reader.fetch_stop_snapshot(args.bulk)
+        def apply_update(reader, snapshot):
+            changes = reader.apply_refresh(snapshot)
+            print("Refreshed the network: %i changed routes, %i added stops, %i removed stops, "
+                "%i renamed stops." % (len(changes["changed_routes"]), len(changes["added_stops"]),
+                len(changes["removed_stops"]), len(changes["renamed_stops"])))
+        service = MBTAService(load_reader, args.refresh_interval, fetch_update, apply_update)
+        service.serve(args.host, args.port)
+        return
+
+    my_mbta_data_reader = MBTADataReader(client, args.route_types)
     my_mbta_data_reader.show_route_names()
-    my_mbta_data_reader.show_stop_info()
-
-    banned_stops = set()
-    
-    if (args.stop1 and args.stop2 and args.mode == "normal"):
-        # normal mode where no stop is closed
-        my_mbta_data_reader.trip_src_to_dest_stop(args.stop1, args.stop2, banned_stops)   
-    elif (args.stop1 and args.stop2 and args.mode == "covid19"):
-        # covid19 mode where some stops are closed
-        # any stop with a name that includes a word starting with 
-        # C, O, V, I, or D is closed.
-        banned_chars = ['C', 'O', 'V', 'I', 'D']
-        for stop_name in my_mbta_data_reader.stop_set:
-            stop_name_words = stop_name.split()
-            for word in stop_name_words:
-                if (word[0] in banned_chars):
-                    banned_stops.add(stop_name)
-        my_mbta_data_reader.trip_src_to_dest_stop(args.stop1, args.stop2, banned_stops)
+    my_mbta_data_reader.show_stop_info(args.bulk)
+    check_network_loaded(my_mbta_data_reader, args)
+    if args.build_table:
+        write_routing_table(my_mbta_data_reader.network, args.build_table)
+        print("Wrote the routing table to %s." % args.build_table)
+    if args.resilience:
+        show_resilience(my_mbta_data_reader.network, args.processes, args.resilience_output)
+
+    if (args.stop1 and args.stop2 and args.closures):
+        # the closed stops and routes are read from a json file
+        with open(args.closures, "r") as closure_file:
+            scenario = ClosureScenario.from_dict(json.load(closure_file))
+        my_mbta_data_reader.trip_src_to_dest_stop(args.stop1, args.stop2, scenario, args.legs)
+    elif (args.stop1 and args.stop2 and args.mode in SCENARIOS):
+        # in normal mode no stop is closed, in covid19 mode some stops are closed
+        my_mbta_data_reader.trip_src_to_dest_stop(args.stop1, args.stop2, SCENARIOS[args.mode], args.legs)
+
+def check_network_loaded(reader, args):
+    """Exits with an error if no stop was loaded, e.g. if the routes or the 
+    stops are not in the cache in offline mode.
+    """
+
+    if reader.stop_set:
+        return
+    if args.offline:
+        print("The network is not in the cache %s. Run the same command without --offline to fill it."
+            % args.cache)
+    else:
+        print("The network could not be retrieved from the MBTA API.")
+    sys.exit(1)
+
+def show_resilience(network, processes, file_name, num_shown=20):
+    """Runs the resilience sweep over every single-stop closure of the network.
+    Each result is written to the file as a json line as soon as it arrives,
+    then the most harmful closures are shown.
+    """
+
+    result_list = []
+    output_file = open(file_name, "w") if file_name else None
+    try:
+        with mbta_profile.profiler.timer("resilience"):
+            for result in iter_resilience(network, processes):
+                result_list.append(result)
+                if output_file:
+                    output_file.write(json.dumps(result.to_dict()) + "\n")
+                    output_file.flush()
+    finally:
+        if output_file:
+            output_file.close()
+
+    print("The stops whose closure affects the most trips:")
+    print("%-40s %14s %14s %16s" % ("stop", "disconnected", "rerouted", "extra transfers"))
+    for result in rank_results(result_list)[:num_shown]:
+        if not (result.disconnected_pairs or result.affected_pairs):
+            break
+        print("%-40s %14i %14i %16i" % (result.stop + (" *" if result.articulation else ""),
+            result.disconnected_pairs, result.affected_pairs, result.extra_transfers))
+    print("* the stop is an articulation point of the network.")
+
+def write_trips(reader, query_file_name, file_name, processes):
+    """Answers the trip queries of the query file and writes each block of 
+    results as JSON lines as soon as it is computed, to the file or to the 
+    standard output if no file name is given.
+    """
+
+    output_file = open(file_name, "w") if file_name else sys.stdout
+    try:
+        with mbta_profile.profiler.timer("phase", "batch_queries"):
+            for json_lines in iter_trip_results(reader, read_queries(query_file_name), processes, as_json=True):
+                output_file.write(json_lines)
+        output_file.flush()
+    finally:
+        if file_name:
+            output_file.close()
+
+def write_profile(file_name):
+    """Writes the profile to the given file in Prometheus text format if the 
+    name ends with .prom, otherwise as json.
+    """
+
+    with open(file_name, "w") as profile_file:
+        if file_name.endswith(".prom"):
+            profile_file.write(mbta_profile.profiler.to_prometheus())
+        else:
+            profile_file.write(mbta_profile.profiler.to_json())
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
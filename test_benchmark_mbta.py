@@ -0,0 +1,51 @@
+"""Tests for benchmark_mbta module.
+"""
+
+import unittest
+
+import benchmark_mbta
+import read_mbta_data as main_program
+
+class TestBenchmark(unittest.TestCase):
+    """Test class for the synthetic network generator and the regression check.
+    """
+
+    def test_generate_network(self):
+        """Generate the same network twice, check if it is the same and if the
+        reader can parse it.
+        """
+
+        routes_resp, stop_resp_list = benchmark_mbta.generate_network(10, 8, 0.3, seed=1)
+        self.assertEqual((routes_resp, stop_resp_list), benchmark_mbta.generate_network(10, 8, 0.3, seed=1))
+        reader = main_program.MBTADataReader()
+        self.assertEqual(len(reader.get_route_names(routes_resp)), 10)
+        num_unique_stops = reader.get_total_stops(stop_resp_list)
+        self.assertLess(num_unique_stops, 80)
+        self.assertEqual(len(reader.route_to_stops_dict), 10)
+        print("Testcase passed. Generated a deterministic synthetic network.")
+
+    def test_find_regressions(self):
+        """Check if only the phases slower than the threshold are reported.
+        """
+
+        baseline = {"parse": {"seconds": 1.0}, "route": {"seconds": 1.0}}
+        results = {"parse": {"seconds": 1.1}, "route": {"seconds": 1.5}, "closures": {"seconds": 9.0}}
+        self.assertEqual(benchmark_mbta.find_regressions(results, baseline, 0.25), [("route", "seconds", 1.5, 1.0)])
+        print("Testcase passed. Found the phase which regressed.")
+
+    def test_find_memory_regressions(self):
+        """Check if the peak memory is compared with its own threshold, and
+        only when the baseline has it.
+        """
+
+        baseline = {"parse": {"seconds": 1.0, "peak_memory": 1000},
+            "route": {"seconds": 1.0, "peak_memory": 1000}, "batch": {"seconds": 1.0}}
+        results = {"parse": {"seconds": 1.0, "peak_memory": 1050},
+            "route": {"seconds": 1.0, "peak_memory": 1200}, "batch": {"seconds": 1.0, "peak_memory": 9000}}
+        self.assertEqual(benchmark_mbta.find_regressions(results, baseline, 0.25), [])
+        self.assertEqual(benchmark_mbta.find_regressions(results, baseline, 0.25, 0.1),
+            [("route", "peak_memory", 1200, 1000)])
+        print("Testcase passed. Found the phase which used more memory.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""Tests for mbta_batch module.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import mbta_batch
+import read_mbta_data as main_program
+
+class TestMBTABatch(unittest.TestCase):
+    """Test class for the batch trip queries, with the stops of the three
+    routes in the test_data folder.
+    """
+
+    def setUp(self):
+        self.my_data_reader = main_program.MBTADataReader()
+        stop_data_list = []
+        for route in ("Red", "Mattapan", "Orange"):
+            with open("test_data/stop_data_%s.json" % route, "r") as stop_file:
+                stop_data_list.append(json.load(stop_file))
+        self.my_data_reader.get_total_stops(stop_data_list)
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write_file(self, file_name, text):
+        file_name = os.path.join(self.temp_dir.name, file_name)
+        with open(file_name, "w") as query_file:
+            query_file.write(text)
+        return file_name
+
+    def test_read_queries(self):
+        """Read the same queries from a CSV file and a JSONL file.
+        """
+
+        csv_file_name = self.write_file("queries.csv", "source,destination,closures\n"
+            "Alewife,Park Street,\nAlewife,Davis,covid19\nAlewife,Central,Harvard;Porter\n")
+        jsonl_file_name = self.write_file("queries.jsonl", '{"source": "Alewife", "destination": "Park Street"}\n'
+            '{"source": "Alewife", "destination": "Davis", "closures": "covid19"}\n\n'
+            '{"source": "Alewife", "destination": "Central", "closures": ["Porter", "Harvard"]}\n')
+        csv_queries = list(mbta_batch.read_queries(csv_file_name))
+        jsonl_queries = list(mbta_batch.read_queries(jsonl_file_name))
+        self.assertEqual(len(csv_queries), 3)
+        self.assertEqual([query[:2] for query in csv_queries], [query[:2] for query in jsonl_queries])
+        self.assertEqual([mbta_batch.get_closure_key(query[2]) for query in csv_queries],
+            [mbta_batch.get_closure_key(query[2]) for query in jsonl_queries])
+        self.assertEqual(mbta_batch.get_closure_key(csv_queries[2][2]), ("Harvard", "Porter"))
+        print("Testcase passed. Read the queries from CSV and JSONL files.")
+
+    def test_group_queries(self):
+        """Group queries and check if the queries with the same closure set and
+        source share a task, and if a query with an invalid stop name gets an
+        error with suggestions.
+        """
+
+        queries = [("Alewife", "Park Street", None), ("alewife", "Davis", ""), ("Alewife", "Central", "covid19"),
+            ("Central", "Alewife", None), ("Alwife", "Central", None), ("Alwife", "Davis", None),
+            ("Central", "Alwife", None)]
+        suggest_calls = []
+        suggest_stop_names = self.my_data_reader.suggest_stop_names
+        self.my_data_reader.suggest_stop_names = lambda text: suggest_calls.append(text) or suggest_stop_names(text)
+        error_results, tasks = mbta_batch.group_queries(self.my_data_reader, queries)
+        self.assertEqual(tasks, [("normal", "Alewife", [(0, "Park Street"), (1, "Davis")]),
+            ("covid19", "Alewife", [(2, "Central")]), ("normal", "Central", [(3, "Alewife")])])
+        self.assertEqual([result["row"] for result in error_results], [4, 5, 6])
+        self.assertEqual(error_results[0]["error"], "The source stop name is invalid.")
+        self.assertIn("Alewife", error_results[0]["suggestions"])
+        self.assertEqual(error_results[1]["suggestions"], error_results[0]["suggestions"])
+        self.assertEqual(error_results[2]["error"], "The destination stop name is invalid.")
+        # the suggestions of an invalid name are searched once
+        self.assertEqual(suggest_calls, ["Alwife"])
+        print("Testcase passed. Grouped the queries by closure set and source.")
+
+    def test_get_trips(self):
+        """Answer a batch of queries and check if each result matches get_trip(),
+        and if the JSON lines match the results.
+        """
+
+        stop_names = sorted(self.my_data_reader.network.stop_name_ids)
+        closure_sets = [None, "covid19", "Central", {"routes": ["Mattapan"]}]
+        queries = [(src_stop, dest_stop, closures) for src_stop in stop_names
+            for dest_stop in stop_names for closures in closure_sets]
+        results = {result["row"]: result for result in self.my_data_reader.get_trips(queries)}
+        self.assertEqual(len(results), len(queries))
+        for row, (src_stop, dest_stop, closures) in enumerate(queries):
+            scenario = mbta_batch.get_closure_scenario(mbta_batch.get_closure_key(closures))
+            trip = self.my_data_reader.get_trip(src_stop, dest_stop, scenario)
+            self.assertEqual(results[row]["routes"], trip["routes"], (src_stop, dest_stop, closures))
+            self.assertEqual(results[row]["suggestions"], trip["suggestions"])
+        json_lines = "".join(mbta_batch.iter_trip_results(self.my_data_reader, queries, as_json=True))
+        for line in json_lines.splitlines():
+            result = json.loads(line)
+            self.assertEqual(line, json.dumps(results[result["row"]]))
+        print("Testcase passed. The batch results match the single trip queries.")
+
+if __name__ == '__main__':
+    unittest.main()
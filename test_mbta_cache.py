@@ -0,0 +1,115 @@
+"""Tests for mbta_cache module. The cache is seeded from the json files in the
+test_data folder.
+"""
+
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import mbta_cache
+import mbta_client
+import read_mbta_data as main_program
+from test_mbta_client import StandInHandler, StandInServer
+
+class TestSnapshotCache(unittest.TestCase):
+    """Test class for SnapshotCache class and the cache support of MBTAClient.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = mbta_cache.SnapshotCache(os.path.join(self.temp_dir.name, "cache.sqlite"))
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def seed_cache(self):
+        with open("test_data/routes_data.json", "r") as route_file:
+            self.cache.store(self.cache.make_key("/routes", {"filter[type]": "0,1"}), json.load(route_file))
+        for route in ["Red", "Mattapan", "Orange"]:
+            params = dict(main_program.ROUTE_PATTERN_PARAMS, **{"filter[route]": route})
+            body = StandInHandler.get_route_patterns_body({key: [str(value)] for key, value in params.items()})
+            self.cache.store(self.cache.make_key("/route_patterns", params), json.loads(body))
+
+    def test_offline(self):
+        """Seed the cache with the test data and run show_route_names() and
+        show_stop_info() in offline mode. The client has no server to talk to,
+        so all the data must come from the cache. The routes which are not in
+        the cache are reported with status code 504.
+        """
+
+        self.seed_cache()
+        client = mbta_client.MBTAClient("http://127.0.0.1:9", cache=self.cache, offline=True)
+        reader = main_program.MBTADataReader(client)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            reader.show_route_names()
+            reader.show_stop_info()
+        self.assertIn("Total number of unique stops is: 10", output.getvalue())
+        self.assertIn("The response status code is: 504", output.getvalue())
+        print("Testcase passed. Got route and stop data from the cache in offline mode.")
+
+    def test_offline_miss(self):
+        """Seed the cache with one request for each route, then run the program 
+        in offline mode with --bulk, whose request is not in the cache, and 
+        with an empty cache. Check if it exits with a "not in the cache" error 
+        instead of crashing on the empty network.
+        """
+
+        self.seed_cache()
+        empty_file_name = os.path.join(self.temp_dir.name, "empty.sqlite")
+        for cache_args in (["--cache", self.cache.path, "--bulk"], ["--cache", empty_file_name]):
+            output = io.StringIO()
+            with mock.patch.object(sys, "argv", ["read_mbta_data.py", "--offline"] + cache_args):
+                with contextlib.redirect_stdout(output), self.assertRaises(SystemExit) as context:
+                    main_program.main()
+            self.assertEqual(context.exception.code, 1)
+            self.assertIn("The network is not in the cache", output.getvalue())
+        empty_reader = main_program.MBTADataReader(mbta_client.MBTAClient("http://127.0.0.1:9",
+            cache=self.cache, offline=True))
+        empty_reader.build_transfer_graph()
+        self.assertEqual(empty_reader.get_route_max_min_stops(), (None, None))
+        print("Testcase passed. An offline cache miss exits with an error.")
+
+    def test_revalidate(self):
+        """Get the routes from the stand-in server twice with a cache whose
+        snapshots are always stale, and check if the second request is sent
+        with the ETag of the first response and answered with 304.
+        """
+
+        self.cache.ttl = 0
+        with StandInServer() as httpd:
+            url = "http://127.0.0.1:%i" % httpd.server_address[1]
+            client = mbta_client.MBTAClient(url, rate_limit=0, cache=self.cache)
+            status_code, first_data = client.get_json("/routes")
+            status_code, second_data = client.get_json("/routes")
+            client.close()
+        self.assertEqual(status_code, 200)
+        self.assertEqual(first_data, second_data)
+        self.assertNotIn("If-None-Match", httpd.request_log[0][2])
+        self.assertEqual(httpd.request_log[1][2]["If-None-Match"],
+            self.cache.load("/routes").etag)
+        print("Testcase passed. Stale snapshot was revalidated with its ETag.")
+
+    def test_fresh(self):
+        """A fresh snapshot is returned without sending any request.
+        """
+
+        self.seed_cache()
+        with StandInServer() as httpd:
+            url = "http://127.0.0.1:%i" % httpd.server_address[1]
+            client = mbta_client.MBTAClient(url, rate_limit=0, cache=self.cache)
+            status_code, data = client.get_json("/routes", {"filter[type]": "0,1"})
+            client.close()
+        self.assertEqual(status_code, 200)
+        self.assertEqual(data["data"][0]["id"], "Red")
+        self.assertEqual(httpd.request_log, [])
+        print("Testcase passed. Fresh snapshot was used without a request.")
+
+if __name__ == '__main__':
+    unittest.main()
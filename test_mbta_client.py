@@ -0,0 +1,367 @@
+"""Tests for mbta_client module. The requests are sent to a local stand-in
+server which serves the json files in the test_data folder.
+"""
+
+import contextlib
+import gzip
+import io
+import json
+import threading
+import time
+import unittest
+import zlib
+from unittest import mock
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import mbta_client
+import read_mbta_data as main_program
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Serves GET /routes with the route data and GET /stops?filter[route]=X
+    with the stop data of route X from the test_data folder. If the stops of
+    several routes, sparse fields, or a page size are requested, the response
+    is built from the stop data of each route like the MBTA API does, with
+    each stop listed once. GET /route_patterns?filter[route]=X,Y serves two
+    patterns for each route, one in the order of its stop data and one in
+    reverse order, with their trips and stops included. If fail_later_pages
+    is set, every page after the first one fails.
+    """
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.server.request_log.append((url.path, query, dict(self.headers)))
+        if self.server.fail_count > 0 or (self.server.fail_later_pages and "page[offset]" in query):
+            self.server.fail_count = max(0, self.server.fail_count - 1)
+            self.send_response(503)
+            self.end_headers()
+            return
+        if url.path == "/stops" and (set(query) - {"filter[route]", "include"}
+                or "," in query["filter[route]"][0]):
+            body = self.get_stops_body(query)
+        elif url.path == "/route_patterns":
+            body = self.get_route_patterns_body(query)
+        elif url.path == "/routes":
+            body = self.read_file("test_data/routes_data.json")
+        elif url.path == "/stops":
+            body = self.read_file("test_data/stop_data_%s.json" % query["filter[route]"][0])
+        else:
+            body = None
+        if body is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        etag = '"%x"' % zlib.crc32(body)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Type", "application/vnd.api+json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    @staticmethod
+    def read_file(file_name):
+        try:
+            with open(file_name, "rb") as data_file:
+                return data_file.read()
+        except OSError:
+            return None
+
+    @classmethod
+    def read_stop_info_list(cls, route):
+        body = cls.read_file("test_data/stop_data_%s.json" % route)
+        return json.loads(body)["data"] if body is not None else []
+
+    @classmethod
+    def get_stops_body(cls, query):
+        stop_list = []
+        stop_ids = set()
+        for route in query["filter[route]"][0].split(","):
+            for stop_info in cls.read_stop_info_list(route):
+                # a stop on several routes is listed once, with one of its routes
+                if stop_info["id"] not in stop_ids:
+                    stop_ids.add(stop_info["id"])
+                    stop_info["relationships"]["route"]["data"]["id"] = route
+                    stop_list.append(stop_info)
+        return cls.get_page_body("/stops", query, stop_list, None)
+
+    @classmethod
+    def get_route_patterns_body(cls, query):
+        pattern_list = []
+        trips = {}
+        stops = {}
+        for route in query["filter[route]"][0].split(","):
+            stop_info_list = cls.read_stop_info_list(route)
+            for direction_id, direction_stops in ((0, stop_info_list), (1, stop_info_list[::-1])):
+                trip_id = "%s-%i" % (route, direction_id)
+                pattern_list.append({"type": "route_pattern", "id": trip_id,
+                    "attributes": {"direction_id": direction_id, "name": trip_id, "typicality": 1},
+                    "relationships": {"route": {"data": {"type": "route", "id": route}},
+                        "representative_trip": {"data": {"type": "trip", "id": trip_id}}}})
+                trips[trip_id] = {"type": "trip", "id": trip_id, "attributes": {"headsign": trip_id},
+                    "relationships": {"stops": {"data": [{"type": "stop", "id": stop_info["id"]}
+                        for stop_info in direction_stops]}}}
+                for stop_info in direction_stops:
+                    stops[stop_info["id"]] = stop_info
+        def get_included(pattern_page):
+            # a page includes the trips and stops of its own patterns, each once
+            included = {}
+            for pattern_info in pattern_page:
+                trip_info = trips[pattern_info["relationships"]["representative_trip"]["data"]["id"]]
+                included[("trip", trip_info["id"])] = trip_info
+                for stop_data in trip_info["relationships"]["stops"]["data"]:
+                    included[("stop", stop_data["id"])] = stops[stop_data["id"]]
+            return list(included.values())
+        return cls.get_page_body("/route_patterns", query, pattern_list, get_included)
+
+    @classmethod
+    def get_page_body(cls, path, query, resource_list, get_included):
+        for resource in resource_list:
+            fields_key = "fields[%s]" % resource["type"]
+            if fields_key in query:
+                cls.apply_fields(resource, query[fields_key][0].split(","))
+        page = {"data": resource_list}
+        if "page[limit]" in query:
+            limit = int(query["page[limit]"][0])
+            offset = int(query.get("page[offset]", ["0"])[0])
+            page["data"] = resource_list[offset:offset + limit]
+            if offset + limit < len(resource_list):
+                next_query = dict((key, value[0]) for key, value in query.items())
+                next_query["page[offset]"] = str(offset + limit)
+                page["links"] = {"next": path + "?" + urlencode(next_query)}
+        if get_included:
+            page["included"] = get_included(page["data"])
+            for resource in page["included"]:
+                fields_key = "fields[%s]" % resource["type"]
+                if fields_key in query:
+                    cls.apply_fields(resource, query[fields_key][0].split(","))
+        return json.dumps(page).encode()
+
+    @staticmethod
+    def apply_fields(resource, fields):
+        resource["attributes"] = {key: value for key, value in resource.get("attributes", {}).items() if key in fields}
+        resource["relationships"] = {key: value for key, value in resource.get("relationships", {}).items()
+            if key in fields}
+
+    def log_message(self, format, *args):
+        pass
+
+class GzipHandler(BaseHTTPRequestHandler):
+    """Serves GET /routes with the route data compressed with gzip.
+    """
+
+    def do_GET(self):
+        body = gzip.compress(StandInHandler.read_file("test_data/routes_data.json"))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.api+json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StandInServer:
+    """Runs the stand-in server in a background thread.
+    """
+
+    def __init__(self, handler_class=StandInHandler):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.httpd.request_log = []
+        self.httpd.fail_count = 0
+        self.httpd.fail_later_pages = False
+        self.url = "http://127.0.0.1:%i" % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self.httpd
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class TestMBTAClient(unittest.TestCase):
+    """Test class for MBTAClient class.
+    """
+
+    def setUp(self):
+        self.server = StandInServer()
+        self.httpd = self.server.__enter__()
+        self.client = mbta_client.MBTAClient(self.server.url, api_key="test-key",
+            retries=2, backoff_factor=0, rate_limit=0)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.__exit__(None, None, None)
+
+    def test_get_many(self):
+        """Request the stops for three routes concurrently and check if the
+        responses are returned in the order of the requests with the API key.
+        """
+
+        route_list = ["Red", "Mattapan", "Orange", "Blue"]
+        resp_list = self.client.get_many("/stops", [{"filter[route]": route} for route in route_list])
+        status_list = [status_code for status_code, resp in resp_list]
+        self.assertEqual(status_list, [200, 200, 200, 404])
+        self.assertEqual(resp_list[2][1]["included"][0]["id"], "Orange")
+        for path, query, headers in self.httpd.request_log:
+            self.assertEqual(headers["x-api-key"], "test-key")
+        print("Testcase passed. Got the stops of three routes concurrently.")
+
+    def test_retry(self):
+        """The stand-in server fails the first request, check if the client
+        retries the request.
+        """
+
+        self.httpd.fail_count = 1
+        resp = self.client.get("/routes")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(self.httpd.request_log), 2)
+        print("Testcase passed. Failed request was retried.")
+
+    def test_show_stop_info(self):
+        """Run show_route_names() and show_stop_info() against the stand-in
+        server and check the printed total number of unique stops.
+        """
+
+        reader = main_program.MBTADataReader(self.client)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            reader.show_route_names()
+            reader.show_stop_info()
+        self.assertIn("Total number of unique stops is: 10", output.getvalue())
+        self.assertEqual(len(self.httpd.request_log), 9)
+        self.assertEqual({path for path, query, headers in self.httpd.request_log[1:]}, {"/route_patterns"})
+        # one sequence for each direction, in the order of its pattern
+        orange_keys = ["place-pktrm", "place-dwnxg", "place-sstat"]
+        self.assertEqual(reader.route_to_sequence_dict["Orange"], [(0, orange_keys), (1, orange_keys[::-1])])
+        print("Testcase passed. Got route and stop data from the stand-in server.")
+
+    def test_get_pages(self):
+        """Request the stops of three routes four stops at a time and check if
+        all the pages are returned, with each of the 10 stops once.
+        """
+
+        status_code, page_list = self.client.get_pages("/stops",
+            {"filter[route]": "Red,Mattapan,Orange", "page[limit]": "4"})
+        self.assertEqual(status_code, 200)
+        self.assertEqual([len(page["data"]) for page in page_list], [4, 4, 2])
+        print("Testcase passed. Followed the paging links.")
+
+    def test_show_stop_info_bulk(self):
+        """Run show_stop_info() in bulk mode against the stand-in server and
+        check if one route pattern request with sparse fields gives the same
+        stop data as one stop request for each route. Central and Park Street
+        are included once, but they must stay on both of their routes.
+        """
+
+        reader = main_program.MBTADataReader(self.client)
+        reader.routeId_list = ["Red", "Mattapan", "Orange"]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            reader.show_stop_info(bulk=True)
+        self.assertIn("Total number of unique stops is: 10", output.getvalue())
+        self.assertIn("The route with most stops is: Red", output.getvalue())
+        self.assertEqual(reader.route_to_stops_dict["Orange"], {"place-pktrm", "place-dwnxg", "place-sstat"})
+        self.assertEqual(reader.get_stop_name("place-dwnxg"), "Downtown Crossing")
+        self.assertEqual(len(self.httpd.request_log), 1)
+        path, query, headers = self.httpd.request_log[0]
+        self.assertEqual(path, "/route_patterns")
+        self.assertEqual(query["fields[stop]"], ["name,wheelchair_boarding,parent_station"])
+        self.assertEqual(query["include"], ["representative_trip.stops"])
+
+        route_reader = main_program.MBTADataReader(self.client)
+        route_reader.routeId_list = ["Red", "Mattapan", "Orange"]
+        with contextlib.redirect_stdout(io.StringIO()):
+            route_reader.show_stop_info()
+        self.assertEqual(reader.route_to_stops_dict, route_reader.route_to_stops_dict)
+        self.assertIn("place-pktrm", reader.route_to_stops_dict["Mattapan"])
+        self.assertIn("place-cntsq", reader.route_to_stops_dict["Red"])
+        self.assertEqual(reader.find_src_to_dest("Alewife", "Downtown Crossing", set()), ["Red", "Mattapan", "Orange"])
+        print("Testcase passed. Got the stops of all the routes with one request.")
+
+    def test_route_patterns_include_stops_once(self):
+        """Request the route patterns of two routes with a shared stop, two 
+        patterns at a time, and check if each page includes Park Street once 
+        and if its stops are on both routes.
+        """
+
+        status_code, page_list = self.client.get_pages("/route_patterns", {"filter[route]": "Mattapan,Orange",
+            "include": "representative_trip.stops", "page[limit]": "2"})
+        self.assertEqual(status_code, 200)
+        self.assertEqual(len(page_list), 2)
+        for page in page_list:
+            stop_ids = [resource["id"] for resource in page["included"] if resource["type"] == "stop"]
+            self.assertEqual(stop_ids.count("place-pktrm"), 1)
+        resp_list = [resp for page in page_list for resp in main_program.get_route_pattern_responses(page)]
+        self.assertEqual([(resp["included"][0]["id"], resp["direction_id"]) for resp in resp_list],
+            [("Mattapan", 0), ("Mattapan", 1), ("Orange", 0), ("Orange", 1)])
+        for resp in resp_list:
+            self.assertIn("place-pktrm", [stop_info["id"] for stop_info in resp["data"]])
+        print("Testcase passed. A shared stop is included once and kept on both routes.")
+
+    def test_refresh_with_failed_page(self):
+        """Load the stops one route pattern per page, then refresh them while
+        every page after the first one fails. Check if the stops and the stop
+        sequences of the routes are kept, in bulk mode and with one request
+        for each route.
+        """
+
+        reader = main_program.MBTADataReader(self.client)
+        with mock.patch.dict(main_program.ROUTE_PATTERN_PARAMS, {"page[limit]": 1}):
+            with contextlib.redirect_stdout(io.StringIO()):
+                reader.load_route_names()
+                reader.load_stop_info()
+            route_to_stops_dict = dict(reader.route_to_stops_dict)
+            route_to_sequence_dict = dict(reader.route_to_sequence_dict)
+            self.assertEqual(len(route_to_sequence_dict["Red"]), 2)
+            self.httpd.fail_later_pages = True
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertIsNone(reader.refresh_stop_info(bulk=True))
+                changes = reader.refresh_stop_info()
+        self.assertEqual(changes["changed_routes"], [])
+        self.assertEqual(dict(reader.route_to_stops_dict), route_to_stops_dict)
+        self.assertEqual(reader.route_to_sequence_dict, route_to_sequence_dict)
+        self.assertEqual(reader.get_trip("Central", "Alewife", main_program.SCENARIOS["normal"],
+            legs=True)["routes"], ["Red"])
+        print("Testcase passed. A refresh with a failed page kept the stops of the routes.")
+
+    def test_transferred_bytes(self):
+        """Get a gzip compressed response and check if the transferred bytes 
+        are the compressed size of the body, not the decoded size.
+        """
+
+        with StandInServer(GzipHandler) as httpd:
+            client = mbta_client.MBTAClient("http://127.0.0.1:%i" % httpd.server_address[1], rate_limit=0)
+            resp = client.get("/routes")
+            client.close()
+        self.assertEqual(mbta_client.get_transferred_bytes(resp),
+            len(gzip.compress(StandInHandler.read_file("test_data/routes_data.json"))))
+        self.assertLess(mbta_client.get_transferred_bytes(resp), len(resp.content))
+        print("Testcase passed. Counted the compressed size of the response.")
+
+class TestTokenBucket(unittest.TestCase):
+    """Test class for TokenBucket class.
+    """
+
+    def test_rate(self):
+        """Take more tokens than the bucket capacity and check if the bucket
+        waits for new tokens.
+        """
+
+        bucket = mbta_client.TokenBucket(rate=50, capacity=5)
+        start_time = time.monotonic()
+        for i in range(10):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.09)
+        print("Testcase passed. Token bucket limited the request rate.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Tests for mbta_closures module.
+"""
+
+import unittest
+
+import mbta_closures
+import mbta_network
+import read_mbta_data
+
+class TestClosureScenario(unittest.TestCase):
+    """Test class for ClosureScenario class. The network has three routes.
+    Red -> {Alewife - Davis - Central}
+    Mattapan -> {Central - Kendall/MIT - Park Street}
+    Orange -> {Park Street - Downtown Crossing}
+    """
+
+    def setUp(self):
+        self.network = mbta_network.MBTANetwork({
+            "Red": {"Alewife", "Davis", "Central"},
+            "Mattapan": {"Central", "Kendall/MIT", "Park Street"},
+            "Orange": {"Park Street", "Downtown Crossing"}})
+
+    def test_covid19(self):
+        """Check if the covid19 scenario closes the stops with a word starting
+        with C, O, V, I, or D.
+        """
+
+        closed_stops = mbta_closures.SCENARIOS["covid19"].closed_stop_names(self.network.stop_index)
+        self.assertEqual(closed_stops, {"Davis", "Central", "Downtown Crossing"})
+        print("Testcase passed. covid19 scenario closed the expected stops.")
+
+    def test_rules(self):
+        """Check the explicit stop, predicate, pattern, and route rules.
+        """
+
+        scenario = mbta_closures.ClosureScenario("test", stops=["Alewife"],
+            name_predicates=[lambda stop_name: "/" in stop_name],
+            name_patterns=[r"^Park"], routes=["Orange"])
+        closures = scenario.compile(self.network)
+        self.assertEqual(closures.stop_mask, self.network.stop_mask(["Alewife", "Kendall/MIT", "Park Street"]))
+        self.assertEqual(closures.route_mask, 1 << self.network.route_index["Orange"])
+        self.assertIsNone(self.network.find_routes("Davis", "Downtown Crossing", 0, closures.route_mask))
+        self.assertEqual(self.network.find_routes("Davis", "Central", closures.stop_mask, closures.route_mask), ["Red"])
+        print("Testcase passed. Scenario rules compiled into stop and route bitsets.")
+
+    def test_equal_scenarios(self):
+        """Build the same scenario twice and check if they are equal and are
+        compiled only once by the reader.
+        """
+
+        scenario_data = {"name": "test", "stops": ["Alewife"], "name_patterns": [r"^Park"], "routes": ["Orange"]}
+        scenario = mbta_closures.ClosureScenario.from_dict(scenario_data)
+        same_scenario = mbta_closures.ClosureScenario.from_dict(dict(scenario_data, name="other"))
+        self.assertEqual(scenario, same_scenario)
+        self.assertEqual(hash(scenario), hash(same_scenario))
+        self.assertNotEqual(scenario, mbta_closures.ClosureScenario("test", stops=["Alewife"]))
+
+        reader = read_mbta_data.MBTADataReader()
+        reader.apply_stop_snapshot({route_id: set(stop_keys) for route_id, stop_keys
+            in self.network.get_route_to_stops_dict().items()}, {})
+        for stop_name in ["Davis", "Central"]:
+            reader.get_closures(mbta_closures.ClosureScenario.from_dict({"stops": [stop_name]}))
+            reader.get_closures(mbta_closures.ClosureScenario.from_dict({"stops": [stop_name]}))
+        self.assertEqual(len(reader.compiled_closures), 2)
+        print("Testcase passed. Equal scenarios were compiled once.")
+
+    def test_graph_cache(self):
+        """Run the same query twice under the same closures and check if the
+        transfer graph is built only once.
+        """
+
+        closed_mask = self.network.stop_mask(["Park Street", "Alewife"])
+        self.assertIsNone(self.network.find_routes("Davis", "Downtown Crossing", closed_mask))
+        self.assertIsNone(self.network.find_routes("Davis", "Downtown Crossing", closed_mask))
+        # Alewife is not a transfer stop, so it does not change the graph
+        self.network.find_routes("Davis", "Kendall/MIT", self.network.stop_mask(["Park Street"]))
+        cache_info = self.network.cached_transfer_graph.cache_info()
+        self.assertEqual(cache_info.misses, 1)
+        self.assertEqual(cache_info.hits, 2)
+        print("Testcase passed. Transfer graph was built once for the closure set.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+"""Tests for mbta_journeys module.
+"""
+
+import contextlib
+import io
+import json
+import unittest
+
+import mbta_journeys
+import mbta_network
+import read_mbta_data as main_program
+
+class TestJourneyPlanner(unittest.TestCase):
+    """Test class for JourneyPlanner class. The network has three routes.
+    X -> S - X1 - X2 - X3 - X4 - X5 - X6 - T
+    Y -> X1 - N
+    Z -> N - T
+    Riding X from S to T travels 7 stops, and riding X, Y and Z travels 3.
+    """
+
+    def setUp(self):
+        route_to_sequence_dict = {
+            "X": ["S", "X1", "X2", "X3", "X4", "X5", "X6", "T"],
+            "Y": ["X1", "N"],
+            "Z": ["N", "T"],
+        }
+        self.network = mbta_network.MBTANetwork({route_id: set(sequence)
+            for route_id, sequence in route_to_sequence_dict.items()})
+        # each route is one pattern which is ridden both ways
+        self.planner = mbta_journeys.JourneyPlanner(self.network, {route_id: [(None, sequence)]
+            for route_id, sequence in route_to_sequence_dict.items()})
+
+    def test_fewest_transfers(self):
+        """Check if the journey with the fewest transfers is found in both
+        directions, with the boarding and alighting stops of each leg.
+        """
+
+        journey = self.planner.find_journey("S", "T")
+        self.assertEqual(journey.route_ids(), ["X"])
+        self.assertEqual((journey.legs[0].board_stop.key, journey.legs[0].alight_stop.key), ("S", "T"))
+        self.assertEqual((journey.num_transfers, journey.num_stops), (0, 7))
+        journey = self.planner.find_journey("N", "X2")
+        self.assertEqual(journey.to_dict()["legs"], [
+            {"route": "Y", "direction": 1, "board": "N", "board_key": "N", "alight": "X1", "alight_key": "X1", "num_stops": 1},
+            {"route": "X", "direction": 0, "board": "X1", "board_key": "X1", "alight": "X2", "alight_key": "X2", "num_stops": 1}])
+        print("Testcase passed. Found the journey with the fewest transfers.")
+
+    def test_pareto_journeys(self):
+        """Check if the journey with more transfers and fewer stops is also
+        returned, and if it is not found when its transfer stop is closed.
+        """
+
+        journeys = self.planner.find_journeys("S", "T")
+        self.assertEqual([journey.route_ids() for journey in journeys], [["X"], ["X", "Y", "Z"]])
+        self.assertEqual([journey.num_stops for journey in journeys], [7, 3])
+        closed_mask = self.network.stop_mask(["N"])
+        journeys = self.planner.find_journeys("S", "T", closed_mask)
+        self.assertEqual([journey.route_ids() for journey in journeys], [["X"]])
+        print("Testcase passed. Found the Pareto-optimal journeys.")
+
+    def test_closures(self):
+        """Close stops and routes, and check if closed stops are passed but not
+        used for transfers, and if no journey is found without an open route.
+        """
+
+        closed_mask = self.network.stop_mask(["X1"])
+        journey = self.planner.find_journey("S", "X2", closed_mask)
+        self.assertEqual((journey.route_ids(), journey.num_stops), (["X"], 2))
+        self.assertEqual(self.planner.find_journey("S", "N", closed_mask).route_ids(), ["X", "Z"])
+        closed_route_mask = 1 << self.network.route_index["X"]
+        self.assertIsNone(self.planner.find_journey("S", "T", 0, closed_route_mask))
+        self.assertEqual(self.planner.find_journey("X1", "T", 0, closed_route_mask).route_ids(), ["Y", "Z"])
+        with self.assertRaises(KeyError):
+            self.planner.find_journey("S", "Q")
+        print("Testcase passed. Closed stops and routes are not used.")
+
+    def test_same_stop(self):
+        """Check if a trip which starts and ends at the same stop stays on the 
+        route find_routes() returns, and if there is none when it is closed.
+        """
+
+        journey = self.planner.find_journey("X1", "X1")
+        self.assertEqual(journey.route_ids(), self.network.find_routes("X1", "X1"))
+        self.assertEqual((journey.num_transfers, journey.num_stops), (0, 0))
+        closed_route_mask = (1 << self.network.route_index["X"]) | (1 << self.network.route_index["Y"])
+        self.assertIsNone(self.planner.find_journey("X1", "X1", 0, closed_route_mask))
+        self.assertIsNone(self.network.find_routes("X1", "X1", 0, closed_route_mask))
+        print("Testcase passed. A trip to the same stop stays on one route.")
+
+class TestBranchedJourneys(unittest.TestCase):
+    """Test class for JourneyPlanner class with a branched route. Red splits
+    after JFK/UMass into an Ashmont branch and a Braintree branch, and each
+    branch has a pattern in each direction.
+    """
+
+    def setUp(self):
+        trunk = ["Alewife", "Park Street", "JFK/UMass"]
+        ashmont = trunk + ["Savin Hill", "Ashmont"]
+        braintree = trunk + ["North Quincy", "Braintree"]
+        self.network = mbta_network.MBTANetwork({"Red": set(ashmont) | set(braintree)})
+        self.planner = mbta_journeys.JourneyPlanner(self.network, {"Red": [(0, ashmont), (0, braintree),
+            (1, ashmont[::-1]), (1, braintree[::-1])]})
+
+    def test_branches(self):
+        """Travel from one branch to the other and check if the journey rides 
+        back to the junction instead of jumping between the branches.
+        """
+
+        journey = self.planner.find_journey("Ashmont", "North Quincy")
+        self.assertEqual([(leg.route_id, leg.direction, leg.board_stop.key, leg.alight_stop.key, leg.num_stops)
+            for leg in journey.legs], [("Red", 1, "Ashmont", "JFK/UMass", 2),
+            ("Red", 0, "JFK/UMass", "North Quincy", 1)])
+        journey = self.planner.find_journey("Braintree", "Alewife")
+        self.assertEqual([(leg.direction, leg.num_stops) for leg in journey.legs], [(1, 4)])
+        print("Testcase passed. The branches of a route are separate patterns.")
+
+class TestReaderJourneys(unittest.TestCase):
+    """Test class for the journey methods of MBTADataReader class, with the
+    stops of the three routes in the test_data folder.
+    """
+
+    def setUp(self):
+        self.my_data_reader = main_program.MBTADataReader()
+        stop_data_list = []
+        for route in ("Red", "Mattapan", "Orange"):
+            with open("test_data/stop_data_%s.json" % route, "r") as stop_file:
+                stop_data_list.append(json.load(stop_file))
+        self.my_data_reader.get_total_stops(stop_data_list)
+
+    def test_find_journey(self):
+        """Find the journey from Alewife to Downtown Crossing and check if the
+        stop sequences of the responses are used, and if the legs are shown.
+        """
+
+        self.assertEqual(self.my_data_reader.route_to_sequence_dict["Mattapan"],
+            [(None, ["place-cntsq", "place-knncl", "place-chmnl", "place-pktrm"])])
+        journey = self.my_data_reader.find_journey("Alewife", "Downtown Crossing", set())
+        self.assertEqual([(leg.route_id, leg.board_stop.name, leg.alight_stop.name, leg.num_stops)
+            for leg in journey.legs], [("Red", "Alewife", "Central", 4),
+            ("Mattapan", "Central", "Park Street", 3), ("Orange", "Park Street", "Downtown Crossing", 1)])
+        self.assertEqual(journey.route_ids(), self.my_data_reader.find_src_to_dest("Alewife", "Downtown Crossing", set()))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.my_data_reader.trip_src_to_dest_stop("Alewife", "Downtown Crossing", set(), legs=True)
+        self.assertIn("2. Take Mattapan from Central to Park Street (3 stops).", output.getvalue())
+        self.assertIn("The trip needs 2 transfers and travels 8 stops.", output.getvalue())
+        self.assertIsNone(self.my_data_reader.find_journey("Alewife", "Downtown Crossing",
+            main_program.SCENARIOS["covid19"]))
+        normal = main_program.SCENARIOS["normal"]
+        self.assertEqual(self.my_data_reader.get_trip("Alewife", "Alewife", normal, legs=True)["routes"],
+            self.my_data_reader.get_trip("Alewife", "Alewife", normal)["routes"])
+        print("Testcase passed. Found the journey with its legs.")
+
+    def test_planner_is_rebuilt(self):
+        """Add a stop to the end of Orange with a snapshot and check if the
+        journey planner sees it.
+        """
+
+        planner = self.my_data_reader.get_journey_planner()
+        direction, sequence = self.my_data_reader.route_to_sequence_dict["Orange"][0]
+        sequence = sequence + ["place-chncl"]
+        self.my_data_reader.apply_stop_snapshot({"Orange": set(sequence)}, {}, (), {"Orange": [(None, sequence)]},
+            {"place-chncl": "Chinatown"})
+        self.assertIsNot(self.my_data_reader.get_journey_planner(), planner)
+        journey = self.my_data_reader.find_journey("Park Street", "Chinatown", set())
+        self.assertEqual((journey.route_ids(), journey.num_stops), (["Orange"], 3))
+        print("Testcase passed. The journey planner is rebuilt after a change.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Tests for mbta_names module.
+"""
+
+import json
+import unittest
+
+import mbta_names
+import read_mbta_data as main_program
+
+STOP_NAMES = {"Alewife", "Davis", "Porter", "Harvard", "Central", "Kendall/MIT",
+    "Park Street", "Downtown Crossing", "Mattapan", "Ashmont", "Forest Hills"}
+
+def get_edit_distance(text1, text2):
+    previous_row = list(range(len(text2) + 1))
+    for position1, char1 in enumerate(text1, 1):
+        current_row = [position1]
+        for position2, char2 in enumerate(text2, 1):
+            current_row.append(min(previous_row[position2] + 1, current_row[position2 - 1] + 1,
+                previous_row[position2 - 1] + (char1 != char2)))
+        previous_row = current_row
+    return previous_row[-1]
+
+class TestStopNameIndex(unittest.TestCase):
+    """Test class for StopNameIndex class.
+    """
+
+    def setUp(self):
+        self.name_index = mbta_names.StopNameIndex(STOP_NAMES)
+
+    def test_resolve(self):
+        """Resolve names which differ in case and punctuation, and aliases.
+        """
+
+        self.assertEqual(mbta_names.normalize_name("  Kendall/MIT "), "kendall mit")
+        self.assertEqual(self.name_index.resolve("kendall mit"), "Kendall/MIT")
+        self.assertEqual(self.name_index.resolve("PARK-STREET"), "Park Street")
+        self.assertEqual(self.name_index.resolve("Kendall"), "Kendall/MIT")
+        self.assertEqual(self.name_index.resolve("DTX"), "Downtown Crossing")
+        self.assertIsNone(self.name_index.resolve("Park"))
+        # the alias of a stop which is not in the network is not added
+        self.assertIsNone(self.name_index.resolve("JFK"))
+        print("Testcase passed. Resolved folded names and aliases.")
+
+    def test_complete(self):
+        """Complete prefixes of the first word and of later words.
+        """
+
+        self.assertEqual(self.name_index.complete("Ha"), ["Harvard"])
+        self.assertEqual(self.name_index.complete("street"), ["Park Street"])
+        # the names starting with the prefix come before the other matches
+        self.assertEqual(self.name_index.complete("c"), ["Central", "Downtown Crossing"])
+        self.assertEqual(self.name_index.complete("x"), [])
+        print("Testcase passed. Completed stop name prefixes.")
+
+    def test_fuzzy(self):
+        """Compare fuzzy matches with the edit distance to every name.
+        """
+
+        self.assertEqual(self.name_index.fuzzy("Harverd"), [("Harvard", 1)])
+        self.assertEqual(self.name_index.suggest("Alwife"), ["Alewife"])
+        keys = list(self.name_index.names)
+        for text in ["porte", "dvis", "forrest hils", "park stret", "ashmount"]:
+            for max_distance in (1, 2, 3):
+                expected = sorted((get_edit_distance(text, key), key) for key in keys
+                    if get_edit_distance(text, key) <= max_distance)
+                self.assertEqual(sorted(self.name_index.key_trie.search(text, max_distance)), expected)
+        print("Testcase passed. Found the same fuzzy matches as comparing every name.")
+
+    def test_reader_suggestions(self):
+        """Query trips with stop names which need to be resolved.
+        """
+
+        reader = main_program.MBTADataReader()
+        stop_data_list = []
+        for route in ["Red", "Mattapan", "Orange"]:
+            with open("test_data/stop_data_%s.json" % route, "r") as stop_file:
+                stop_data_list.append(json.load(stop_file))
+        reader.get_total_stops(stop_data_list)
+        self.assertEqual(reader.find_src_to_dest("alewife", "downtown crossing", set()),
+            ["Red", "Mattapan", "Orange"])
+        trip = reader.get_trip("Alewif", "Central", set())
+        self.assertEqual(trip["error"], "The source stop name is invalid.")
+        self.assertEqual(trip["suggestions"], ["Alewife"])
+        print("Testcase passed. Resolved the stop names of trip queries.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""Tests for mbta_network module.
+"""
+
+import random
+import unittest
+
+import mbta_closures
+import mbta_network
+
+def get_network_data(network):
+    """Returns the routes of each stop, the stops of each route, the linked
+    routes of each route and the accessible stops by name, so networks with
+    different ids compare.
+    """
+
+    stop_routes = {stop.name: {network.routes[route_index].route_id
+        for route_index in mbta_network.iter_bits(stop.route_mask)} for stop in network.stops}
+    route_stops = {route.route_id: {network.stops[stop_id].name
+        for stop_id in mbta_network.iter_bits(route.stop_mask)} for route in network.routes}
+    route_links = {network.routes[route_index].route_id: {network.routes[related_route].route_id
+        for related_route in mbta_network.iter_bits(route_mask)}
+        for route_index, route_mask in enumerate(network.route_to_routes)}
+    transfer_stops = {network.stops[stop_id].name for stop_id in mbta_network.iter_bits(network.transfer_mask)}
+    accessible_stops = (network.get_route_to_accessible_dict(), network.accessible_stop_keys())
+    return stop_routes, route_stops, route_links, transfer_stops, accessible_stops
+
+class TestMBTANetwork(unittest.TestCase):
+    """Test class for MBTANetwork class. The network has three routes.
+    Red -> {Alewife - Davis - Central}
+    Mattapan -> {Central - Kendall/MIT - Park Street}
+    Orange -> {Park Street - Downtown Crossing}
+    """
+
+    def setUp(self):
+        self.network = mbta_network.MBTANetwork({
+            "Red": {"Alewife", "Davis", "Central"},
+            "Mattapan": {"Central", "Kendall/MIT", "Park Street"},
+            "Orange": {"Park Street", "Downtown Crossing"}})
+
+    def test_bitsets(self):
+        """Check if the stops and routes are interned to integer ids and the
+        route and stop bitsets match.
+        """
+
+        self.assertEqual([route.route_id for route in self.network.routes], ["Red", "Mattapan", "Orange"])
+        self.assertEqual(len(self.network.stops), 6)
+        central = self.network.stops[self.network.stop_index["Central"]]
+        self.assertEqual(list(mbta_network.iter_bits(central.route_mask)), [0, 1])
+        red = self.network.routes[self.network.route_index["Red"]]
+        self.assertEqual(bin(red.stop_mask).count("1"), 3)
+        self.assertEqual(self.network.transfer_mask, self.network.stop_mask(["Central", "Park Street"]))
+        self.assertEqual(self.network.route_to_routes, [0b010, 0b101, 0b010])
+        print("Testcase passed. Stops and routes are held in bitsets.")
+
+    def test_find_routes(self):
+        """Check the route list with and without closed stops.
+        """
+
+        self.assertEqual(self.network.find_routes("Davis", "Alewife"), ["Red"])
+        self.assertEqual(self.network.find_routes("Davis", "Downtown Crossing"), ["Red", "Mattapan", "Orange"])
+        closed_mask = self.network.stop_mask(["Central"])
+        self.assertIsNone(self.network.find_routes("Davis", "Downtown Crossing", closed_mask))
+        self.assertIsNone(self.network.find_routes("Central", "Park Street", closed_mask))
+        print("Testcase passed. Found the routes with and without closed stops.")
+
+    def test_route_tree(self):
+        """Search the routes from every stop of random networks once with a 
+        RouteTree and check if it gives the route lists of find_routes() to 
+        every stop.
+        """
+
+        rng = random.Random(1)
+        for i in range(20):
+            route_to_stops_dict = {"R%i" % route_num: {"S%i" % rng.randrange(40) for j in range(6)}
+                for route_num in range(12)}
+            network = mbta_network.MBTANetwork(route_to_stops_dict)
+            closed_mask = network.stop_mask(rng.sample(sorted(network.stop_index), 3))
+            closed_route_mask = 1 << rng.randrange(len(network.routes))
+            for src_stop in network.stop_index:
+                tree = network.route_tree(src_stop, closed_mask, closed_route_mask)
+                for dest_stop in network.stop_index:
+                    dest_route_mask = network.open_route_mask(dest_stop, closed_mask) & ~closed_route_mask
+                    self.assertEqual(tree.find_routes(dest_route_mask),
+                        network.find_routes(src_stop, dest_stop, closed_mask, closed_route_mask))
+        print("Testcase passed. Route trees match find_routes().")
+
+    def test_update_routes(self):
+        """Patch random networks with random route and accessibility changes, 
+        and compare them and their compiled closures with networks built from 
+        scratch.
+        """
+
+        rng = random.Random(1)
+        scenario = mbta_closures.ClosureScenario("test", ["s1", "s7"], name_patterns=["^s2"],
+            routes=["R2", "R5"])
+        for trial in range(100):
+            route_to_stops_dict = {"R%i" % route_index: {"s%i" % rng.randrange(30)
+                for position in range(rng.randrange(1, 6))} for route_index in range(rng.randrange(1, 8))}
+            route_to_accessible_dict = {route_id: {stop_key for stop_key in route_stop_set if rng.random() < 0.5}
+                for route_id, route_stop_set in route_to_stops_dict.items()}
+            network = mbta_network.MBTANetwork(route_to_stops_dict, None, route_to_accessible_dict)
+            closures = scenario.compile(network)
+            for step in range(5):
+                route_to_stops_dict = dict(route_to_stops_dict)
+                route_to_accessible_dict = dict(route_to_accessible_dict)
+                old_accessible_stops = network.accessible_stop_keys()
+                changed_routes = []
+                for change in range(rng.randrange(1, 4)):
+                    route_id = "R%i" % rng.randrange(10)
+                    changed_routes.append(route_id)
+                    if rng.random() < 0.3:
+                        route_to_stops_dict.pop(route_id, None)
+                        route_to_accessible_dict.pop(route_id, None)
+                    else:
+                        if rng.random() < 0.7:
+                            route_to_stops_dict[route_id] = {"s%i" % rng.randrange(30)
+                                for position in range(rng.randrange(0, 6))}
+                        route_to_accessible_dict[route_id] = {stop_key for stop_key
+                            in route_to_stops_dict.get(route_id, ()) if rng.random() < 0.5}
+                        route_to_stops_dict.setdefault(route_id, set())
+                network_update = network.update_routes(route_to_stops_dict, changed_routes, None,
+                    route_to_accessible_dict)
+                new_network = mbta_network.MBTANetwork(route_to_stops_dict, None, route_to_accessible_dict)
+                new_accessible_stops = new_network.accessible_stop_keys()
+                self.assertEqual(network_update.accessibility_changed, old_accessible_stops ^ new_accessible_stops)
+                self.assertEqual(get_network_data(network), get_network_data(new_network))
+                self.assertEqual([stop.index for stop in network.stops], list(range(len(network.stops))))
+                self.assertEqual({network.stops[stop_id].name: stop_id for stop_id in range(len(network.stops))},
+                    network.stop_index)
+                closures = scenario.update_compiled(closures, network_update)
+                new_closures = scenario.compile(network)
+                self.assertEqual((closures.stop_mask, closures.route_mask),
+                    (new_closures.stop_mask, new_closures.route_mask))
+        print("Testcase passed. Patched networks match networks built from scratch.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Tests for mbta_profile module.
+"""
+
+import contextlib
+import io
+import json
+import unittest
+
+import mbta_client
+import mbta_profile
+import read_mbta_data as main_program
+from test_mbta_client import StandInServer
+
+class TestProfiler(unittest.TestCase):
+    """Test class for Profiler class and the instrumented code.
+    """
+
+    def tearDown(self):
+        mbta_profile.disable()
+
+    def test_disabled(self):
+        """Check if the disabled profiler collects nothing.
+        """
+
+        self.assertFalse(mbta_profile.profiler.enabled)
+        with mbta_profile.profiler.timer("phase", "test"):
+            mbta_profile.profiler.add("counter")
+        self.assertFalse(hasattr(mbta_profile.profiler, "timers"))
+        print("Testcase passed. Disabled profiler collected nothing.")
+
+    def test_instrumented_run(self):
+        """Load the test data from the stand-in server with profiling enabled and
+        check the phase timers, the request counters, and the search counters.
+        """
+
+        profiler = mbta_profile.enable()
+        with StandInServer() as httpd:
+            url = "http://127.0.0.1:%i" % httpd.server_address[1]
+            reader = main_program.MBTADataReader(mbta_client.MBTAClient(url, rate_limit=0))
+            with contextlib.redirect_stdout(io.StringIO()):
+                reader.show_route_names()
+                reader.show_stop_info()
+            reader.client.close()
+        reader.find_src_to_dest("Alewife", "Downtown Crossing", set())
+
+        self.assertEqual(profiler.counters[("http_requests", "/route_patterns")], 8)
+        self.assertEqual(profiler.counters[("http_requests", "/routes")], 1)
+        self.assertGreater(profiler.counters[("http_bytes", "/route_patterns")], 0)
+        self.assertEqual(profiler.timers[("phase", "load_stop_info")][0], 1)
+        # one response for each direction of the three routes with stops
+        self.assertEqual(profiler.timers[("phase", "add_stop_data")][0], 6)
+        self.assertEqual(profiler.counters[("graph_builds", None)], 1)
+        self.assertEqual(profiler.counters[("search_expansions", None)], 3)
+        self.assertIn("phase[load_stop_info]", profiler.report())
+        self.assertIn('mbta_http_requests_total{label="/route_patterns"} 8', profiler.to_prometheus())
+        self.assertEqual(len(json.loads(profiler.to_json())["timers"]), len(profiler.timers))
+        print("Testcase passed. Collected phase timers and counters.")
+
+if __name__ == '__main__':
+    unittest.main()
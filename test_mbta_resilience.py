@@ -0,0 +1,69 @@
+"""Tests for mbta_resilience module.
+"""
+
+import unittest
+
+import benchmark_mbta
+import mbta_network
+import mbta_resilience
+import read_mbta_data as main_program
+
+class TestResilience(unittest.TestCase):
+    """Test class for the resilience sweep.
+    """
+
+    def test_articulation_stops(self):
+        """The network has three routes in a line, so only the two stops which
+        link the routes are articulation stops.
+        Red -> {Alewife - Davis - Central}
+        Mattapan -> {Central - Kendall/MIT - Park Street}
+        Orange -> {Park Street - Downtown Crossing}
+        """
+
+        network = mbta_network.MBTANetwork({
+            "Red": {"Alewife", "Davis", "Central"},
+            "Mattapan": {"Central", "Kendall/MIT", "Park Street"},
+            "Orange": {"Park Street", "Downtown Crossing"}})
+        articulation_mask = mbta_resilience.find_articulation_stops(network)
+        self.assertEqual(articulation_mask, network.stop_mask(["Central", "Park Street"]))
+        results = {result.stop: result for result in mbta_resilience.iter_resilience(network, 1)}
+        self.assertEqual(results["Central"].to_dict()["key"], "Central")
+        # closing Central disconnects Alewife and Davis from the 3 stops after it
+        self.assertEqual(results["Central"].disconnected_pairs, 2 * 3 * 2)
+        self.assertEqual(results["Davis"].disconnected_pairs, 0)
+        ranked = mbta_resilience.rank_results(results.values())
+        self.assertEqual([result.stop for result in ranked[:2]], ["Central", "Park Street"])
+        print("Testcase passed. Found the articulation stops and ranked them first.")
+
+    def test_same_as_queries(self):
+        """Compare the sweep of a synthetic network with one find_routes() call
+        for every stop pair under every single-stop closure.
+        """
+
+        routes_resp, stop_resp_list = benchmark_mbta.generate_network(8, 5, 0.3, seed=3)
+        reader = main_program.MBTADataReader()
+        reader.get_total_stops(stop_resp_list)
+        network = reader.network
+        stop_keys = [stop.key for stop in network.stops]
+        for result in mbta_resilience.iter_resilience(network, 2):
+            self.assertEqual(network.stops[network.stop_index[result.key]].name, result.stop)
+            closed_mask = network.stop_mask([result.key])
+            disconnected_pairs = extra_transfers = 0
+            for src_stop in stop_keys:
+                for dest_stop in stop_keys:
+                    if src_stop == dest_stop or result.key in (src_stop, dest_stop):
+                        continue
+                    base = network.find_routes(src_stop, dest_stop)
+                    closed = network.find_routes(src_stop, dest_stop, closed_mask)
+                    if base and not closed:
+                        disconnected_pairs += 1
+                    elif base:
+                        extra_transfers += len(closed) - len(base)
+            self.assertEqual((result.disconnected_pairs, result.extra_transfers),
+                (disconnected_pairs, extra_transfers), result.stop)
+            if result.disconnected_pairs:
+                self.assertTrue(result.articulation)
+        print("Testcase passed. Resilience sweep matches the per-pair queries.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+"""Tests for mbta_routing_table module.
+"""
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import benchmark_mbta
+import mbta_network
+import mbta_routing_table
+import read_mbta_data as main_program
+
+class TestRoutingTable(unittest.TestCase):
+    """Test class for the routing table file.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.table_file = os.path.join(self.temp_dir.name, "routes.table")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_same_as_network(self):
+        """Write the routing table of a synthetic network, and check if the route
+        list of every stop pair is the same as the one of the network. Some
+        stops share the name "Main St", which stands for all of them.
+        """
+
+        routes_resp, stop_resp_list = benchmark_mbta.generate_network(15, 6, 0.25, seed=2)
+        for resp in stop_resp_list:
+            for stop_info in resp["data"]:
+                if int(stop_info["id"].split("-")[1]) % 9 == 0:
+                    stop_info["attributes"]["name"] = "Main St"
+        reader = main_program.MBTADataReader()
+        reader.get_total_stops(stop_resp_list)
+        self.assertGreater(len(reader.network.stop_name_ids["Main St"]), 1)
+        mbta_routing_table.write_routing_table(reader.network, self.table_file)
+        routing_table = mbta_routing_table.RoutingTable(self.table_file)
+        stops = set(reader.stop_set) | set(reader.network.stop_name_ids)
+        for src_stop in stops:
+            for dest_stop in stops:
+                self.assertEqual(routing_table.find_routes(src_stop, dest_stop),
+                    reader.network.find_routes(src_stop, dest_stop))
+        self.assertLess(routing_table.num_classes, len(reader.stop_set))
+        routing_table.close()
+        print("Testcase passed. Routing table matches the network for all stop pairs.")
+
+    def test_normalized_names(self):
+        """Check if the table resolves the names with another case and
+        punctuation and the known aliases, like the reader does.
+        """
+
+        network = mbta_network.MBTANetwork({"Red": {"place-alfcl", "place-kndl"},
+            "Orange": {"place-dwnxg", "place-ogmnl"}},
+            {"place-alfcl": "Alewife", "place-kndl": "Kendall/MIT",
+                "place-dwnxg": "Downtown Crossing", "place-ogmnl": "Oak Grove"})
+        mbta_routing_table.write_routing_table(network, self.table_file)
+        routing_table = mbta_routing_table.RoutingTable(self.table_file)
+        self.assertEqual(routing_table.find_routes("alewife", "kendall mit"), ["Red"])
+        self.assertEqual(routing_table.find_routes("Kendall", "ALEWIFE"), ["Red"])
+        self.assertIsNone(routing_table.find_routes("alewife", "DTX"))
+        self.assertNotIn("Alewives", routing_table)
+        with self.assertRaises(KeyError):
+            routing_table.find_routes("Alewives", "Oak Grove")
+        routing_table.close()
+        print("Testcase passed. Routing table resolved normalized names and aliases.")
+
+    def test_version(self):
+        """Change the version of a routing table file and check if it is rejected.
+        """
+
+        reader = main_program.MBTADataReader()
+        reader.get_total_stops(benchmark_mbta.generate_network(2, 3)[1])
+        mbta_routing_table.write_routing_table(reader.network, self.table_file)
+        with open(self.table_file, "r+b") as table_file:
+            table_file.seek(8)
+            table_file.write(b"\x63\0\0\0")
+        with self.assertRaises(ValueError):
+            mbta_routing_table.RoutingTable(self.table_file)
+        print("Testcase passed. Routing table with another version was rejected.")
+
+    def test_incompatible_options(self):
+        """Run the program with --table and each option the routing table cannot 
+        answer, and check if it is rejected instead of silently ignored.
+        """
+
+        for extra_args in (["--mode", "covid19"], ["--closures", "closures.json"], ["--legs"]):
+            argv = ["read_mbta_data.py", "--table", self.table_file, "--stop1", "Alewife", "--stop2", "Central"]
+            with mock.patch.object(sys, "argv", argv + extra_args), \
+                    contextlib.redirect_stderr(io.StringIO()) as error_output, \
+                    self.assertRaises(SystemExit) as context:
+                main_program.main()
+            self.assertEqual(context.exception.code, 2)
+            self.assertIn("--table answers only normal mode queries", error_output.getvalue())
+        print("Testcase passed. --table with another mode, closures or legs was rejected.")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+"""Tests for mbta_service module. The service loads the json files in the
+test_data folder instead of requesting them from the API.
+"""
+
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+import mbta_service
+import read_mbta_data as main_program
+
+def load_test_reader():
+    reader = main_program.MBTADataReader()
+    with open("test_data/routes_data.json", "r") as route_file:
+        reader.get_route_names(json.load(route_file))
+    stop_data_list = []
+    for route in ["Red", "Mattapan", "Orange"]:
+        with open("test_data/stop_data_%s.json" % route, "r") as stop_file:
+            stop_data_list.append(json.load(stop_file))
+    reader.get_total_stops(stop_data_list)
+    return reader
+
+class TestMBTAService(unittest.TestCase):
+    """Test class for MBTAService class.
+    """
+
+    def setUp(self):
+        self.service = mbta_service.MBTAService(load_test_reader, refresh_interval=0)
+        self.httpd = self.service.make_server("127.0.0.1", 0)
+        self.url = "http://127.0.0.1:%i" % self.httpd.server_address[1]
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def get(self, path):
+        try:
+            with urllib.request.urlopen(self.url + path) as resp:
+                return resp.status, json.load(resp)
+        except urllib.error.HTTPError as error:
+            return error.code, json.load(error)
+
+    def test_routes_and_stops(self):
+        """Query the route names and the stop summary.
+        """
+
+        status_code, result = self.get("/routes")
+        self.assertEqual(status_code, 200)
+        self.assertEqual(result["routes"][:2], ["Red Line", "Mattapan Trolley"])
+        status_code, result = self.get("/stops")
+        self.assertEqual(result["num_unique_stops"], 10)
+        self.assertEqual(result["max_route"], "Red")
+        self.assertEqual(result["min_route"], "Orange")
+        print("Testcase passed. Got route names and stop summary as JSON.")
+
+    def test_trip(self):
+        """Query trips in normal and covid19 mode, with legs, and with an invalid 
+        stop.
+        """
+
+        status_code, result = self.get("/trip?stop1=Alewife&stop2=Downtown+Crossing")
+        self.assertEqual(status_code, 200)
+        self.assertEqual(result["routes"], ["Red", "Mattapan", "Orange"])
+        status_code, result = self.get("/trip?stop1=Alewife&stop2=Downtown+Crossing&legs=1")
+        self.assertEqual(result["routes"], ["Red", "Mattapan", "Orange"])
+        self.assertEqual([leg["board"] for leg in result["journey"]["legs"]], ["Alewife", "Central", "Park Street"])
+        self.assertEqual(result["journey"]["num_stops"], 8)
+        status_code, result = self.get("/trip?stop1=Alewife&stop2=Downtown+Crossing&mode=covid19")
+        self.assertIsNone(result["routes"])
+        status_code, result = self.get("/trip?stop1=Nowhere&stop2=Central")
+        self.assertEqual(status_code, 404)
+        self.assertEqual(result["error"], "The source stop name is invalid.")
+        status_code, result = self.get("/trip?stop1=Alewife")
+        self.assertEqual(status_code, 400)
+        print("Testcase passed. Got trips as JSON.")
+
+    def test_stop_search(self):
+        """Search stop names for autocomplete.
+        """
+
+        status_code, result = self.get("/stops/search?q=down&limit=3")
+        self.assertEqual(status_code, 200)
+        self.assertEqual(result["stops"], ["Downtown Crossing"])
+        status_code, result = self.get("/trip?stop1=alewife&stop2=Downtwn+Crossing")
+        self.assertEqual(status_code, 404)
+        self.assertEqual(result["suggestions"], ["Downtown Crossing"])
+        status_code, result = self.get("/stops/search?q=down&limit=x")
+        self.assertEqual(status_code, 400)
+        print("Testcase passed. Searched stop names as JSON.")
+
+    def test_refresh(self):
+        """Refresh the service and check if the new network replaces the old one.
+        """
+
+        old_state = self.service.state
+        self.service.refresh()
+        self.assertIsNot(self.service.state, old_state)
+        self.assertEqual(self.get("/stops")[1]["num_unique_stops"], 10)
+        print("Testcase passed. Refresh replaced the network.")
+
+    def test_update_refresh(self):
+        """Refresh a service which patches its reader and check if queries see 
+        the change.
+        """
+
+        def fetch_update(reader):
+            return {"Orange": {"place-pktrm", "place-dwnxg", "place-chncl"}}
+        def apply_update(reader, route_to_stops_dict):
+            reader.apply_stop_snapshot(route_to_stops_dict, {"Orange": {"place-chncl"}},
+                stop_names={"place-chncl": "Chinatown"})
+        service = mbta_service.MBTAService(load_test_reader, refresh_interval=0,
+            fetch_update=fetch_update, apply_update=apply_update)
+        old_reader = service.state.reader
+        service.refresh()
+        self.assertIs(service.state.reader, old_reader)
+        status_code, result = service.handle_query("/trip", {"stop1": ["Alewife"], "stop2": ["Chinatown"]})
+        self.assertEqual(result["routes"], ["Red", "Mattapan", "Orange"])
+        self.assertEqual(service.handle_query("/stops", {})[1]["num_unique_stops"], 10)
+        print("Testcase passed. Refresh patched the network.")
+
+    def test_queries_during_fetch(self):
+        """Block the download of a refresh and check if queries are still 
+        answered from the current network meanwhile, and see the patch after it.
+        """
+
+        fetch_started = threading.Event()
+        finish_fetch = threading.Event()
+        def fetch_update(reader):
+            fetch_started.set()
+            finish_fetch.wait(10)
+            return {"Orange": {"place-pktrm", "place-dwnxg", "place-chncl"}}
+        def apply_update(reader, route_to_stops_dict):
+            reader.apply_stop_snapshot(route_to_stops_dict, {}, stop_names={"place-chncl": "Chinatown"})
+        service = mbta_service.MBTAService(load_test_reader, refresh_interval=0,
+            fetch_update=fetch_update, apply_update=apply_update)
+        refresh_thread = threading.Thread(target=service.refresh)
+        refresh_thread.start()
+        self.assertTrue(fetch_started.wait(10))
+        answers = []
+        query_thread = threading.Thread(target=lambda: answers.append(
+            service.handle_query("/stops", {})[1]["num_unique_stops"]))
+        query_thread.start()
+        query_thread.join(5)
+        finish_fetch.set()
+        refresh_thread.join(10)
+        self.assertEqual(answers, [10])
+        self.assertEqual(service.handle_query("/trip", {"stop1": ["Alewife"], "stop2": ["Chinatown"]})[1]["routes"],
+            ["Red", "Mattapan", "Orange"])
+        print("Testcase passed. Queries were answered while the refresh downloaded the data.")
+
+    def test_read_write_lock(self):
+        """Check if readers share the lock and a writer waits for them.
+        """
+
+        lock = mbta_service.ReadWriteLock()
+        events = []
+        def write():
+            with lock.write_lock():
+                events.append("write")
+        with lock.read_lock():
+            with lock.read_lock():
+                writer = threading.Thread(target=write)
+                writer.start()
+                writer.join(0.2)
+                self.assertEqual(events, [])
+        writer.join(5)
+        self.assertEqual(events, ["write"])
+        print("Testcase passed. Readers shared the lock and the writer waited for them.")
+
+if __name__ == '__main__':
+    unittest.main()
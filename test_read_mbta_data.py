@@ -154,5 +154,177 @@ class TestReadMBTAData(unittest.TestCase):
         print("Testcase passed. From 'Alewife' to 'Downtown Crossing' stop, " +
             "no route is possible as 'Alewife' and 'Central' are closed.")
 
+    def test_find_routes_fewest_transfers(self):
+        """Build a small route to stops dictionary where a route can be reached 
+        with one transfer or with two transfers, and checks if find_src_to_dest() 
+        returns the route list with the fewest transfers.
+        A -> {a - b}
+        B -> {b - c}
+        C -> {c - d - a}
+        D -> {d - e}
+        """
+
+        self.my_data_reader.apply_stop_snapshot({
+            "A": {"a", "b"}, "B": {"b", "c"}, "C": {"c", "d", "a"}, "D": {"d", "e"}}, {})
+
+        needed_route_list = self.my_data_reader.find_src_to_dest("b", "e", set())
+        self.assertEqual(needed_route_list, ["A", "C", "D"])
+        print("Testcase passed. From 'b' to 'e' stop, the needed routes are A, "
+            + "then C, then D.")
+
+        needed_route_list = self.my_data_reader.find_src_to_dest("b", "e", {"a"})
+        self.assertEqual(needed_route_list, ["B", "C", "D"])
+        print("Testcase passed. From 'b' to 'e' stop, the needed routes are B, "
+            + "then C, then D when 'a' is closed.")
+
+    def test_apply_stop_snapshot(self):
+        """Load the three routes, then apply a snapshot where Orange is removed, 
+        a stop is added to Mattapan and Alewife is not accessible any more. The 
+        patched reader must match a reader which loads the new data from scratch.
+        """
+
+        stop_data_list = []
+        for stop_data_file in (self.stop_data_file1, self.stop_data_file2, self.stop_data_file3):
+            with open(stop_data_file, "r") as stop_file:
+                stop_data_list.append(json.load(stop_file))
+        self.my_data_reader.get_total_stops(stop_data_list)
+        self.my_data_reader.get_route_max_min_stops()
+        self.my_data_reader.get_closures(main_program.SCENARIOS["covid19"])
+
+        red_data, mattapan_data = stop_data_list[0], stop_data_list[1]
+        for stop_info in red_data["data"]:
+            if stop_info["attributes"]["name"] == "Alewife":
+                stop_info["attributes"]["wheelchair_boarding"] = 2
+        mattapan_data["data"].append({"attributes": {"name": "Cedar Grove", "wheelchair_boarding": 1}})
+
+        route_to_stops_dict = {}
+        route_to_accessible_dict = {}
+        stop_names = {}
+        for stop_data in (red_data, mattapan_data):
+            self.my_data_reader.read_stop_data(stop_data, route_to_stops_dict, route_to_accessible_dict, stop_names)
+        changes = self.my_data_reader.apply_stop_snapshot(route_to_stops_dict,
+            route_to_accessible_dict, ["Orange"], stop_names=stop_names)
+        self.assertEqual(changes["changed_routes"], ["Mattapan", "Orange"])
+        self.assertEqual(changes["added_stops"], ["Cedar Grove"])
+        self.assertEqual(changes["removed_stops"], ["place-dwnxg", "place-sstat"])
+        self.assertIn("place-alfcl", changes["accessibility_changed"])
+
+        new_data_reader = main_program.MBTADataReader()
+        new_data_reader.get_total_stops([red_data, mattapan_data])
+        for data_reader in (self.my_data_reader, new_data_reader):
+            data_reader.min_max_routes = None
+        self.assertEqual(self.my_data_reader.stop_set, new_data_reader.stop_set)
+        self.assertEqual(self.my_data_reader.accessible_stop_set, new_data_reader.accessible_stop_set)
+        self.assertEqual(self.my_data_reader.route_to_stops_dict, new_data_reader.route_to_stops_dict)
+        self.assertEqual(dict(self.my_data_reader.stop_names), dict(new_data_reader.stop_names))
+        self.assertEqual(self.my_data_reader.get_route_max_min_stops(), new_data_reader.get_route_max_min_stops())
+        self.assertEqual(self.my_data_reader.find_src_to_dest("Alewife", "Cedar Grove", set()), ["Red", "Mattapan"])
+        self.assertEqual(self.my_data_reader.suggest_stop_names("Cedar"), ["Cedar Grove"])
+        covid19 = main_program.SCENARIOS["covid19"]
+        self.assertEqual(self.my_data_reader.get_closures(covid19).stop_mask,
+            covid19.compile(self.my_data_reader.network).stop_mask)
+        print("Testcase passed. The patched reader matches a reader loaded from scratch.")
+
+    def test_renamed_stop(self):
+        """Load the three routes, then apply a snapshot where Davis is renamed 
+        to Davis Square. The new name must resolve and the old one must not, 
+        and the compiled closures must follow the new name.
+        """
+
+        stop_data_list = []
+        for stop_data_file in (self.stop_data_file1, self.stop_data_file2, self.stop_data_file3):
+            with open(stop_data_file, "r") as stop_file:
+                stop_data_list.append(json.load(stop_file))
+        self.my_data_reader.get_total_stops(stop_data_list)
+        davis = main_program.ClosureScenario("davis", name_patterns=[r"^Davis$"])
+        self.assertEqual(self.my_data_reader.get_closures(davis).stop_mask,
+            self.my_data_reader.network.stop_mask(["place-davis"]))
+
+        for stop_info in stop_data_list[0]["data"]:
+            if stop_info["attributes"]["name"] == "Davis":
+                stop_info["attributes"]["name"] = "Davis Square"
+        route_to_stops_dict = {}
+        route_to_accessible_dict = {}
+        stop_names = {}
+        for stop_data in stop_data_list:
+            self.my_data_reader.read_stop_data(stop_data, route_to_stops_dict, route_to_accessible_dict, stop_names)
+        changes = self.my_data_reader.apply_stop_snapshot(route_to_stops_dict,
+            route_to_accessible_dict, stop_names=stop_names)
+        self.assertEqual(changes["renamed_stops"], ["place-davis"])
+        self.assertEqual(changes["changed_routes"], [])
+
+        self.assertEqual(self.my_data_reader.resolve_stop_name("davis square"), "Davis Square")
+        self.assertIsNone(self.my_data_reader.resolve_stop_name("Davis"))
+        self.assertEqual(self.my_data_reader.find_src_to_dest("Davis Square", "Alewife", set()), ["Red"])
+        with self.assertRaises(KeyError):
+            self.my_data_reader.network.find_routes("Davis", "Alewife")
+        self.assertEqual(self.my_data_reader.stop_names["place-davis"], "Davis Square")
+        self.assertEqual(self.my_data_reader.get_closures(davis).stop_mask, 0)
+        print("Testcase passed. The renamed stop resolves by its new name only.")
+
+    def test_route_names_are_replaced(self):
+        """Read the route data twice and check if the route ids are not repeated.
+        """
+
+        with open(self.route_data_file, "r") as route_file:
+            route_data = json.load(route_file)
+        self.my_data_reader.get_route_names(route_data)
+        self.my_data_reader.get_route_names(route_data)
+        self.assertEqual(len(self.my_data_reader.routeId_list), len(set(self.my_data_reader.routeId_list)))
+        self.assertEqual(len(self.my_data_reader.route_long_names), len(route_data["data"]))
+        print("Testcase passed. Route ids are not repeated after a second read.")
+
+    def test_readers_do_not_share_data(self):
+        """Read the stop data with one reader and check if a second reader 
+        still has no stops.
+        """
+
+        with open(self.stop_data_file1, "r") as stop_file1:
+            stop_data = json.load(stop_file1)
+        self.my_data_reader.get_total_stops([stop_data])
+        other_data_reader = main_program.MBTADataReader()
+        self.assertEqual(len(other_data_reader.stop_set), 0)
+        self.assertEqual(other_data_reader.route_to_stops_dict, {})
+        print("Testcase passed. Each reader keeps its own data.")
+
+    def test_parse_route_types(self):
+        """Parse route types given as numbers, names and "all", and check if an 
+        unknown route type is rejected.
+        """
+
+        self.assertEqual(main_program.parse_route_types("0,1"), (0, 1))
+        self.assertEqual(main_program.parse_route_types("bus, subway,3"), (1, 3))
+        self.assertEqual(main_program.parse_route_types("all"), (0, 1, 2, 3, 4))
+        with self.assertRaises(ValueError):
+            main_program.parse_route_types("monorail")
+        print("Testcase passed. Parsed the route types.")
+
+    def test_stops_with_same_name(self):
+        """Read two bus routes whose stops have the same name but different ids, 
+        and one stop which is a platform of a parent station. The stops with the 
+        same name must stay apart, and a trip between names must use any of them.
+        """
+
+        def make_stop(stop_id, stop_name, parent_id=None):
+            parent_data = {"type": "stop", "id": parent_id} if parent_id else None
+            return {"type": "stop", "id": stop_id, "attributes": {"name": stop_name, "wheelchair_boarding": 0},
+                "relationships": {"parent_station": {"data": parent_data}}}
+        stop_data_list = [
+            {"data": [make_stop("100", "Main St"), make_stop("101", "Elm St"), make_stop("70061", "Alewife", "place-alfcl")],
+                "included": [{"type": "route", "id": "77"}]},
+            {"data": [make_stop("200", "Main St"), make_stop("201", "Oak St")],
+                "included": [{"type": "route", "id": "78"}]},
+            {"data": [make_stop("place-alfcl", "Alewife"), make_stop("300", "Oak St")],
+                "included": [{"type": "route", "id": "Red"}]},
+        ]
+        self.assertEqual(main_program.get_stop_key(stop_data_list[0]["data"][2]), "place-alfcl")
+        self.my_data_reader.get_total_stops(stop_data_list)
+        self.assertEqual(len(self.my_data_reader.stop_set), 6)
+        self.assertEqual(len(self.my_data_reader.network.stop_name_ids["Main St"]), 2)
+        self.assertEqual(self.my_data_reader.find_src_to_dest("Elm St", "Oak St", set()), ["77", "Red"])
+        self.assertEqual(self.my_data_reader.find_src_to_dest("101", "201", set()), None)
+        self.assertEqual(self.my_data_reader.find_src_to_dest("Main St", "201", set()), ["78"])
+        print("Testcase passed. Stops with the same name are kept apart.")
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file